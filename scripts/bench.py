@@ -0,0 +1,362 @@
+"""Microbenchmarks for hot paths in the pipeline scripts.
+
+Run from the repository root:
+
+    python -m scripts.bench                       # all benchmarks, default sizes
+    python -m scripts.bench --sizes 100 1000      # body sizes in paragraphs
+    python -m scripts.bench --real-argos          # use the installed Argos model
+    python -m scripts.bench --suite hot --only html_to_markdown build_yaml
+    python -m scripts.bench --suite hot --output hot.json --baseline old.json
+
+Argos is replaced by a stub translator by default so the numbers measure the
+scanning/batching code and the per-call overhead (`--call-ms`) rather than the
+model itself.
+
+The "hot" suite times the pure-CPU helpers of the pipeline on a fixed corpus:
+  - the pages under `content/docs` (front matter and body; HTML rendered from the body);
+  - seeded CJK bodies from `make_cjk_body`;
+  - the recorded Ollama response in `test_ollama_parse.py` and variants of it.
+Each function reports ops/s (best of `--repeat` rounds of at least `--min-time`
+seconds) and, measured separately under tracemalloc, the mean peak KiB
+allocated per call and the KiB still held after a full pass. With
+`--baseline`, a drop in ops/s beyond `--tolerance` is reported as a
+regression and the exit status is 1.
+"""
+
+import argparse
+import html as html_module
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import yaml  # type: ignore
+
+from .fm_utils import CJK_REGEX, build_yaml, get_zh_en_translator, parse_ollama_response, translate_body_cjk_to_en
+
+PHRASES = [
+    "租房", "押金", "房东", "合同", "中介费", "水电燃气", "看房技巧", "搬家", "退租", "租金",
+    "地铁沿线", "朝南", "精装修", "拎包入住", "整租", "合租", "押一付三", "维修责任", "物业费", "宽带",
+    "租房补贴", "毕业生", "安全指南", "钥匙交接", "家具清单", "提前退租", "违约金", "房产证", "身份核验", "收据",
+]
+ENGLISH = [
+    "Check the lease carefully before signing.",
+    "See [the guide](https://example.com/guide) for details.",
+    "- Item with `inline code` and a number 42",
+    "| col | value |",
+    "Budget around 30% of monthly income for rent.",
+]
+
+
+class StubTranslator:
+    """Callable stand-in for Argos: sleeps `call_ms` per call and echoes a placeholder per line."""
+
+    def __init__(self, call_ms: float = 2.0):
+        self.call_s = max(0.0, call_ms) / 1000.0
+        self.calls = 0
+        self.chars = 0
+
+    def __call__(self, text: str) -> str:
+        self.calls += 1
+        self.chars += len(text)
+        if self.call_s:
+            time.sleep(self.call_s)
+        return "\n".join(f"en{len(line)}" for line in text.split("\n"))
+
+
+class CountingTranslator:
+    """Wraps a real translator to count calls."""
+
+    def __init__(self, fn: Callable[[str], str]):
+        self.fn = fn
+        self.calls = 0
+        self.chars = 0
+
+    def __call__(self, text: str) -> str:
+        self.calls += 1
+        self.chars += len(text)
+        return self.fn(text)
+
+
+def make_cjk_body(paragraphs: int, seed: int = 7) -> str:
+    """Markdown body mixing English lines with repeated Chinese phrases."""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            lines.append(f"## {rng.choice(PHRASES)} {i}")
+        words = []
+        for _ in range(rng.randint(4, 10)):
+            words.append(rng.choice(PHRASES) if rng.random() < 0.5 else rng.choice(ENGLISH))
+        lines.append(" ".join(words))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def legacy_translate_body_cjk_to_en(body: str, translator) -> Tuple[str, int]:
+    """The previous character-walk implementation, kept for comparison."""
+    replaced = 0
+    out_chars: List[str] = []
+    i = 0
+    n = len(body)
+    while i < n:
+        ch = body[i]
+        if CJK_REGEX.match(ch):
+            j = i + 1
+            while j < n and CJK_REGEX.match(body[j]):
+                j += 1
+            src = body[i:j]
+            trans = ""
+            if translator:
+                try:
+                    trans = translator(src) or ""
+                except Exception:
+                    trans = ""
+            replaced += 1
+            trans = trans.strip()
+            out_chars.append(f" {trans} " if trans else " ")
+            i = j
+        else:
+            out_chars.append(ch)
+            i += 1
+    out = "".join(out_chars)
+    out = CJK_REGEX.sub("", out)
+    return out, replaced
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_translate_body(sizes: List[int], repeat: int = 3, call_ms: float = 2.0, real_argos: bool = False) -> List[Dict[str, object]]:
+    """Compare the legacy char walk with the finditer + batched implementation."""
+    real = get_zh_en_translator() if real_argos else None
+    if real_argos and real is None:
+        print("未找到 Argos zh->en 模型，改用桩翻译器")
+    results: List[Dict[str, object]] = []
+    for size in sizes:
+        body = make_cjk_body(size)
+        row: Dict[str, object] = {"paragraphs": size, "chars": len(body)}
+        for name, impl in (("legacy", legacy_translate_body_cjk_to_en), ("batched", None)):
+            tr = CountingTranslator(real) if real else StubTranslator(call_ms)
+            if impl is None:
+                seconds = _time(lambda: translate_body_cjk_to_en(body, translator=tr), repeat)
+            else:
+                seconds = _time(lambda: impl(body, tr), repeat)
+            row[f"{name}_s"] = seconds
+            row[f"{name}_calls"] = tr.calls // max(1, repeat)
+            row[f"{name}_mb_s"] = len(body.encode("utf-8")) / 1048576 / seconds if seconds else 0.0
+        row["speedup"] = row["legacy_s"] / row["batched_s"] if row["batched_s"] else 0.0
+        results.append(row)
+    return results
+
+
+def _print_translate_body(rows: List[Dict[str, object]]) -> None:
+    print("translate_body_cjk_to_en")
+    print(f"{'段落':>8} {'字符':>10} {'旧实现 s':>10} {'旧调用':>8} {'新实现 s':>10} {'新调用':>8} {'MB/s':>8} {'加速':>7}")
+    for r in rows:
+        print(
+            f"{r['paragraphs']:>8} {r['chars']:>10} {r['legacy_s']:>10.3f} {r['legacy_calls']:>8} "
+            f"{r['batched_s']:>10.3f} {r['batched_calls']:>8} {r['batched_mb_s']:>8.2f} {r['speedup']:>6.1f}x"
+        )
+
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "content", "docs")
+_FRONT_MATTER_RE = re.compile(r"^---\r?\n([\s\S]*?)\r?\n---\r?\n")
+
+
+def load_docs_corpus(docs_dir: str = DOCS_DIR) -> List[Tuple[dict, str]]:
+    """(front matter, body) of every Markdown page in `docs_dir`, sorted by name."""
+    pages: List[Tuple[dict, str]] = []
+    for name in sorted(os.listdir(docs_dir)):
+        if not name.endswith(".md"):
+            continue
+        with open(os.path.join(docs_dir, name), "r", encoding="utf-8") as f:
+            text = f.read()
+        m = _FRONT_MATTER_RE.match(text)
+        fm = yaml.safe_load(m.group(1)) if m else None
+        pages.append((fm if isinstance(fm, dict) else {}, text[m.end():] if m else text))
+    return pages
+
+
+def markdown_to_html(body: str) -> str:
+    """Rough HTML rendering of a Markdown body (headings, lists, links, images), as Firecrawl would return it."""
+    out: List[str] = []
+    for block in re.split(r"\n\s*\n", body):
+        block = html_module.escape(block.strip(), quote=False)
+        if not block:
+            continue
+        block = re.sub(r"!\[([^\]]*)\]\(([^)\s]+)\)", r'<img src="\2" alt="\1">', block)
+        block = re.sub(r"\[([^\]]*)\]\(([^)\s]+)\)", r'<a href="\2">\1</a>', block)
+        heading = re.match(r"(#{1,6})\s+(.*)", block)
+        if heading:
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{heading.group(2)}</h{level}>")
+        elif re.match(r"[-*]\s", block):
+            items = "".join(f"<li>{line[2:]}</li>" for line in block.splitlines() if line[:2] in ("- ", "* "))
+            out.append(f"<ul>{items}</ul>")
+        else:
+            out.append(f"<p>{'<br>'.join(block.splitlines())}</p>")
+    return f"<html><body>{''.join(out)}</body></html>"
+
+
+def recorded_ollama_responses() -> List[str]:
+    """The recorded /api/generate body plus the shapes its answer arrives in elsewhere:
+    the bare fenced JSON, and the JSON object behind a <think> block."""
+    from .test_ollama_parse import RAW
+
+    # RAW is stored as a plain string literal, so its escapes are already resolved and it is not valid JSON
+    fenced = re.search(r"```json\s*[\s\S]*?```", RAW)
+    thinking = re.search(r'"thinking":"([\s\S]*?)","done"', RAW)
+    if not fenced:
+        return [RAW]
+    obj = fenced.group(0)[len("```json"):-3].strip()
+    return [RAW, fenced.group(0), f"<think>\n{thinking.group(1) if thinking else ''}\n</think>\n\n{obj}"]
+
+
+def _hot_paths(docs: List[Tuple[dict, str]]) -> Dict[str, Tuple[Callable, Sequence]]:
+    """Benchmarked function name -> (one call, the inputs it is called with per pass)."""
+    from .crawl_with_firecrawl import make_unique_url_from_title, reconcile_terms
+    from .html_convert import convert_images_to_reference, html_to_markdown
+    from .taxonomy import TaxonomyPool
+
+    bodies = [body for _, body in docs]
+    front_matters = [fm for fm, _ in docs if fm]
+    titles = [str(fm.get("title") or "") for fm in front_matters]
+    tag_lists = [[str(t) for t in fm.get("tags") or []] for fm in front_matters]
+    vocab = sorted({t for tags in tag_lists for t in tags})
+    stub = StubTranslator(call_ms=0)
+    state: Dict[str, object] = {}
+
+    def unique_url(title: str) -> str:
+        # A fresh "used" set per pass; every title comes twice so the -N suffix path runs too
+        if title is titles[0]:
+            state["used"] = set()
+        return make_unique_url_from_title(title, state["used"])  # type: ignore[arg-type]
+
+    def reconcile(tags: List[str]) -> List[str]:
+        # Half the vocabulary is known up front: lookups and additions, below the cap (no Ollama call)
+        if tags is tag_lists[0]:
+            state["pool"] = TaxonomyPool(vocab[::2])
+        return reconcile_terms(tags, state["pool"], 300, "", "", False)  # type: ignore[arg-type]
+
+    return {
+        "html_to_markdown": (html_to_markdown, [markdown_to_html(b) for b in bodies]),
+        "convert_images_to_reference": (convert_images_to_reference, bodies),
+        "translate_body_cjk_to_en": (lambda body: translate_body_cjk_to_en(body, translator=stub), bodies + [make_cjk_body(n, seed=n) for n in (50, 200, 1000)]),
+        "parse_ollama_response": (parse_ollama_response, recorded_ollama_responses()),
+        "build_yaml": (build_yaml, front_matters),
+        "reconcile_terms": (reconcile, tag_lists),
+        "make_unique_url_from_title": (unique_url, titles + titles),
+    }
+
+
+def _measure_allocations(fn: Callable, inputs: Sequence) -> Tuple[float, float]:
+    """(mean peak KiB allocated per call, KiB still allocated after the pass)."""
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        peaks = 0
+        for item in inputs:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn(item)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks += max(0, peak - before)
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peaks / 1024 / max(1, len(inputs)), max(0, end - start) / 1024
+
+
+def bench_hot_paths(only: Optional[List[str]] = None, repeat: int = 3, min_time: float = 0.2, docs_dir: str = DOCS_DIR) -> List[Dict[str, object]]:
+    """ops/s and allocations for each pure-CPU hot path on the fixed corpus."""
+    paths = _hot_paths(load_docs_corpus(docs_dir))
+    results: List[Dict[str, object]] = []
+    for name, (fn, inputs) in paths.items():
+        if only and name not in only:
+            continue
+        for item in inputs:  # warm-up: imports, regex compilation, lazy indexes
+            fn(item)
+        best = 0.0
+        for _ in range(max(1, repeat)):
+            calls = 0
+            t0 = time.perf_counter()
+            while True:
+                for item in inputs:
+                    fn(item)
+                calls += len(inputs)
+                elapsed = time.perf_counter() - t0
+                if elapsed >= min_time:
+                    break
+            best = max(best, calls / elapsed)
+        alloc_kib, retained_kib = _measure_allocations(fn, inputs)
+        results.append({"name": name, "inputs": len(inputs), "ops_s": round(best, 1), "alloc_kib_op": round(alloc_kib, 2), "retained_kib": round(retained_kib, 2)})
+    return results
+
+
+def compare_hot_paths(rows: List[Dict[str, object]], baseline: Dict[str, Dict[str, object]], tolerance: float) -> List[str]:
+    """Names of the functions whose ops/s fell more than `tolerance` below the baseline; fills in `change`."""
+    regressions: List[str] = []
+    for r in rows:
+        base = baseline.get(str(r["name"]))
+        if not base or not base.get("ops_s"):
+            continue
+        change = float(r["ops_s"]) / float(base["ops_s"]) - 1
+        r["change"] = round(change, 4)
+        if change < -tolerance:
+            regressions.append(str(r["name"]))
+    return regressions
+
+
+def _print_hot_paths(rows: List[Dict[str, object]]) -> None:
+    print("热点函数")
+    print(f"{'函数':<28} {'输入':>5} {'次/秒':>12} {'分配 KiB/次':>12} {'残留 KiB':>10} {'对比基线':>9}")
+    for r in rows:
+        change = f"{r['change'] * 100:+.1f}%" if "change" in r else ""
+        print(f"{r['name']:<28} {r['inputs']:>5} {r['ops_s']:>12,.1f} {r['alloc_kib_op']:>12.2f} {r['retained_kib']:>10.2f} {change:>9}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="脚本热点路径的微基准测试")
+    parser.add_argument("--suite", choices=["all", "translate", "hot"], default="all", help="translate 为 translate_body_cjk_to_en 新旧实现对比；hot 为热点函数的次/秒与内存分配；默认全部")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="正文规模（段落数）")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最快一次")
+    parser.add_argument("--call-ms", type=float, default=2.0, help="桩翻译器每次调用的模拟开销（毫秒）")
+    parser.add_argument("--real-argos", action="store_true", help="使用已安装的 Argos zh->en 模型")
+    parser.add_argument("--only", nargs="+", default=None, help="只运行指定的热点函数（如 html_to_markdown build_yaml）")
+    parser.add_argument("--min-time", type=float, default=0.2, help="热点函数每轮计时的最短秒数")
+    parser.add_argument("--docs-dir", default=DOCS_DIR, help="语料目录（默认 content/docs）")
+    parser.add_argument("--output", default="", help="将热点函数结果写入 JSON 文件，供之后对比")
+    parser.add_argument("--baseline", default="", help="与之前 --output 写出的 JSON 对比次/秒")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="次/秒低于基线超过此比例视为性能回退（默认 0.10），回退时退出码为 1")
+    args = parser.parse_args(argv)
+    if args.suite in ("all", "translate"):
+        _print_translate_body(bench_translate_body(args.sizes, args.repeat, args.call_ms, args.real_argos))
+    if args.suite in ("all", "hot"):
+        rows = bench_hot_paths(args.only, args.repeat, args.min_time, args.docs_dir)
+        regressions: List[str] = []
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = {r["name"]: r for r in json.load(f).get("hot_paths", [])}
+            regressions = compare_hot_paths(rows, baseline, args.tolerance)
+        _print_hot_paths(rows)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"min_time": args.min_time, "repeat": args.repeat, "hot_paths": rows}, f, ensure_ascii=False, indent=2)
+        if regressions:
+            print(f"性能回退（低于基线 {args.tolerance:.0%} 以上）：{', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
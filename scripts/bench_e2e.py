@@ -0,0 +1,496 @@
+"""End-to-end throughput benchmark with local Firecrawl and Ollama stand-ins.
+
+Run from the repository root:
+
+    python -m scripts.bench_e2e                                   # all stages, default sizes
+    python -m scripts.bench_e2e --pages 200 --ollama-latency 0.5
+    python -m scripts.bench_e2e --stages crawl --crawl-args "--workers 4"
+    python -m scripts.bench_e2e --baseline .cache/bench/e2e-<older>.json
+    python -m scripts.bench_e2e --stages crawl --webhook --webhook-drop-every 5
+
+One local HTTP server plays both services:
+  - Firecrawl v2: POST /v2/crawl starts a job; GET /v2/crawl/<id> returns
+    status pages of `--batch-size` pages linked by `next`. Each status request
+    waits `--firecrawl-latency` seconds. With `--scrape-rate`, pages become
+    ready gradually and the job reports "scraping" until all are done.
+    When the start request carries a `webhook`, a background thread POSTs
+    signed `crawl.started`, one `crawl.page` per ready page and
+    `crawl.completed` to it (X-Firecrawl-Signature: sha256=<HMAC of the body>).
+    `--webhook-drop-every` / `--webhook-dup-every` lose or repeat page events,
+    so the status-API reconcile and the de-duplication are exercised too.
+  - Ollama: /api/generate, /api/tags and /api/embed. Each generate call waits
+    `--ollama-latency` seconds plus `--ollama-ms-per-kchar` per 1000 prompt
+    characters. At most `--ollama-parallel` calls are served at once, like
+    OLLAMA_NUM_PARALLEL. Responses have the shape each prompt expects
+    (translated Markdown, taxonomy JSON, keyword arrays).
+
+Page bodies are generated Chinese Markdown of `--paragraphs` paragraphs. Each
+page carries an ASCII marker (BENCH-P00012) that survives translation.
+
+Each stage runs its entry point as a subprocess in a scratch directory:
+  - crawl         crawl_with_firecrawl.py against the fake services
+  - cn_to_en      process_cn_to_en.py over the same pages written as files
+  - front_matter  post_process_en_front_matter.py over the cn_to_en output
+
+The results file records for each stage:
+  - pages written, wall time and pages per minute;
+  - p50/p95 per-page latency;
+  - peak RSS of the subprocess (Unix only);
+  - calls seen by the fake services.
+Per-page latency runs from the moment the page was first seen by a fake
+service to the mtime of the page's output file. For the crawl, that moment is
+the Firecrawl delivery; for the later stages, the first Ollama call. Results
+go to `.cache/bench/e2e-<commit>-<time>.json` unless `--output` is given.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import platform
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from .bench import PHRASES
+
+STAGES = ("crawl", "cn_to_en", "front_matter")
+MARKER_RE = re.compile(r"BENCH-P(\d{5})")
+_CJK_RUN_RE = re.compile(r"[\u3400-\u4DBF\u4E00-\u9FFF]+")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def marker(i: int) -> str:
+    return f"BENCH-P{i:05d}"
+
+
+def make_page(i: int, paragraphs: int) -> Dict[str, str]:
+    """Title, description and Markdown body of fake page `i`."""
+    lines = [f"# {PHRASES[i % len(PHRASES)]}指南 {marker(i)}", ""]
+    for k in range(paragraphs):
+        if k and k % 8 == 0:
+            lines += [f"## {PHRASES[(i + k) % len(PHRASES)]} {k}", ""]
+        words = [PHRASES[(i * 7 + k * 3 + j) % len(PHRASES)] for j in range(12)]
+        lines += [f"{'，'.join(words)}。第 {k} 段，详见 [链接](https://bench.local/page-{(i + k) % 97})。", ""]
+    return {
+        "title": f"{PHRASES[i % len(PHRASES)]}页面 {marker(i)}",
+        "description": f"关于{PHRASES[(i + 1) % len(PHRASES)]}的说明",
+        "body": "\n".join(lines),
+    }
+
+
+def page_html(page: Dict[str, str]) -> str:
+    """The page as HTML, for runs where Firecrawl returns no Markdown."""
+    parts = []
+    for block in page["body"].split("\n\n"):
+        block = re.sub(r"\[([^\]]*)\]\(([^)]*)\)", r'<a href="\2">\1</a>', block.strip())
+        if block.startswith("## "):
+            parts.append(f"<h2>{block[3:]}</h2>")
+        elif block.startswith("# "):
+            parts.append(f"<h1>{block[2:]}</h1>")
+        elif block:
+            parts.append(f"<p>{block}</p>")
+    return f"<html><body>{''.join(parts)}</body></html>"
+
+
+def _translate(text: str) -> str:
+    # Stand-in translation: every CJK run becomes one word, the rest is kept
+    return _CJK_RUN_RE.sub(lambda m: f"w{len(m.group(0))}", text)
+
+
+def _prompt_payload(prompt: str) -> str:
+    """The text after the instruction header of a prompt."""
+    head, sep, rest = prompt.partition("\n\n")
+    return rest if sep else prompt
+
+
+class FakeServices:
+    """Thread-backed HTTP server acting as Firecrawl v2 and Ollama."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.pages = [make_page(i, args.paragraphs) for i in range(args.pages)]
+        self._gpu = threading.BoundedSemaphore(max(1, args.ollama_parallel))
+        self._lock = threading.Lock()
+        self.reset()
+        handler = type("Handler", (_Handler,), {"services": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="bench-fakes", daemon=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.first_seen: Dict[str, float] = {}
+            self.calls: Dict[str, int] = {"crawl_start": 0, "crawl_status": 0, "webhook": 0, "generate": 0, "embed": 0}
+            self.job_started = time.time()
+
+    def note(self, text: str) -> None:
+        now = time.time()
+        with self._lock:
+            for m in MARKER_RE.finditer(text):
+                self.first_seen.setdefault(m.group(0), now)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def page_entry(self, i: int) -> Dict[str, object]:
+        """Firecrawl v2 document of page `i`, as in status pages and webhook events."""
+        page = self.pages[i]
+        entry: Dict[str, object] = {"metadata": {"title": page["title"], "sourceURL": f"https://bench.local/page-{i}", "metadata": page["description"]}}
+        if self.args.html:
+            entry["html"] = page_html(page)
+        else:
+            entry["markdown"] = page["body"]
+        return entry
+
+    def send_webhook(self, url: str, crawl_id: str, kind: str, data: Optional[List[Dict[str, object]]] = None) -> bool:
+        payload = {"success": True, "type": f"crawl.{kind}", "id": crawl_id, "data": data or [], "metadata": {}}
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        signature = hmac.new(self.args.webhook_secret.encode("utf-8"), raw, hashlib.sha256).hexdigest()
+        req = urllib.request.Request(url, data=raw, method="POST", headers={"Content-Type": "application/json", "X-Firecrawl-Signature": f"sha256={signature}"})
+        self.count("webhook")
+        try:
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                return resp.status == 200
+        except Exception:
+            return False
+
+    def _run_webhooks(self, url: str, crawl_id: str) -> None:
+        drop, dup = self.args.webhook_drop_every, self.args.webhook_dup_every
+        self.send_webhook(url, crawl_id, "started")
+        for i in range(len(self.pages)):
+            while self.ready_pages() <= i:
+                time.sleep(0.01)
+            if drop and i % drop == drop - 1:
+                # Lost in transit: only the status API has this page
+                continue
+            self.note(marker(i))
+            for _ in range(2 if dup and i % dup == 0 else 1):
+                self.send_webhook(url, crawl_id, "page", [self.page_entry(i)])
+        self.send_webhook(url, crawl_id, "completed")
+
+    def start_webhooks(self, webhook: Dict[str, object], crawl_id: str) -> threading.Thread:
+        thread = threading.Thread(target=self._run_webhooks, args=(str(webhook.get("url") or ""), crawl_id), name="bench-webhooks", daemon=True)
+        thread.start()
+        return thread
+
+    def ready_pages(self) -> int:
+        if self.args.scrape_rate <= 0:
+            return len(self.pages)
+        return min(len(self.pages), int((time.time() - self.job_started) * self.args.scrape_rate))
+
+    def start(self) -> "FakeServices":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    services: FakeServices
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _json(self, obj, code: int = 200) -> None:
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(n) or b"{}")
+        except ValueError:
+            return {}
+
+    def do_GET(self) -> None:
+        svc = self.services
+        m = re.match(r"/v2/crawl/([\w-]+)(?:\?skip=(\d+))?$", self.path)
+        if m:
+            svc.count("crawl_status")
+            time.sleep(svc.args.firecrawl_latency)
+            skip = int(m.group(2) or 0)
+            ready = svc.ready_pages()
+            end = min(skip + svc.args.batch_size, ready)
+            data = []
+            for i in range(skip, end):
+                data.append(svc.page_entry(i))
+                svc.note(marker(i))
+            nxt = f"{svc.base}/v2/crawl/{m.group(1)}?skip={end}" if end < ready else None
+            status = "completed" if ready >= len(svc.pages) else "scraping"
+            return self._json({"success": True, "status": status, "completed": ready, "total": len(svc.pages), "creditsUsed": ready, "data": data, "next": nxt})
+        if self.path == "/api/tags":
+            return self._json({"models": [{"name": svc.args.model}]})
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self) -> None:
+        svc = self.services
+        body = self._body()
+        if self.path == "/v2/crawl":
+            svc.count("crawl_start")
+            svc.job_started = time.time()
+            self._json({"success": True, "id": "bench", "url": f"{svc.base}/v2/crawl/bench"})
+            if isinstance(body.get("webhook"), dict) and body["webhook"].get("url"):
+                svc.start_webhooks(body["webhook"], "bench")
+            return
+        if self.path == "/api/generate":
+            svc.count("generate")
+            prompt = str(body.get("prompt") or "")
+            svc.note(prompt)
+            with svc._gpu:
+                time.sleep(svc.args.ollama_latency + svc.args.ollama_ms_per_kchar * len(prompt) / 1e6)
+            return self._json({"model": body.get("model"), "response": self._generate(prompt), "done": True})
+        if self.path in ("/api/embed", "/api/embeddings"):
+            svc.count("embed")
+            inputs = body.get("input") or body.get("prompt") or []
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            vectors = [[((hash(s) >> k) % 97) / 97.0 for k in range(0, 64, 4)] for s in inputs]
+            return self._json({"embeddings": vectors})
+        self._json({"error": "not found"}, 404)
+
+    @staticmethod
+    def _generate(prompt: str) -> str:
+        found = MARKER_RE.search(prompt)
+        n = int(found.group(1)) if found else 0
+        tags = [f"topic-{(n + k) % 40}" for k in range(4)]
+        categories = [f"Category {n % 6}"]
+        if "translation, taxonomy and SEO" in prompt or "包含五个字段" in prompt:
+            page = {"title": f"Guide {marker(n)}", "description": f"About page {n}", "categories": categories, "tags": tags, "keywords": [f"keyword {n % 30}", "renting"]}
+            return json.dumps(page, ensure_ascii=False)
+        if "closest" in prompt:
+            options = prompt.split("Options (one per line):\n", 1)[-1].split("\n\n", 1)[0].splitlines()
+            return options[0] if options else ""
+        if "taxonomy assistant" in prompt:
+            return json.dumps({"categories": categories, "tags": tags})
+        if "SEO assistant" in prompt:
+            return json.dumps([f"keyword {n % 30}", "renting", "city life"])
+        return _translate(_prompt_payload(prompt))
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def run_entry(module: str, argv: List[str], workdir: str, log_path: str, webhook_secret: str = "") -> Dict[str, object]:
+    """Run `python -m scripts.<module>` in `workdir`; wall time, exit code and peak RSS."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    env.setdefault("PYTHONIOENCODING", "utf-8")
+    env["FIRECRAWL_WEBHOOK_SECRET"] = webhook_secret
+    # The crawler logs next to its source by default; keep benchmark logs out of the tree
+    env["CRAWL_LOG_DIR"] = os.path.join(workdir, "logs")
+    cmd = [sys.executable, "-m", f"scripts.{module}"] + argv
+    started = time.time()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        rss_mb: Optional[float] = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            code = os.waitstatus_to_exitcode(status)
+            proc.returncode = code
+            # ru_maxrss is in KiB on Linux and bytes on macOS
+            rss_mb = usage.ru_maxrss / (1048576 if sys.platform == "darwin" else 1024)
+        else:
+            code = proc.wait()
+    return {"exit_code": code, "wall_s": time.time() - started, "peak_rss_mb": rss_mb, "command": " ".join(shlex.quote(c) for c in cmd)}
+
+
+def collect_pages(out_dir: str, first_seen: Dict[str, float]) -> List[float]:
+    """Per-page latencies: output file mtime minus first sighting of its marker."""
+    latencies: List[float] = []
+    for root, _dirs, files in os.walk(out_dir):
+        for name in files:
+            if not name.endswith(".md"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    found = MARKER_RE.search(f.read())
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if found and found.group(0) in first_seen:
+                latencies.append(max(0.0, mtime - first_seen[found.group(0)]))
+    return latencies
+
+
+def summarize(name: str, run: Dict[str, object], latencies: List[float], calls: Dict[str, int]) -> Dict[str, object]:
+    wall = float(run["wall_s"])
+    pages = len(latencies)
+    return {
+        "stage": name,
+        "pages": pages,
+        "wall_s": round(wall, 3),
+        "pages_per_min": round(pages / wall * 60, 2) if wall > 0 else 0.0,
+        "latency_p50_s": round(percentile(latencies, 0.50), 3) if latencies else None,
+        "latency_p95_s": round(percentile(latencies, 0.95), 3) if latencies else None,
+        "peak_rss_mb": round(run["peak_rss_mb"], 1) if run["peak_rss_mb"] is not None else None,
+        "exit_code": run["exit_code"],
+        "calls": dict(calls),
+        "command": run["command"],
+    }
+
+
+def write_pages(pages: List[Dict[str, str]], out_dir: str) -> None:
+    """The fake pages as Chinese Markdown files, the input of the CN->EN stage."""
+    os.makedirs(out_dir, exist_ok=True)
+    for i, page in enumerate(pages):
+        with open(os.path.join(out_dir, f"page-{i:05d}.md"), "w", encoding="utf-8") as f:
+            f.write(page["body"])
+
+
+def run_stage(name: str, svc: FakeServices, args: argparse.Namespace, workdir: str) -> Dict[str, object]:
+    common = ["--ollama-base", svc.base, "--ollama-model", args.model, "--no-llm-cache", "--no-state-db"]
+    if name == "crawl":
+        out_dir = os.path.join(workdir, "results")
+        argv = ["--start-url", "https://bench.local/", "--firecrawl-base", svc.base, "--output-dir", out_dir,
+                "--env-file", os.path.join(workdir, ".env"), "--min-delay", "0.05", "--delay", "0"] + common
+        if args.webhook:
+            argv += ["--webhook", "--webhook-idle", "5"]
+        extra = args.crawl_args
+        module = "crawl_with_firecrawl"
+    elif name == "cn_to_en":
+        in_dir = os.path.join(workdir, "cn")
+        out_dir = os.path.join(workdir, "en")
+        write_pages(svc.pages, in_dir)
+        argv = ["--input-dir", in_dir, "--output-dir", out_dir] + common
+        extra = args.cn_args
+        module = "process_cn_to_en"
+    else:
+        in_dir = os.path.join(workdir, "en")
+        out_dir = os.path.join(workdir, "content")
+        if not os.path.isdir(in_dir):
+            # Run on its own: English input made from the fake pages
+            write_pages([{**p, "body": _translate(p["body"])} for p in svc.pages], in_dir)
+        argv = ["--input-dir", in_dir, "--ollama-wait", "600"] + common
+        extra = args.fm_args
+        module = "post_process_en_front_matter"
+    svc.reset()
+    print(f"运行 {name} ...", flush=True)
+    run = run_entry(module, argv + shlex.split(extra or ""), workdir, os.path.join(workdir, f"{name}.log"), args.webhook_secret)
+    result = summarize(name, run, collect_pages(out_dir, svc.first_seen), svc.calls)
+    if run["exit_code"] != 0 or not result["pages"]:
+        print(f"  {name} 异常：退出码={run['exit_code']} 页面={result['pages']}，日志：{os.path.join(workdir, name + '.log')}")
+    return result
+
+
+def git_commit() -> Dict[str, object]:
+    def _git(*cmd: str) -> str:
+        try:
+            return subprocess.run(["git", *cmd], cwd=REPO_ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except Exception:
+            return ""
+    return {"commit": _git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(_git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def _fmt(value: object, spec: str) -> str:
+    return format(value, spec) if value is not None else "-"
+
+
+def _print_results(results: List[Dict[str, object]], baseline: Optional[Dict[str, Dict[str, object]]]) -> None:
+    print(f"{'阶段':<14} {'页面':>6} {'耗时 s':>8} {'页/分':>8} {'p50 s':>7} {'p95 s':>7} {'RSS MB':>8} {'对比基线':>10}")
+    for r in results:
+        change = ""
+        base = (baseline or {}).get(str(r["stage"]))
+        if base and base.get("pages_per_min"):
+            change = f"{(float(r['pages_per_min']) / float(base['pages_per_min']) - 1) * 100:+.1f}%"
+        print(
+            f"{r['stage']:<14} {r['pages']:>6} {r['wall_s']:>8.2f} {r['pages_per_min']:>8.1f} "
+            f"{_fmt(r['latency_p50_s'], '.2f'):>7} {_fmt(r['latency_p95_s'], '.2f'):>7} {_fmt(r['peak_rss_mb'], '.1f'):>8} {change:>10}"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="端到端吞吐基准：本地模拟 Firecrawl 与 Ollama，运行抓取与中译英流程")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="运行的阶段（默认全部，按顺序）")
+    parser.add_argument("--pages", type=int, default=60, help="模拟站点的页面数")
+    parser.add_argument("--paragraphs", type=int, default=24, help="每页正文段落数（控制页面大小）")
+    parser.add_argument("--batch-size", type=int, default=10, help="Firecrawl 每个状态分页返回的页面数")
+    parser.add_argument("--html", action="store_true", help="Firecrawl 只返回 HTML（不返回 markdown）")
+    parser.add_argument("--firecrawl-latency", type=float, default=0.2, help="每次 Firecrawl 状态请求的延迟秒数")
+    parser.add_argument("--scrape-rate", type=float, default=0.0, help="模拟 Firecrawl 每秒完成的页面数（默认 0，即启动时全部就绪）")
+    parser.add_argument("--ollama-latency", type=float, default=0.2, help="每次 Ollama 生成调用的基础延迟秒数")
+    parser.add_argument("--ollama-ms-per-kchar", type=float, default=20.0, help="每 1000 个提示字符额外增加的延迟毫秒数")
+    parser.add_argument("--ollama-parallel", type=int, default=4, help="模拟 Ollama 同时处理的请求数（OLLAMA_NUM_PARALLEL）")
+    parser.add_argument("--webhook", action="store_true", help="crawl 阶段使用 webhook 模式（--webhook），由模拟 Firecrawl 推送签名的页面事件")
+    parser.add_argument("--webhook-secret", default="bench-secret", help="模拟 Firecrawl 签名 webhook 所用的密钥（同时作为 FIRECRAWL_WEBHOOK_SECRET 传给子进程）")
+    parser.add_argument("--webhook-drop-every", type=int, default=0, help="每 N 个页面丢弃一个 crawl.page 事件，由状态接口补齐（默认 0 不丢弃）")
+    parser.add_argument("--webhook-dup-every", type=int, default=0, help="每 N 个页面重复推送一次 crawl.page 事件（默认 0 不重复）")
+    parser.add_argument("--model", default="bench-model", help="模拟 Ollama 报告的模型名")
+    parser.add_argument("--crawl-args", default="", help="追加给 crawl_with_firecrawl.py 的参数，如 \"--workers 4\"")
+    parser.add_argument("--cn-args", default="", help="追加给 process_cn_to_en.py 的参数")
+    parser.add_argument("--fm-args", default="", help="追加给 post_process_en_front_matter.py 的参数")
+    parser.add_argument("--output", default="", help="结果 JSON 路径（默认 .cache/bench/e2e-<提交>-<时间>.json）")
+    parser.add_argument("--baseline", default="", help="与之前的结果 JSON 对比每分钟页数")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录（输出文件与各阶段日志）")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = {r["stage"]: r for r in json.load(f).get("results", [])}
+        except Exception as e:
+            print(f"无法读取基线结果 {args.baseline}：{e}")
+
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    svc = FakeServices(args).start()
+    results: List[Dict[str, object]] = []
+    try:
+        for stage in [s for s in STAGES if s in args.stages]:
+            results.append(run_stage(stage, svc, args, workdir))
+    finally:
+        svc.stop()
+        if args.keep:
+            print(f"工作目录：{workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    meta = git_commit()
+    report = {
+        **meta,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "keep")},
+        "results": results,
+    }
+    out_path = args.output or os.path.join(REPO_ROOT, ".cache", "bench", f"e2e-{meta['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    _print_results(results, baseline)
+    print(f"结果已写入 {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,28 @@ import asyncio
 import logging
 import os
 import re
-import time
 import sys
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
-from urllib.parse import urlparse
 from firecrawl import AsyncFirecrawl,Firecrawl  # type: ignore
 
 import requests
 
+from .firecrawl_poller import CrawlPoller
+from .firecrawl_webhook import DEFAULT_IDLE_TIMEOUT, DEFAULT_LISTEN, WebhookReceiver, iter_webhook_batches, webhook_enabled_default
+from .job_store import PipelineJobs, open_pipeline_jobs
+
 # 全局计数：本次运行已写入的 Markdown 文件数量
 ITEM_COUNTER = 0
+# 任务进行中两次状态查询的最短间隔：本脚本一直以 3 秒为下限，FIRECRAWL_MIN_DELAY 只能调大
+MIN_POLL_DELAY = 3.0
+
+
+def poll_min_delay() -> float:
+    try:
+        return max(float(os.environ.get("FIRECRAWL_MIN_DELAY", MIN_POLL_DELAY)), MIN_POLL_DELAY)
+    except Exception:
+        return MIN_POLL_DELAY
 
 
 def setup_logger():
@@ -68,6 +79,7 @@ def call_firecrawl_start_async(
     scrape_options: Optional[Dict[str, Any]] = None,
     max_discovery_depth: int = 3,
     crawl_entire_domain: bool = False,
+    webhook: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     scrape_options = scrape_options or {"formats": ["markdown", "html"]}
     if not start_url or not isinstance(start_url, str) or not start_url.strip():
@@ -104,7 +116,8 @@ def call_firecrawl_start_async(
                 scrape_options=scrape_options,
                 max_concurrency=max_concurrency,
                 max_discovery_depth=max_discovery_depth,
-                crawl_entire_domain=crawl_entire_domain
+                crawl_entire_domain=crawl_entire_domain,
+                webhook=webhook,
             )
         started_id = started.get("id") if isinstance(started, dict) else getattr(started, "id", None)
         start_status_url = f"{firecrawl_base.rstrip('/')}/v2/crawl/{started_id or ''}"
@@ -126,6 +139,8 @@ def call_firecrawl_start_async(
         "maxDiscoveryDepth": max_discovery_depth,
         "crawlEntireDomain": crawl_entire_domain,
     }
+    if webhook:
+        payload["webhook"] = webhook
     headers = {"Authorization": auth_header} if auth_header else None
     try:
         resp = requests.post(endpoint, json=payload, headers=headers, timeout=60)
@@ -147,84 +162,14 @@ def call_firecrawl_start_async(
 
 
 def call_firecrawl_next_async(next_url: str, auth_header: str = "", firecrawl_base: Optional[str] = None) -> Dict[str, Any]:
+    """轮询一页抓取状态，直到该页有数据或任务结束；等待间隔按进度自适应（见 firecrawl_poller）。"""
     if not next_url:
         return {}
-
-    api_key: Optional[str] = None
+    poller = CrawlPoller(next_url, auth_header, firecrawl_base, min_delay=poll_min_delay())
     try:
-        parsed = urlparse(next_url)
-        parsed_base = f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme and parsed.netloc else None
-        m = re.search(r"/v2/crawl/([a-zA-Z0-9\-]+)", next_url)
-        crawl_id = m.group(1) if m else None
-    except Exception:
-        parsed_base = None
-        crawl_id = None
-
-    if auth_header and auth_header.strip():
-        ah = auth_header.strip()
-        api_key = ah[7:].strip() if ah.lower().startswith("bearer ") else ah
-    if not api_key:
-        api_key = os.environ.get("FIRECRAWL_API_KEY") or os.environ.get("FIRECRAWL_TOKEN")
-
-    try:
-        min_delay = float(os.environ.get("FIRECRAWL_MIN_DELAY", 3.0))
-    except Exception:
-        min_delay = 3.0
-
-    headers = {"Authorization": auth_header} if auth_header else None
-
-    # 选择有效的后端地址：外部传入 > 从 next_url 解析 > 环境变量/默认
-    effective_base = None
-    if firecrawl_base and firecrawl_base.strip():
-        effective_base = firecrawl_base.rstrip("/")
-    elif parsed_base:
-        effective_base = parsed_base
-    else:
-        effective_base = os.environ.get("FIRECRAWL_BASE_URL", "http://localhost:3002")
-
-    while True:
-        result: Optional[Dict[str, Any]] = None
-
-        # 优先 SDK（有 crawl_id 时，使用有效后端地址）
-        if crawl_id:
-            try:
-                from firecrawl import Firecrawl  # type: ignore
-                kwargs = {}
-                if api_key:
-                    kwargs["api_key"] = api_key
-                kwargs["api_url"] = effective_base
-                client = Firecrawl(**kwargs)
-                sdk_status = client.get_crawl_status(crawl_id)
-                logging.info(f"SDK 状态查询：{sdk_status}")
-                result = {
-                    "data": getattr(sdk_status, "data", None),
-                    "next": getattr(sdk_status, "next", None),
-                    "status": getattr(sdk_status, "status", None),
-                    "completed": getattr(sdk_status, "completed", 0),
-                    "total": getattr(sdk_status, "total", 0),
-                }
-            except Exception as e:
-                logging.warning(f"SDK 状态查询失败，回退到 HTTP：{e}")
-
-        if result is None:
-            try:
-                r = requests.get(next_url, headers=headers, timeout=60)
-                r.raise_for_status()
-                result = r.json()
-            except Exception as e:
-                logging.warning(f"同步请求状态查询失败：{e}")
-
-        total = (result or {}).get("total", 0) or 0
-        completed = (result or {}).get("completed", 0) or 0
-
-        if (total == 1 and completed == 1) or (total > 1 and completed > 1):
-            return result or {}
-
-        if total < 1 or completed < 1:
-            time.sleep(max(min_delay, 3.0))
-            continue
-
-        return result or {}
+        return poller.wait_ready()
+    finally:
+        poller.close()
 
 
 def ensure_dir(path: str) -> None:
@@ -265,7 +210,7 @@ def build_cn_front_matter(meta: Dict[str, Any], dt_obj: Optional[datetime] = Non
     return "\n".join(fm)
 
 
-def write_cn_markdown(item: Dict[str, Any], out_dir: str) -> Optional[str]:
+def write_cn_markdown(item: Dict[str, Any], out_dir: str, jobs: Optional[PipelineJobs] = None) -> Optional[str]:
     content = (
         item.get("markdown")
         or (item.get("content") or {}).get("markdown")
@@ -274,6 +219,11 @@ def write_cn_markdown(item: Dict[str, Any], out_dir: str) -> Optional[str]:
     )
     meta = item.get("metadata") or {}
     url = meta.get("sourceURL") or meta.get("url") or ""
+    if jobs:
+        # 同一来源已写出过中文文件（重复轮询或重启）则不再生成 -2 副本
+        done = jobs.get(url, "fetched", require_path=True)
+        if done:
+            return done["path"]
     ensure_dir(out_dir)
     path = choose_filename(meta, url, out_dir)
     # 计算 lastmod 的日期增量：计数超过 100 后，每三个递增一天
@@ -291,6 +241,8 @@ def write_cn_markdown(item: Dict[str, Any], out_dir: str) -> Optional[str]:
         f.write(fm)
         f.write(body)
     logging.info(f"写入中文 Markdown: {path}")
+    if jobs:
+        jobs.mark(url, "fetched", payload={"title": meta.get("title") or "", "description": meta.get("description") or ""}, path=path)
     return path
 
 
@@ -305,6 +257,12 @@ def main() -> None:
     parser.add_argument("--max-concurrency", type=int, default=10)
     parser.add_argument("--max-depth", type=int, default=3)
     parser.add_argument("--crawl-entire-domain", type=bool, default=True)
+    parser.add_argument("--webhook", action="store_true", default=webhook_enabled_default(), help="webhook 模式：页面完成即由 Firecrawl 推送并写入，不再按间隔轮询状态")
+    parser.add_argument("--webhook-listen", default=os.environ.get("FIRECRAWL_WEBHOOK_LISTEN", DEFAULT_LISTEN), help="webhook 接收端监听地址 host:port（默认 127.0.0.1:0）")
+    parser.add_argument("--webhook-url", default=os.environ.get("FIRECRAWL_WEBHOOK_URL", ""), help="提供给 Firecrawl 的回调地址（默认由监听地址生成）")
+    parser.add_argument("--webhook-idle", type=float, default=float(os.environ.get("FIRECRAWL_WEBHOOK_IDLE", DEFAULT_IDLE_TIMEOUT) or DEFAULT_IDLE_TIMEOUT), help="超过该秒数未收到 webhook 事件时查询一次抓取状态")
+    parser.add_argument("--state-db", default=os.environ.get("STATE_DB", ""), help="阶段状态库（SQLite）路径，与 process_cn_to_en / post_process_en_front_matter 共用（默认 .cache/pipeline_state.sqlite3）")
+    parser.add_argument("--no-state-db", action="store_true", help="禁用阶段状态库")
     args = parser.parse_args()
 
     start_url = args.start_url or os.environ.get("FIRECRAWL_START_URL") or os.environ.get("START_URL")
@@ -316,6 +274,13 @@ def main() -> None:
     if auth_header and not auth_header.lower().startswith("bearer "):
         auth_header = f"Bearer {auth_header}"
 
+    receiver: Optional[WebhookReceiver] = None
+    if args.webhook:
+        try:
+            receiver = WebhookReceiver(args.webhook_listen, args.webhook_url, os.environ.get("FIRECRAWL_WEBHOOK_SECRET", "")).start()
+        except Exception as e:
+            logging.warning(f"Firecrawl webhook 接收端启动失败，改用轮询：{e}")
+
     started = call_firecrawl_start_async(
         start_url=start_url,
         firecrawl_base=args.firecrawl_base,
@@ -323,7 +288,8 @@ def main() -> None:
         limit=args.limit,
         max_concurrency=args.max_concurrency,
         max_discovery_depth=args.max_depth,
-        crawl_entire_domain=args.crawl_entire_domain
+        crawl_entire_domain=args.crawl_entire_domain,
+        webhook=receiver.webhook_config() if receiver else None,
     )
 
     if not started.get("success"):
@@ -335,22 +301,36 @@ def main() -> None:
         logging.error("未获取到状态查询 URL")
         return
 
-    while True:
-        status = call_firecrawl_next_async(next_url, auth_header, args.firecrawl_base)
-        data = status.get("data") or []
-        for item in data:
-            try:
-                write_cn_markdown(item, args.output_dir)
-            except Exception as e:
-                logging.warning(f"写入失败：{e}")
-
-        # 继续轮询直到完成条件满足（在 call_firecrawl_next_async 内部处理）
-        total = status.get("total", 0)
-        completed = status.get("completed", 0)
-        if total > 1 and completed == total:
-            logging.info("抓取任务已达到停止条件，结束。")
-            break
-        time.sleep(max(float(os.environ.get("FIRECRAWL_MIN_DELAY", 3.0)), 3.0))
+    jobs = open_pipeline_jobs("cn", args.state_db or None, enabled=not args.no_state_db)
+
+    if receiver:
+        try:
+            for docs in iter_webhook_batches(receiver, started.get("id"), next_url, auth_header, 0, args.webhook_idle, args.firecrawl_base, min_delay=poll_min_delay()):
+                for item in docs:
+                    try:
+                        write_cn_markdown(item, args.output_dir, jobs)
+                    except Exception as e:
+                        logging.warning(f"写入失败：{e}")
+        finally:
+            receiver.close()
+        jobs.log_stats()
+        return
+
+    # 每个页面只交付一次：按游标翻页，任务进行中按进度自适应等待，直到任务结束
+    poller = CrawlPoller(next_url, auth_header, args.firecrawl_base, min_delay=poll_min_delay())
+    try:
+        for docs in poller.iter_batches():
+            for item in docs:
+                try:
+                    write_cn_markdown(item, args.output_dir, jobs)
+                except Exception as e:
+                    logging.warning(f"写入失败：{e}")
+    finally:
+        poller.close()
+    if poller.finished:
+        logging.info("抓取任务已达到停止条件，结束。")
+    poller.log_stats()
+    jobs.log_stats()
 
 
 if __name__ == "__main__":
@@ -26,7 +26,6 @@ Notes:
 
 import argparse
 import asyncio
-import html as html_module
 import json
 import logging
 import os
@@ -34,31 +33,47 @@ import re
 import sys
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from difflib import SequenceMatcher
 from urllib.parse import urljoin, urldefrag, urlparse
 
 import httpx  # type: ignore
-import html2text  # type: ignore
 import requests
-from markdownify import markdownify as md  # type: ignore
 from firecrawl import AsyncFirecrawl  # type: ignore
-from ollama import Client  # type: ignore
 from .fm_utils import (
     build_yaml,
+    contains_cjk,
     get_zh_en_translator,
+    parse_ollama_response,
+    read_front_matter,
     translate_front_matter_fields,
+    warm_zh_en_translator,
 )
+from .firecrawl_poller import DEFAULT_PREFETCH, BatchPrefetcher, CrawlPoller
+from .html_convert import DEFAULT_MIN_BATCH as DEFAULT_HTML_MIN_BATCH, HtmlConversionPool, default_workers as default_html_workers, html_to_markdown
+from .firecrawl_webhook import DEFAULT_IDLE_TIMEOUT, DEFAULT_LISTEN, WebhookReceiver, iter_webhook_batches, webhook_enabled_default
+from .job_store import PipelineJobs, content_hash, open_pipeline_jobs
+from .llm_cache import configure_llm_cache
+from .manifest_journal import ManifestJournal, replay_manifest
+from .metrics import DEFAULT_INTERVAL as DEFAULT_METRICS_INTERVAL, close_metrics, configure_metrics, get_metrics
+from .taxonomy import TaxonomyPool
+from .term_embeddings import DEFAULT_EMBED_MODEL, TERM_MATCH_MODES, configure_term_matcher, get_term_matcher
+from .near_dup import DEDUPE_MODES, DEFAULT_THRESHOLD as DEFAULT_DEDUPE_THRESHOLD, NearDupIndex
+from .ngram_index import closest_option
+from .md_chunker import DEFAULT_CHUNK_TOKENS, chunk_markdown, num_ctx_for, split_padding
+from .ollama_client import close_ollama_clients, configure_ollama_clients, get_ollama_client
+from .profiling import DEFAULT_DIR as DEFAULT_PROFILE_DIR, DEFAULT_MEM_EVERY as DEFAULT_PROFILE_MEM_EVERY, close_profiling, configure_profiling, profile_page
 
 def setup_logger():
     """Configure logging to write to ./logs/crawl.log and console.
-    Creates a sibling 'logs' directory next to this script if missing.
+    Creates a sibling 'logs' directory next to this script if missing;
+    the CRAWL_LOG_DIR environment variable puts crawl.log elsewhere.
     """
     try:
         base_dir = os.path.dirname(os.path.abspath(__file__))
     except Exception:
         base_dir = os.getcwd()
-    logs_dir = os.path.join(base_dir, "logs")
+    logs_dir = os.environ.get("CRAWL_LOG_DIR") or os.path.join(base_dir, "logs")
     try:
         os.makedirs(logs_dir, exist_ok=True)
     except Exception:
@@ -278,7 +293,7 @@ def write_markdown_file(dir_path: str, filename: str, title: str, description: s
     }
     yaml_text = build_yaml(out_fm)
     full_path = os.path.join(dir_path, filename)
-    with open(full_path, "w", encoding="utf-8") as f:
+    with get_metrics().timer("file_write"), open(full_path, "w", encoding="utf-8") as f:
         f.write(yaml_text)
         if md_body and not md_body.startswith("\n"):
             f.write("\n" + md_body)
@@ -304,177 +319,111 @@ def to_posix_path(path: str) -> str:
     return path.replace("\\", "/")
 
 def load_manifest(manifest_path: str) -> dict:
-    """Load manifest.json if it exists, otherwise return empty dict."""
-    try:
-        if os.path.exists(manifest_path):
-            with open(manifest_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception as e:
-        logging.warning(f"Failed to load manifest at {manifest_path}: {e}")
-    return {}
+    """Load manifest.json plus its append-only journal (see manifest_journal.py),
+    otherwise return empty dict."""
+    return replay_manifest(manifest_path)
 
 
-def convert_images_to_reference(md_text: str) -> str:
-    """Convert inline image syntax to reference-style images and append references.
-    Example: ![alt](url "title") -> ![alt][img-1] with a footnote [img-1]: url "title"
-    """
-    refs = []
-    counter = 1
-
-    def repl(m):
-        nonlocal counter
-        alt = m.group(1) or ""
-        url = m.group(2)
-        title = m.group(3)
-        ref_id = f"img-{counter}"
-        counter += 1
-        refs.append((ref_id, url, title))
-        return f"![{alt}][{ref_id}]"
-
-    # Only transform inline pattern; keep existing reference-style untouched
-    new_md = re.sub(r"!\[([^\]]*)\]\(([^)\s]+)(?:\s+\"([^\"]*)\")?\)", repl, md_text)
-    if refs:
-        new_md = new_md.rstrip() + "\n\n"
-        for ref_id, url, title in refs:
-            if title:
-                new_md += f"[{ref_id}]: {url} \"{title}\"\n"
-            else:
-                new_md += f"[{ref_id}]: {url}\n"
-    return new_md
+def manifest_rel_path(path: str, output_dir: str) -> str:
+    """POSIX path of a written file relative to output_dir, as stored in the manifest."""
+    try:
+        rel_p = os.path.relpath(path, output_dir)
+    except Exception:
+        rel_p = path
+    return to_posix_path(rel_p)
 
 
-def html_to_markdown(html: str) -> str:
-    """Convert HTML to Markdown while preserving links and using reference-style images.
-    Tries `html2text`, then `markdownify`, and finally a robust fallback.
+def _generate_with_ollama(ollama_base: str, model: str, prompt: str, options: dict, timeout: float | None = None, task: str = "generate", fmt: str | None = None, validate=None, stop_on_json: bool = False) -> str | None:
+    """Run one generate call through the shared pooled client and return the raw
+    `response` text (served from the LLM cache when possible).
+    `fmt="json"` asks Ollama for structured JSON output; with `--ollama-stream`,
+    `stop_on_json` ends the generation as soon as a complete JSON value that
+    `validate` accepts arrived.
+    Returns None on failure.
     """
-    if not html:
-        return ""
-    # Try html2text
     try:
-        h = html2text.HTML2Text()
-        h.ignore_links = False  # always keep links
-        h.ignore_images = False
-        h.inline_links = True   # keep original link inline so URL is visible in context
-        h.body_width = 0
-        md_text = h.handle(html)
-        return convert_images_to_reference(md_text)
-    except Exception:
-        pass
-    # Try markdownify
-    try:
-        md_text = md(html, heading_style="ATX")
-        return convert_images_to_reference(md_text)
-    except Exception:
-        pass
-    # Fallback: transform <a> and <img> first, then strip other tags, preserving references.
-    img_refs = []
-    img_counter = 1
-
-    def img_repl(m):
-        nonlocal img_counter
-        src = m.group(1)
-        alt = m.group(2) or ""
-        title = m.group(3)
-        ref_id = f"img-{img_counter}"
-        img_counter += 1
-        img_refs.append((ref_id, src, title))
-        return f"![{alt}][{ref_id}]"
-
-    def a_repl(m):
-        href = m.group(1)
-        text = m.group(2).strip()
-        text = text if text else href
-        return f"[{text}]({href})"
-
-    working = html
-    # Remove script/style content early
-    working = re.sub(r"(?is)<(script|style)[^>]*>.*?</\\1>", "", working)
-    # Replace images with reference-style placeholders
-    working = re.sub(r"(?is)<img[^>]*src=\"([^\"]+)\"[^>]*(?:alt=\"([^\"]*)\")?[^>]*(?:title=\"([^\"]*)\")?[^>]*>", img_repl, working)
-    # Replace anchors with inline markdown links
-    working = re.sub(r"(?is)<a[^>]*href=\"([^\"]+)\"[^>]*>(.*?)</a>", a_repl, working)
-    # Basic line breaks
-    working = re.sub(r"(?is)<br\\s*/?>", "\n", working)
-    working = re.sub(r"(?is)</p\\s*>", "\n\n", working)
-    # strip remaining tags
-    working = re.sub(r"(?is)<[^>]+>", "", working)
-    md_text = html_module.unescape(working).strip()
-    if img_refs:
-        md_text = md_text.rstrip() + "\n\n"
-        for ref_id, src, title in img_refs:
-            if title:
-                md_text += f"[{ref_id}]: {src} \"{title}\"\n"
-            else:
-                md_text += f"[{ref_id}]: {src}\n"
-    return md_text
+        raw = get_ollama_client(ollama_base).generate(model, prompt, options=options, fmt=fmt, timeout=timeout, validate=validate, stop_on_json=stop_on_json, task=task)
+        if isinstance(raw, str) and raw.strip():
+            return raw
+    except Exception as e:
+        logging.error(f"Ollama {task} failed: {e}")
+    return None
 
-def translate_to_english_with_ollama(ollama_base: str, model: str, text: str, wait: float = 0.0) -> str:
+
+def _clean_keywords(keywords: list[str], max_keywords: int) -> list[str]:
+    """Strip CJK, keep English letters/numbers/hyphens and spaces, lowercase, dedupe and cap."""
+    cleaned: list[str] = []
+    for kw in keywords:
+        s = re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", kw)
+        s = re.sub(r"[^A-Za-z0-9\-\s]", " ", s)
+        s = re.sub(r"\s+", " ", s).strip()
+        if s:
+            cleaned.append(s.lower())
+    final: list[str] = []
+    seen = set()
+    for s in cleaned:
+        if s not in seen:
+            seen.add(s)
+            final.append(s)
+        if len(final) >= max_keywords:
+            break
+    return final
+
+
+def translate_to_english_with_ollama(ollama_base: str, model: str, text: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> str:
     """Translate Markdown text to English using a local Ollama model.
     Preserves Markdown structure, link URLs, and reference-style image identifiers.
-    Returns translated text, or original on failure.
+    Long text is split with md_chunker into token-budgeted chunks that never break
+    a Markdown construct; chunks without Chinese are kept as is.
+    Returns translated text; a chunk whose translation fails keeps its original text.
     """
     if not text or not text.strip():
         return text
-    # 可选等待，避免频繁调用或模型加载抖动
-    if wait and wait > 0:
-        try:
-            time.sleep(wait)
-        except Exception:
-            pass
-    # 优先使用官方 Ollama Python 库
-    try:
-        client = Client(host=ollama_base)
-        resp = client.generate(
-            model=model,
-            prompt=(
-                "You are a professional translator. Translate the following Markdown to English only. "
-                "Preserve Markdown formatting, keep link URLs unchanged, and DO NOT alter reference identifiers like [img-1]. "
-                "Do not include any Chinese characters in the output. Output ONLY the translated English Markdown without extra commentary.\n\n"
-                + text
-            ),
-            stream=False,
-            options={"temperature": 0.25, "num_ctx": 512},
+    num_ctx = num_ctx_for(chunk_tokens)
+    parts: list[str] = []
+    for chunk in chunk_markdown(text, chunk_tokens):
+        lead, core, trail = split_padding(chunk)
+        if not contains_cjk(core):
+            parts.append(chunk)
+            continue
+        prompt = (
+            "You are a professional translator. Translate the following Markdown to English only. "
+            "Preserve Markdown formatting, keep link URLs unchanged, and DO NOT alter reference identifiers like [img-1]. "
+            "Do not include any Chinese characters in the output. Output ONLY the translated English Markdown without extra commentary.\n\n"
+            + core
         )
-        translated = resp.get("response") if isinstance(resp, dict) else None
-        if isinstance(translated, str) and translated.strip():
-            translated = re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", translated)
-            return translated
-    except ImportError:
-        # 回退到 HTTP API
-        pass
-    except Exception as e:
-        logging.error(f"Ollama translation (client) failed: {e}")
-    endpoint = ollama_base.rstrip("/") + "/api/generate"
-    prompt = (
-        "You are a professional translator. Translate the following Markdown to English only. "
-        "Preserve Markdown formatting, keep link URLs unchanged, and DO NOT alter reference identifiers like [img-1]. "
-        "Do not include any Chinese characters in the output. Output ONLY the translated English Markdown without extra commentary.\n\n"
-        + text
-    )
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "max_tokens": 70,
-        "temperature": 0.25,
-        "num_ctx": 512,
-    }
-    try:
-        resp = requests.post(endpoint, json=payload, timeout=120)
-        resp.raise_for_status()
-        data = resp.json()
-        translated = data.get("response")
+        translated = _generate_with_ollama(ollama_base, model, prompt, {"temperature": 0.25, "num_ctx": num_ctx}, task="translation")
         if isinstance(translated, str) and translated.strip():
             # Enforce English-only by stripping CJK characters if any remain
-            translated = re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", translated)
-            return translated
-    except requests.RequestException as e:
-        logging.error(f"Ollama translation failed: {e}")
-    # Fallback: return original text if translation fails
-    return text
+            parts.append(lead + re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", translated.strip()) + trail)
+        else:
+            # Fallback: keep the original chunk if translation fails
+            parts.append(chunk)
+    return "".join(parts)
+
+
+def _body_excerpt(body: str, chunk_tokens: int) -> str:
+    """Leading part of the body that fits an extraction prompt at num_ctx_for(chunk_tokens).
+    Cut on a Markdown block boundary instead of letting Ollama truncate silently."""
+    if not body:
+        return body
+    chunks = chunk_markdown(body, chunk_tokens * 2)
+    if len(chunks) > 1:
+        logging.debug(f"Body excerpt for extraction: kept 1/{len(chunks)} chunks ({len(chunks[0])}/{len(body)} chars)")
+    return chunks[0] if chunks else body
+
+
+def _is_taxonomy_json(raw: str) -> bool:
+    """Accept only a JSON object carrying a non-empty categories or tags list."""
+    m = re.search(r"\{[\s\S]*\}", raw)
+    try:
+        obj = json.loads(m.group(0) if m else raw)
+    except Exception:
+        return False
+    return isinstance(obj, dict) and any(isinstance(obj.get(k), list) and obj.get(k) for k in ("categories", "tags"))
 
 
-def extract_categories_and_tags_with_ollama(ollama_base: str, model: str, title: str, body: str, wait: float = 0.0) -> tuple[list[str], list[str]]:
+def extract_categories_and_tags_with_ollama(ollama_base: str, model: str, title: str, body: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> tuple[list[str], list[str]]:
     """Use local Ollama to extract English categories and tags from title/body.
     Expects the model to return a JSON object: {"categories": [...], "tags": [...]}.
     Returns (categories, tags). Falls back to simple heuristics on failure.
@@ -484,90 +433,29 @@ def extract_categories_and_tags_with_ollama(ollama_base: str, model: str, title:
     if not (title or body):
         return categories, tags
 
-    # 可选等待
-    if wait and wait > 0:
-        try:
-            time.sleep(wait)
-        except Exception:
-            pass
-    # 优先使用官方 Ollama Python 库
-    try:
-        client = Client(host=ollama_base)
-        resp = client.generate(
-            model=model,
-            prompt=(
-                "You are a taxonomy assistant. Based on the following English Markdown title and body, "
-                "derive 1-3 broad categories and 4-8 concise tags. "
-                "Respond ONLY with a compact JSON object using keys 'categories' and 'tags'. "
-                "Ensure all outputs are English and contain no Chinese characters.\n\n"
-                f"Title: {title}\n\n"
-                f"Body:\n{body}\n"
-            ),
-            stream=False,
-            options={"temperature": 0.25, "num_ctx": 512},
-        )
-        raw = resp.get("response") if isinstance(resp, dict) else None
-        if isinstance(raw, str):
-            m = re.search(r"\{[\s\S]*\}", raw)
-            text = m.group(0) if m else raw
-            try:
-                obj = json.loads(text)
-                cats = obj.get("categories")
-                tgs = obj.get("tags")
-                categories: list[str] = []
-                tags: list[str] = []
-                if isinstance(cats, list):
-                    categories = [str(x).strip() for x in cats if str(x).strip()]
-                if isinstance(tgs, list):
-                    tags = [str(x).strip() for x in tgs if str(x).strip()]
-                # Enforce English-only by stripping CJK characters
-                categories = [re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", c) for c in categories]
-                tags = [re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", t) for t in tags]
-                return categories, tags
-            except Exception:
-                pass
-    except ImportError:
-        pass
-    except Exception as e:
-        logging.error(f"Ollama taxonomy extraction (client) failed: {e}")
-    endpoint = ollama_base.rstrip("/") + "/api/generate"
     prompt = (
         "You are a taxonomy assistant. Based on the following English Markdown title and body, "
         "derive 1-3 broad categories and 4-8 concise tags. "
         "Respond ONLY with a compact JSON object using keys 'categories' and 'tags'. "
         "Ensure all outputs are English and contain no Chinese characters.\n\n"
         f"Title: {title}\n\n"
-        f"Body:\n{body}\n"
+        f"Body:\n{_body_excerpt(body, chunk_tokens)}\n"
     )
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "max_tokens": 70,
-        "temperature": 0.25,
-        "num_ctx": 512,
-    }
-    try:
-        resp = requests.post(endpoint, json=payload, timeout=120)
-        resp.raise_for_status()
-        data = resp.json()
-        raw = data.get("response")
-        if isinstance(raw, str):
-            # Try to locate a JSON object in the response
-            m = re.search(r"\{[\s\S]*\}", raw)
-            text = m.group(0) if m else raw
-            try:
-                obj = json.loads(text)
-                cats = obj.get("categories")
-                tgs = obj.get("tags")
-                if isinstance(cats, list):
-                    categories = [str(x).strip() for x in cats if str(x).strip()]
-                if isinstance(tgs, list):
-                    tags = [str(x).strip() for x in tgs if str(x).strip()]
-            except Exception:
-                pass
-    except requests.RequestException as e:
-        logging.error(f"Ollama taxonomy extraction failed: {e}")
+    raw = _generate_with_ollama(ollama_base, model, prompt, {"temperature": 0.25, "num_ctx": num_ctx_for(chunk_tokens)}, task="taxonomy extraction", validate=_is_taxonomy_json, stop_on_json=True)
+    if isinstance(raw, str):
+        # Try to locate a JSON object in the response
+        m = re.search(r"\{[\s\S]*\}", raw)
+        text = m.group(0) if m else raw
+        try:
+            obj = json.loads(text)
+            cats = obj.get("categories")
+            tgs = obj.get("tags")
+            if isinstance(cats, list):
+                categories = [str(x).strip() for x in cats if str(x).strip()]
+            if isinstance(tgs, list):
+                tags = [str(x).strip() for x in tgs if str(x).strip()]
+        except Exception:
+            pass
 
     # Basic fallback if extraction failed
     if not categories:
@@ -583,70 +471,25 @@ def extract_categories_and_tags_with_ollama(ollama_base: str, model: str, title:
     # Enforce English-only by stripping CJK characters
     categories = [re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", c) for c in categories]
     tags = [re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", t) for t in tags]
+    return categories, tags
+
+
+def _is_keyword_json(raw: str) -> bool:
+    """Accept only a non-empty JSON array of strings."""
+    m = re.search(r"\[[\s\S]*\]", raw)
+    try:
+        arr = json.loads(m.group(0) if m else raw)
+    except Exception:
+        return False
+    return isinstance(arr, list) and bool(arr) and all(isinstance(x, str) for x in arr) and any(x.strip() for x in arr)
 
 
-def extract_keywords_with_ollama(ollama_base: str, model: str, title: str, body: str, max_keywords: int = 70, wait: float = 0.0) -> list[str]:
+def extract_keywords_with_ollama(ollama_base: str, model: str, title: str, body: str, max_keywords: int = 70, chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> list[str]:
     """Use local Ollama to extract up to max_keywords English SEO keywords.
     Returns a list of unique, cleaned English keywords.
     """
     if max_keywords <= 0:
         max_keywords = 70
-    # 可选等待
-    if wait and wait > 0:
-        try:
-            time.sleep(wait)
-        except Exception:
-            pass
-    # 优先使用官方 Ollama Python 库
-    try:
-        client = Client(host=ollama_base)
-        resp = client.generate(
-            model=model,
-            prompt=(
-                "You are an SEO assistant. From the following English Markdown title and body, "
-                f"extract up to {max_keywords} concise English keywords for SEO. "
-                "Return ONLY a compact JSON array of strings, no explanations. "
-                "Keywords must be English words or phrases, deduplicated, no punctuation except hyphen. "
-                "Do not include Chinese characters.\n\n"
-                f"Title: {title}\n\n"
-                f"Body:\n{body}\n"
-            ),
-            stream=False,
-            options={"temperature": 0.25, "num_ctx": 512},
-        )
-        raw = resp.get("response") if isinstance(resp, dict) else None
-        keywords: list[str] = []
-        if isinstance(raw, str):
-            m = re.search(r"\[[\s\S]*\]", raw)
-            text = m.group(0) if m else raw
-            try:
-                arr = json.loads(text)
-                if isinstance(arr, list):
-                    keywords = [str(x).strip() for x in arr if str(x).strip()]
-            except Exception:
-                pass
-        if keywords:
-            cleaned: list[str] = []
-            for kw in keywords:
-                s = re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", kw)
-                s = re.sub(r"[^A-Za-z0-9\-\s]", " ", s)
-                s = re.sub(r"\s+", " ", s).strip()
-                if s:
-                    cleaned.append(s.lower())
-            final: list[str] = []
-            seen2 = set()
-            for s in cleaned:
-                if s not in seen2:
-                    seen2.add(s)
-                    final.append(s)
-                if len(final) >= max_keywords:
-                    break
-            return final
-    except ImportError:
-        pass
-    except Exception as e:
-        logging.error(f"Ollama keyword extraction (client) failed: {e}")
-    endpoint = ollama_base.rstrip("/") + "/api/generate"
     prompt = (
         "You are an SEO assistant. From the following English Markdown title and body, "
         f"extract up to {max_keywords} concise English keywords for SEO. "
@@ -654,34 +497,20 @@ def extract_keywords_with_ollama(ollama_base: str, model: str, title: str, body:
         "Keywords must be English words or phrases, deduplicated, no punctuation except hyphen. "
         "Do not include Chinese characters.\n\n"
         f"Title: {title}\n\n"
-        f"Body:\n{body}\n"
+        f"Body:\n{_body_excerpt(body, chunk_tokens)}\n"
     )
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "max_tokens": 70,
-        "temperature": 0.25,
-        "num_ctx": 512,
-    }
     keywords: list[str] = []
-    try:
-        resp = requests.post(endpoint, json=payload, timeout=120)
-        resp.raise_for_status()
-        data = resp.json()
-        raw = data.get("response")
-        if isinstance(raw, str):
-            # Try to locate a JSON array in the response
-            m = re.search(r"\[[\s\S]*\]", raw)
-            text = m.group(0) if m else raw
-            try:
-                arr = json.loads(text)
-                if isinstance(arr, list):
-                    keywords = [str(x).strip() for x in arr if str(x).strip()]
-            except Exception:
-                pass
-    except requests.RequestException as e:
-        logging.error(f"Ollama keyword extraction failed: {e}")
+    raw = _generate_with_ollama(ollama_base, model, prompt, {"temperature": 0.25, "num_ctx": num_ctx_for(chunk_tokens)}, task="keyword extraction", validate=_is_keyword_json, stop_on_json=True)
+    if isinstance(raw, str):
+        # Try to locate a JSON array in the response
+        m = re.search(r"\[[\s\S]*\]", raw)
+        text = m.group(0) if m else raw
+        try:
+            arr = json.loads(text)
+            if isinstance(arr, list):
+                keywords = [str(x).strip() for x in arr if str(x).strip()]
+        except Exception:
+            pass
 
     # Fallback: derive keywords from title and body
     if not keywords:
@@ -698,27 +527,58 @@ def extract_keywords_with_ollama(ollama_base: str, model: str, title: str, body:
                 deduped.append(t)
         keywords = deduped[:max_keywords]
 
-    # Clean: strip CJK, keep English letters/numbers/hyphens and spaces, lowercased
-    cleaned: list[str] = []
-    for kw in keywords:
-        s = re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", kw)
-        s = re.sub(r"[^A-Za-z0-9\-\s]", " ", s)
-        s = re.sub(r"\s+", " ", s).strip()
-        if s:
-            cleaned.append(s.lower())
+    return _clean_keywords(keywords, max_keywords)
 
-    # Final dedupe and cap
-    final: list[str] = []
-    seen2 = set()
-    for s in cleaned:
-        if s not in seen2:
-            seen2.add(s)
-            final.append(s)
-        if len(final) >= max_keywords:
-            break
 
-    return final
-    return categories, tags
+def _is_enrichment_json(raw: str) -> bool:
+    """Cache guard: only keep enrichment responses that parse into front matter fields."""
+    try:
+        parsed = parse_ollama_response(raw)
+    except Exception:
+        return False
+    return bool(parsed.get("title") or parsed.get("categories") or parsed.get("tags"))
+
+
+def enrich_page_with_ollama(ollama_base: str, model: str, title: str, description: str, body: str, max_keywords: int = 70, chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> dict | None:
+    """Ask Ollama once for everything the front matter needs from a page.
+    The model returns a single JSON object with the English title and description
+    plus categories, tags and keywords derived from the (already English) body.
+    Parsed with fm_utils.parse_ollama_response; returns None if no usable JSON came
+    back so the caller can fall back to the separate per-field calls.
+    """
+    if not (title or body):
+        return None
+    if max_keywords <= 0:
+        max_keywords = 70
+    prompt = (
+        "You are a translation, taxonomy and SEO assistant. Using the page below, respond ONLY with a compact JSON object "
+        "with these keys: 'title' (the page title translated to English), "
+        "'description' (the page description translated to English, or an empty string if none is given), "
+        "'categories' (1-3 broad categories), 'tags' (4-8 concise tags), "
+        f"'keywords' (up to {max_keywords} concise English SEO keywords, deduplicated, no punctuation except hyphen). "
+        "All values must be English and contain no Chinese characters.\n\n"
+        f"Title: {title}\n\n"
+        f"Description: {description}\n\n"
+        f"Body:\n{_body_excerpt(body, chunk_tokens)}\n"
+    )
+    raw = _generate_with_ollama(ollama_base, model, prompt, {"temperature": 0.25, "num_ctx": num_ctx_for(chunk_tokens)}, task="page enrichment", fmt="json", validate=_is_enrichment_json, stop_on_json=True)
+    if not isinstance(raw, str):
+        return None
+    try:
+        parsed = parse_ollama_response(raw, max_keywords=max_keywords, max_desc_len=1000)
+    except Exception as e:
+        logging.warning(f"Ollama page enrichment returned unparseable JSON: {e}")
+        return None
+    if not parsed.get("title") and not parsed.get("categories") and not parsed.get("tags"):
+        return None
+    # Enforce English-only by stripping CJK characters (parse_ollama_response only cleans categories/tags)
+    return {
+        "title": re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", parsed.get("title", "")).strip(),
+        "description": re.sub(r"[\u3400-\u4DBF\u4E00-\u9FFF]", "", parsed.get("description", "")).strip(),
+        "categories": [c for c in parsed.get("categories", []) if c],
+        "tags": [t for t in parsed.get("tags", []) if t],
+        "keywords": _clean_keywords(parsed.get("keywords", []), max_keywords),
+    }
 
 
 def normalize_category(name: str) -> str:
@@ -736,84 +596,39 @@ def normalize_tag(name: str) -> str:
     return s
 
 
-def _closest_option_local(term: str, options: list[str]) -> str:
-    if not options:
-        return term
-    best = options[0]
-    best_score = -1.0
-    for opt in options:
-        score = SequenceMatcher(None, term.lower(), opt.lower()).ratio()
-        if score > best_score:
-            best_score = score
-            best = opt
-    return best
+def _closest_option_local(term: str, options: list[str], label: str = "") -> str:
+    # Trigram TF-IDF index per pool, extended as the pool grows (SequenceMatcher without numpy)
+    return closest_option(term, options, label)
 
 
-def choose_closest_with_ollama(ollama_base: str, model: str, term: str, options: list[str], label: str, wait: float = 0.0) -> str:
+def choose_closest_with_ollama(ollama_base: str, model: str, term: str, options: list[str], label: str) -> str:
     """Ask Ollama to choose the closest option for the term among options.
     Falls back to local similarity if the call fails.
     """
     if not options:
         return term
-    # 可选等待
-    if wait and wait > 0:
-        try:
-            time.sleep(wait)
-        except Exception:
-            pass
-    # 优先使用官方 Ollama Python 库
-    try:
-        client = Client(host=ollama_base)
-        resp = client.generate(
-            model=model,
-            prompt=(
-                f"You are a taxonomy assistant. Choose the single closest {label} from the provided options for the term.\n"
-                f"Term: {term}\n"
-                f"Options (one per line):\n" + "\n".join(options) + "\n\n"
-                "Respond with ONLY the chosen option text, no extra words."
-            ),
-            stream=False,
-            options={"temperature": 0.25, "num_ctx": 512},
-        )
-        choice = resp.get("response") if isinstance(resp, dict) else None
-        if isinstance(choice, str):
-            choice = choice.strip()
-            for opt in options:
-                if choice.lower() == opt.lower():
-                    return opt
-    except ImportError:
-        pass
-    except Exception as e:
-        logging.error(f"Ollama closest-choice (client) failed: {e}")
-    endpoint = ollama_base.rstrip("/") + "/api/generate"
     prompt = (
         f"You are a taxonomy assistant. Choose the single closest {label} from the provided options for the term.\n"
         f"Term: {term}\n"
         f"Options (one per line):\n" + "\n".join(options) + "\n\n"
         "Respond with ONLY the chosen option text, no extra words."
     )
-    payload = {"model": model, "prompt": prompt, "stream": False, "max_tokens": 70, "temperature": 0.25, "num_ctx": 512}
-    try:
-        resp = requests.post(endpoint, json=payload, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-        choice = data.get("response")
-        if isinstance(choice, str):
-            choice = choice.strip()
-            # If the choice matches one of the options, return it; else fallback
-            for opt in options:
-                if choice.lower() == opt.lower():
-                    return opt
-    except requests.RequestException as e:
-        logging.error(f"Ollama closest-choice failed: {e}")
-    return _closest_option_local(term, options)
-
-
-def reconcile_terms(proposed: list[str], pool: list[str], max_size: int, ollama_base: str, ollama_model: str, for_category: bool, ollama_wait: float = 0.0) -> list[str]:
+    choice = _generate_with_ollama(ollama_base, model, prompt, {"temperature": 0.25, "num_ctx": 512}, task="closest-choice")
+    if isinstance(choice, str):
+        choice = choice.strip()
+        # If the choice matches one of the options, return it; else fallback
+        for opt in options:
+            if choice.lower() == opt.lower():
+                return opt
+    return _closest_option_local(term, options, label)
+
+
+def reconcile_terms(proposed: list[str], pool: TaxonomyPool, max_size: int, ollama_base: str, ollama_model: str, for_category: bool) -> list[str]:
     """Reconcile proposed terms with a global pool under a size cap.
     - Normalize terms
     - If pool size < cap and term not present, add to pool
-    - If at cap, map to closest existing option (via Ollama or local)
+    - If at cap, map to closest existing option (embedding search when enabled,
+      else via Ollama generate or local similarity)
     Returns the list of selected terms (canonical form from pool).
     """
     selected: list[str] = []
@@ -822,37 +637,44 @@ def reconcile_terms(proposed: list[str], pool: list[str], max_size: int, ollama_
         norm = normalize(term)
         if not norm:
             continue
-        # Case-insensitive membership check using lower()
-        pool_lower = [p.lower() for p in pool]
-        if norm.lower() in pool_lower:
-            # Use the canonical form from pool
-            idx = pool_lower.index(norm.lower())
-            selected.append(pool[idx])
+        # Case-insensitive lookup; the pool keeps the canonical form
+        canonical = pool.get(norm)
+        if canonical is not None:
+            selected.append(canonical)
             continue
         if len(pool) < max_size:
-            pool.append(norm)
-            selected.append(norm)
+            selected.append(pool.add(norm))
         else:
-            choice = choose_closest_with_ollama(ollama_base, ollama_model, norm, pool, "category" if for_category else "tag", wait=ollama_wait)
+            label = "category" if for_category else "tag"
+            matcher = get_term_matcher()
+            # Embedding search first; the generate call only settles low-confidence matches among the top candidates
+            choice = matcher.choose(norm, pool.terms, lambda candidates: choose_closest_with_ollama(ollama_base, ollama_model, norm, candidates, label)) if matcher else None
+            if choice is None:
+                choice = choose_closest_with_ollama(ollama_base, ollama_model, norm, pool.terms, label)
             selected.append(choice)
     return selected
 
 
-def call_firecrawl_start(firecrawl_base: str, start_url: str, auth_header: str = "") -> dict:
+def call_firecrawl_start(firecrawl_base: str, start_url: str, auth_header: str = "", webhook: dict | None = None, change_tracking: bool = False) -> dict:
     """同步包装：委托到异步的启动函数。"""
+    started = time.perf_counter()
     try:
-        return asyncio.run(call_firecrawl_start_async(firecrawl_base, start_url, auth_header))
+        data = asyncio.run(call_firecrawl_start_async(firecrawl_base, start_url, auth_header, webhook, change_tracking))
     except RuntimeError:
         loop = asyncio.get_event_loop()
-        return loop.run_until_complete(call_firecrawl_start_async(firecrawl_base, start_url, auth_header))
+        data = loop.run_until_complete(call_firecrawl_start_async(firecrawl_base, start_url, auth_header, webhook, change_tracking))
+    get_metrics().observe("firecrawl_start", time.perf_counter() - started, error=not (isinstance(data, dict) and data.get("id")))
+    return data
 
 
-async def call_firecrawl_start_async(firecrawl_base: str, start_url: str, auth_header: str = "") -> dict:
+async def call_firecrawl_start_async(firecrawl_base: str, start_url: str, auth_header: str = "", webhook: dict | None = None, change_tracking: bool = False) -> dict:
     """启动 Firecrawl v2 爬取并返回官方 start 响应结构。
 
     返回结构体与官方 API /v2/crawl 一致：
     {"success": true, "id": "<string>", "url": "<string>"}
     不在此函数中拉取数据，数据获取由调用方使用返回的 url 调用状态接口完成。
+    传入 webhook（{"url": ..., "events": [...]}）时，Firecrawl 会把每个完成的页面推送到该地址。
+    change_tracking 为真时在 formats 中加入 changeTracking，每个页面附带与上次抓取相比的 changeStatus。
     """
     # 读取限制与默认抓取选项
     try:
@@ -895,6 +717,10 @@ async def call_firecrawl_start_async(firecrawl_base: str, start_url: str, auth_h
                     scrape_options.pop("crawlOptions", None)
         except Exception as e:
             logging.warning(f"Failed to parse FIRECRAWL_EXTRA_SCRAPE_OPTIONS: {e}")
+    if change_tracking:
+        formats = scrape_options.get("formats") if isinstance(scrape_options.get("formats"), list) else ["markdown"]
+        # changeTracking 依赖 markdown 格式
+        scrape_options["formats"] = formats + [f for f in ("markdown", "changeTracking") if f not in formats]
 
     # 尝试使用官方异步 SDK
     try:
@@ -929,6 +755,7 @@ async def call_firecrawl_start_async(firecrawl_base: str, start_url: str, auth_h
             sitemap=sitemap_strategy,
             max_discovery_depth=max_discovery_depth,
             crawl_entire_domain=crawl_entire_domain,
+            webhook=webhook,
         )
         start_status_url = f"{firecrawl_base.rstrip('/')}/v2/crawl/{getattr(started, 'id', '')}"
         return {
@@ -950,6 +777,8 @@ async def call_firecrawl_start_async(firecrawl_base: str, start_url: str, auth_h
         "maxDiscoveryDepth": max_discovery_depth,
         "crawlEntireDomain": crawl_entire_domain,
     }
+    if webhook:
+        payload["webhook"] = webhook
     headers = {"Authorization": auth_header} if auth_header else None
     try:
         # 在异步函数中使用 httpx
@@ -988,119 +817,43 @@ def call_firecrawl_next(next_url: str, auth_header: str = "", firecrawl_base: st
 
 
 async def call_firecrawl_next_async(next_url: str, auth_header: str = "", firecrawl_base: str | None = None) -> dict:
-    """异步获取下一页数据：优先使用 SDK（在线程中执行），否则使用 httpx 异步请求。
+    """获取一页抓取状态：在后台线程中用 CrawlPoller 轮询，直到该页有数据或任务结束。
 
-    返回结构保持为包含 data 与 next 的字典。
+    返回结构保持为包含 data 与 next 的字典（data 中的 SDK 文档已转换为 dict）。
+    等待间隔按抓取进度自适应（FIRECRAWL_MIN_DELAY ~ FIRECRAWL_MAX_DELAY，带随机抖动）。
     """
     if not next_url:
         return {}
-    # 解析 api_url 与 crawl_id
-    api_key = None
+    poller = CrawlPoller(next_url, auth_header, firecrawl_base)
     try:
-        parsed = urlparse(next_url)
-        parsed_base = f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme and parsed.netloc else None
-        m = re.search(r"/v2/crawl/([a-zA-Z0-9\-]+)", next_url)
-        crawl_id = m.group(1) if m else None
-    except Exception:
-        parsed_base = None
-        crawl_id = None
+        return await asyncio.to_thread(poller.wait_ready)
+    finally:
+        poller.close()
 
-    # 从 Authorization 或环境变量读取 API Key
-    if auth_header and auth_header.strip():
-        ah = auth_header.strip()
-        api_key = ah[7:].strip() if ah.lower().startswith("bearer ") else ah
-    if not api_key:
-        api_key = os.environ.get("FIRECRAWL_API_KEY")
-
-    # 轮询：当 total < 1 时继续等待；仅在 (total > 1 且 completed > 1) 或 (total == 1 且 completed == 1) 时不再等待
-    try:
-        min_delay = float(os.environ.get("FIRECRAWL_MIN_DELAY", 3.0))
-    except Exception:
-        min_delay = 3.0
-
-    headers = {"Authorization": auth_header} if auth_header else None
-
-    while True:
-        result: dict | None = None
-
-        # 选择 AsyncFirecrawl 的后端 endpoint：优先使用传入的 firecrawl_base，其次解析自 next_url，最后使用环境变量
-        effective_base = None
-        if firecrawl_base:
-            effective_base = firecrawl_base.rstrip("/")
-        elif parsed_base:
-            effective_base = parsed_base.rstrip("/")
-        else:
-            effective_base = (os.environ.get("FIRECRAWL_BASE_URL") or "http://localhost:3002").rstrip("/")
-
-        # 优先 SDK（解析到 crawl_id 时）
-        if crawl_id and effective_base:
-            try:
-                kwargs = {}
-                if api_key:
-                    kwargs["api_key"] = api_key
-                kwargs["api_url"] = effective_base
-                client = AsyncFirecrawl(**kwargs)
-
-                status = await client.get_crawl_status(crawl_id)
-                result = {
-                    "data": getattr(status, "data", []) or [],
-                    "next": getattr(status, "next", None),
-                    "status": getattr(status, "status", None),
-                    "completed": getattr(status, "completed", None),
-                    "total": getattr(status, "total", None),
-                }
-            except Exception as e:
-                logging.warning(f"Firecrawl SDK 获取下一页失败，改用异步 HTTP：{e}")
-
-        # 异步 HTTP 回退或 SDK 未成功
-        if result is None:
-            try:
-                try:
-                    async with httpx.AsyncClient() as ac:
-                        resp = await ac.get(next_url, headers=headers, timeout=60)
-                        resp.raise_for_status()
-                        result = resp.json()
-                except ImportError:
-                    logging.info("httpx 未安装，改用同步 requests 在线程中执行。请安装：pip install httpx")
-
-                    def _sync_get_json(url: str, headers: dict | None) -> dict:
-                        resp = requests.get(url, headers=headers, timeout=60)
-                        resp.raise_for_status()
-                        return resp.json()
-
-                    result = await asyncio.to_thread(_sync_get_json, next_url, headers)
-            except Exception as e:
-                logging.error(f"Firecrawl next failed for {next_url}: {e}")
-                result = {}
-
-        # 判定是否继续等待
-        total = 0
-        completed = 0
-        try:
-            total = int((result or {}).get("total", 0) or 0)
-        except Exception:
-            total = 0
-        try:
-            completed = int((result or {}).get("completed", 0) or 0)
-        except Exception:
-            completed = 0
+def get_md_and_links_from_firecrawl_result(result: dict, converter: HtmlConversionPool | None = None) -> tuple[list[dict], str | None]:
+    """Parse Firecrawl v2 crawl batch response.
+    Returns (items, next_url). Each item includes {url, title, body}.
+    Entries that come with HTML only are converted together after parsing, through
+    `converter` (a process pool for large batches) when given.
+    """
+    return finish_firecrawl_result(start_firecrawl_result(result, converter))
 
-        if total < 1:
-            await asyncio.sleep(min_delay)
-            continue
 
-        stop_waiting = (total > 1 and completed > 1) or (total == 1 and completed == 1)
-        if stop_waiting:
-            return result or {}
+def finish_firecrawl_result(parsed: dict) -> tuple[list[dict], str | None]:
+    """Wait for the HTML conversion submitted by start_firecrawl_result(); returns (items, next_url)."""
+    pending = parsed.get("pending")
+    if pending is not None:
+        for item, body in zip(parsed["html_items"], pending.result()):
+            item["body"] = body
+    return parsed["items"], parsed["next_url"]
 
-        # 仍未达到停止条件，继续等待
-        await asyncio.sleep(min_delay)
 
-def get_md_and_links_from_firecrawl_result(result: dict) -> tuple[list[dict], str | None]:
-    """Parse Firecrawl v2 crawl batch response.
-    Returns (items, next_url). Each item includes {url, title, body}.
-    """
+def start_firecrawl_result(result: dict, converter: HtmlConversionPool | None = None) -> dict:
+    """Parse a Firecrawl v2 crawl batch and submit its HTML-only entries to
+    `converter` without waiting for them (converted inline without a converter).
+    Returns {items, next_url, html_items, pending} for finish_firecrawl_result()."""
     items: list[dict] = []
+    html_items: list[tuple[dict, str]] = []
     next_url: str | None = None
 
     try:
@@ -1118,7 +871,7 @@ def get_md_and_links_from_firecrawl_result(result: dict) -> tuple[list[dict], st
                 continue
             md = entry.get("markdown") or entry.get("md") or entry.get("content")
             html = entry.get("html")
-            body = md if isinstance(md, str) and md.strip() else (html_to_markdown(html) if isinstance(html, str) else "")
+            body = md if isinstance(md, str) and md.strip() else ""
             meta = entry.get("metadata", {}) if isinstance(entry.get("metadata"), dict) else {}
             title = meta.get("title") or ""
             # description originates from metadata.metadata field (could be str/dict/list)
@@ -1137,9 +890,194 @@ def get_md_and_links_from_firecrawl_result(result: dict) -> tuple[list[dict], st
             source_url = meta.get("sourceURL") or meta.get("url") or ""
             if not source_url:
                 continue
-            items.append({"url": source_url, "title": title, "description": description, "body": body})
+            item = {"url": source_url, "title": title, "description": description, "body": body}
+            # Firecrawl changeTracking: "new" / "same" / "changed" / "removed" since the previous scrape
+            tracking = entry.get("changeTracking")
+            if isinstance(tracking, dict) and tracking.get("changeStatus"):
+                item["change_status"] = tracking["changeStatus"]
+            if not body and isinstance(html, str) and html:
+                html_items.append((item, html))
+            items.append(item)
+
+    pending = None
+    if html_items:
+        htmls = [html for _, html in html_items]
+        if converter:
+            pending = converter.submit(htmls)
+        else:
+            for (item, _), html in zip(html_items, htmls):
+                item["body"] = html_to_markdown(html)
+
+    return {"items": items, "next_url": next_url, "html_items": [item for item, _ in html_items], "pending": pending}
+
+
+def enrich_item(item: dict, ollama_base: str, ollama_model: str, enrich_mode: str = "multi", chunk_tokens: int = DEFAULT_CHUNK_TOKENS, jobs: PipelineJobs | None = None) -> dict:
+    """Run the per-page Ollama work for one crawl item: translate title, description
+    and body, then extract categories, tags and keywords.
+    In "single" mode everything except the body translation comes from one
+    structured-output call (enrich_page_with_ollama), falling back to the separate
+    calls if that response is unusable.
+    With a job store, finished stages for the same fetched body are reused and new
+    ones are recorded (translated, enriched), so a restarted crawl does not redo them.
+    Touches no shared state, so several items can be enriched concurrently; pool
+    reconciliation, URL assignment and file writes are left to the caller.
+    """
+    source = item.get("url", "")
+    if item.get("duplicate_of"):
+        # Near-duplicate in link mode: no LLM work, the caller writes a link to the canonical page
+        return {"source": source, "duplicate_of": item["duplicate_of"], "similarity": item.get("similarity")}
+    title = item.get("title") or (urlparse(source).path.rstrip("/").split("/")[-1] or urlparse(source).hostname or "").replace("-", " ")
+    description_raw = item.get("description", "")
+    body = item.get("body", "")
+    input_hash = content_hash(json.dumps([title, description_raw, body], ensure_ascii=False)) if jobs else None
+
+    if jobs:
+        done = jobs.get(source, "enriched", input_hash=input_hash)
+        if done and isinstance(done.get("payload"), dict):
+            logging.info(f"复用已完成的增强结果：{source}")
+            return done["payload"]
+        translated = jobs.get(source, "translated", input_hash=input_hash)
+    else:
+        translated = None
+    if translated and isinstance(translated.get("payload"), dict):
+        body_en = translated["payload"].get("body_en", "")
+    else:
+        body_en = translate_to_english_with_ollama(ollama_base, ollama_model, body, chunk_tokens) if body else body
+        if jobs:
+            jobs.mark(source, "translated", payload={"body_en": body_en}, input_hash=input_hash)
+    page = None
+    if enrich_mode == "single":
+        page = enrich_page_with_ollama(ollama_base, ollama_model, title, description_raw, body_en or "", 70, chunk_tokens)
+        if page is None:
+            logging.warning(f"Single-call enrichment failed for {source}; falling back to separate calls")
+    if page is not None:
+        title_en = page["title"] or title
+        description_en = page["description"] if description_raw else ""
+        categories, tags, keywords = page["categories"], page["tags"], page["keywords"]
+    else:
+        # Translate title and description to English using local Ollama
+        title_en = translate_to_english_with_ollama(ollama_base, ollama_model, title) if title else title
+        description_en = translate_to_english_with_ollama(ollama_base, ollama_model, description_raw) if description_raw else ""
+        categories, tags = extract_categories_and_tags_with_ollama(ollama_base, ollama_model, title_en or "", body_en or "", chunk_tokens)
+        # Extract up to 70 English SEO keywords
+        keywords = extract_keywords_with_ollama(ollama_base, ollama_model, title_en or "", body_en or "", 70, chunk_tokens)
+    enriched = {
+        "source": source,
+        "title_en": title_en,
+        "description_en": description_en,
+        "summary_en": description_en,
+        "body_en": body_en,
+        "categories": categories,
+        "tags": tags,
+        "keywords": keywords,
+    }
+    if jobs:
+        jobs.mark(source, "enriched", payload=enriched, input_hash=input_hash)
+    return enriched
+
+
+def item_content_hash(item: dict) -> str:
+    """Hash of what a page's output is derived from (title, description, body)."""
+    return content_hash(json.dumps([item.get("title") or "", item.get("description") or "", item.get("body") or ""], ensure_ascii=False))
+
+
+def split_changed_pages(items: list[dict], jobs: PipelineJobs, stats: dict[str, int]) -> tuple[list[dict], dict[str, dict]]:
+    """Drop pages already written whose content is unchanged; keep changed ones for a rewrite.
+    A page is unchanged when Firecrawl's changeTracking says "same" or its content
+    hash equals the one recorded when it was written (records without a hash count
+    as unchanged). Returns (items to process, {source: written record} of changed pages)."""
+    kept: list[dict] = []
+    rewrites: dict[str, dict] = {}
+    for it in items:
+        source = it.get("url", "")
+        rec = jobs.get(source, "written", require_path=True)
+        if not rec:
+            stats["new"] += 1
+            kept.append(it)
+            continue
+        previous = rec.get("payload") if isinstance(rec.get("payload"), dict) else {}
+        if it.get("change_status") == "same" or not previous.get("content_hash") or previous["content_hash"] == item_content_hash(it):
+            stats["unchanged"] += 1
+            continue
+        stats["changed"] += 1
+        rewrites[source] = {**previous, "path": rec["path"]}
+        kept.append(it)
+    return kept, rewrites
+
+
+def estimate_llm_calls(item: dict, enrich_mode: str = "multi", chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> int:
+    """Ollama generate calls enrich_item() would make for `item` without any cache:
+    one per body chunk that contains Chinese, plus the title/description/taxonomy/keyword calls."""
+    body = item.get("body") or ""
+    calls = sum(1 for chunk in chunk_markdown(body, chunk_tokens) if contains_cjk(split_padding(chunk)[1])) if body.strip() else 0
+    if enrich_mode == "single":
+        return calls + 1
+    return calls + 1 + (1 if item.get("description") else 0) + 2
+
+
+def filter_near_duplicates(items: list[dict], index: NearDupIndex, mode: str, fingerprints: dict[str, int], stats: dict[str, int], report_path: str, enrich_mode: str = "multi", chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> list[dict]:
+    """Check each item's body against the pages seen so far.
+    In "skip" mode near-duplicates are dropped, in "link" mode they are kept but
+    flagged with `duplicate_of` so enrich_item() does no LLM work for them.
+    Every hit is appended to `report_path` (JSON lines) with the LLM calls it saved."""
+    kept: list[dict] = []
+    for it in items:
+        source = it.get("url", "")
+        fp, match = index.check(it.get("body") or "", source)
+        if fp is not None:
+            fingerprints[source] = fp
+        if match is None:
+            kept.append(it)
+            continue
+        canonical, sim = match
+        saved = estimate_llm_calls(it, enrich_mode, chunk_tokens)
+        stats[mode] += 1
+        stats["llm_calls_saved"] += saved
+        logging.info(f"近似重复页面（相似度={sim:.3f}，{'跳过' if mode == 'skip' else '链接到原页面'}）：{source} ≈ {canonical}，节省 LLM 调用约 {saved} 次")
+        try:
+            with open(report_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"source": source, "canonical": canonical, "similarity": round(sim, 4), "mode": mode, "llm_calls_saved": saved}, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logging.warning(f"近似重复报告写入失败：{e}")
+        if mode == "link":
+            kept.append({**it, "duplicate_of": canonical, "similarity": sim})
+    return kept
+
+
+def iter_enriched_items(items: list[dict], workers: int, ollama_base: str, ollama_model: str, enrich_mode: str = "multi", chunk_tokens: int = DEFAULT_CHUNK_TOKENS, jobs: PipelineJobs | None = None):
+    """Yield enrich_item() results in the same order as `items`.
+    With workers > 1 the items are enriched by a bounded thread pool while earlier
+    results are already being consumed; with workers <= 1 they run one by one.
+    """
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield enrich_item(item, ollama_base, ollama_model, enrich_mode, chunk_tokens, jobs)
+        return
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich")
+    try:
+        # Executor.map keeps input order regardless of completion order
+        yield from executor.map(lambda it: enrich_item(it, ollama_base, ollama_model, enrich_mode, chunk_tokens, jobs), items)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_polled_results(poller: CrawlPoller):
+    """Yield pseudo status pages holding each crawled document exactly once.
+    `next` is the poller's position, so a resume continues after the last delivered page."""
+    for docs in poller.iter_batches():
+        yield {"data": docs, "next": poller.resume_url}
+    if poller.finished:
+        logging.info("No next batch; crawl complete.")
+    else:
+        logging.warning("No result returned for next batch; stopping.")
 
-    return items, next_url
+
+def iter_webhook_results(receiver: WebhookReceiver, crawl_id: str | None, status_url: str, auth_header: str, max_items: int, idle_timeout: float, firecrawl_base: str | None = None, min_delay: float | None = None, max_delay: float | None = None):
+    """Yield pseudo status pages built from webhook page events. `next` is the
+    crawl's status URL, so a resume after an interruption polls that crawl from
+    the start; pages the manifest already lists are skipped there."""
+    for docs in iter_webhook_batches(receiver, crawl_id, status_url, auth_header, max_items, idle_timeout, firecrawl_base, min_delay, max_delay):
+        yield {"data": docs, "next": status_url}
 
 
 def main():
@@ -1153,15 +1091,50 @@ def main():
     parser.add_argument("--firecrawl-base", default=os.environ.get("FIRECRAWL_BASE_URL", "http://localhost:3002"), help="Base URL of local Firecrawl service")
     parser.add_argument("--max-pages", type=int, default=0, help="Limit number of pages (0 means unlimited)")
     parser.add_argument("--delay", type=float, default=0.2, help="Delay between requests in seconds")
-    parser.add_argument("--min-delay", type=float, default=float(os.environ.get("FIRECRAWL_MIN_DELAY", 3.0)), help="轮询状态的最小等待秒数（至少等待该值）")
+    parser.add_argument("--min-delay", type=float, default=float(os.environ.get("FIRECRAWL_MIN_DELAY", 1.0)), help="抓取未完成时两次状态轮询之间的最短等待秒数；有下一页游标时不等待（默认 1.0）")
+    parser.add_argument("--max-delay", type=float, default=float(os.environ.get("FIRECRAWL_MAX_DELAY", 30.0)), help="抓取长时间无进展时轮询间隔退避的上限秒数（默认 30）")
+    parser.add_argument("--prefetch", type=int, default=int(os.environ.get("FIRECRAWL_PREFETCH", DEFAULT_PREFETCH) or 0), help="处理当前批次的同时在后台预取的批次数（有界队列）；0 表示串行获取（默认 1）")
     parser.add_argument("--ollama-base", default=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"), help="Base URL of local Ollama service")
     parser.add_argument("--ollama-model", default=os.environ.get("OLLAMA_MODEL", "qwen3:4b"), help="Ollama model name for translation (e.g., qwen:3b)")
-    parser.add_argument("--ollama-wait", type=float, default=float(os.environ.get("OLLAMA_WAIT", 10.0)), help="Ollama 调用前等待秒数（默认 10 秒）")
+    parser.add_argument("--ollama-wait", type=float, default=0.0, help="已弃用：不再在每次调用前固定等待；非 0 时等价于 --ollama-max-rate 1/该秒数")
     parser.add_argument("--output-dir", default=os.environ.get("OUTPUT_DIR", "results"), help="Destination directory to save generated Markdown files")
     parser.add_argument("--firecrawl-token", default=os.environ.get("FIRECRAWL_TOKEN", ""), help="Firecrawl 访问令牌（仅输入 token，程序会自动拼接 'Bearer '）")
     parser.add_argument("--firecrawl-auth", default=os.environ.get("FIRECRAWL_AUTH", ""), help="兼容参数：若未以 'Bearer ' 开头，将自动拼接")
     parser.add_argument("--env-file", default=pre_env_path, help="启动前加载的 .env 文件路径（支持 --env-file=path 或 ENV_FILE）")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("CRAWL_WORKERS", 1) or 1), help="并发处理页面（翻译/分类/关键词）的工作线程数；输出顺序、prev 链与 manifest 保持不变（默认 1，即逐页处理）")
+    parser.add_argument("--no-llm-cache", action="store_true", help="禁用 Ollama 响应的本地持久化缓存（默认启用，见 LLM_CACHE_* 环境变量）")
+    parser.add_argument("--llm-cache-path", default=os.environ.get("LLM_CACHE_PATH", ""), help="Ollama 响应缓存的 SQLite 文件路径（默认 .cache/llm_cache.sqlite3）")
+    parser.add_argument("--webhook", action="store_true", default=webhook_enabled_default(), help="webhook 模式：在本地启动接收端，抓取任务带 webhook 启动，页面完成即推送并进入处理队列，不再按间隔轮询状态")
+    parser.add_argument("--webhook-listen", default=os.environ.get("FIRECRAWL_WEBHOOK_LISTEN", DEFAULT_LISTEN), help="webhook 接收端监听地址 host:port（默认 127.0.0.1:0，自动选择空闲端口）")
+    parser.add_argument("--webhook-url", default=os.environ.get("FIRECRAWL_WEBHOOK_URL", ""), help="提供给 Firecrawl 的回调地址；Firecrawl 在容器或其它主机上运行时需设置（默认由监听地址生成）")
+    parser.add_argument("--webhook-idle", type=float, default=float(os.environ.get("FIRECRAWL_WEBHOOK_IDLE", DEFAULT_IDLE_TIMEOUT) or DEFAULT_IDLE_TIMEOUT), help="超过该秒数未收到 webhook 事件时查询一次抓取状态")
+    parser.add_argument("--state-db", default=os.environ.get("STATE_DB", ""), help="阶段状态库（SQLite）路径：记录每个页面已完成的阶段（fetched/translated/enriched/written），重启后从上次完成的阶段继续（默认 .cache/pipeline_state.sqlite3）")
+    parser.add_argument("--no-state-db", action="store_true", help="禁用阶段状态库，仅依赖 manifest 续传")
+    parser.add_argument("--enrich-mode", choices=["multi", "single"], default=os.environ.get("ENRICH_MODE", "multi") or "multi", help="页面元数据提取方式：multi 为逐项调用（标题/描述/分类标签/关键词分别请求）；single 为一次结构化 JSON 调用完成全部字段")
+    parser.add_argument("--chunk-tokens", type=int, default=int(os.environ.get("CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS) or DEFAULT_CHUNK_TOKENS), help="正文翻译分块的 token 预算；按 Markdown 结构切分，num_ctx 据此自动设置，避免长页面被截断")
+    parser.add_argument("--change-tracking", action="store_true", default=str(os.environ.get("FIRECRAWL_CHANGE_TRACKING", "")).strip().lower() in ("1", "true", "yes", "on"), help="请求 Firecrawl 的 changeTracking 格式：与上次抓取相比未变化（same）的页面直接沿用已有文件，不再计算哈希比较")
+    parser.add_argument("--html-workers", type=int, default=int(os.environ.get("HTML_CONVERT_WORKERS", default_html_workers()) or 0), help=f"Firecrawl 只返回 HTML 时用于转换 Markdown 的进程数（默认 {default_html_workers()}；0 表示在主进程中转换）")
+    parser.add_argument("--html-min-batch", type=int, default=int(os.environ.get("HTML_CONVERT_MIN_BATCH", DEFAULT_HTML_MIN_BATCH) or DEFAULT_HTML_MIN_BATCH), help=f"一批中仅含 HTML 的页面达到此数量才使用进程池（默认 {DEFAULT_HTML_MIN_BATCH}）")
+    parser.add_argument("--dedupe", choices=list(DEDUPE_MODES), default=os.environ.get("DEDUPE", "off") or "off", help="近似重复页面检测（SimHash）：off 关闭；skip 跳过与已处理页面近似重复的页面；link 不调用 LLM，只写出指向原页面的链接页")
+    parser.add_argument("--dedupe-threshold", type=float, default=float(os.environ.get("DEDUPE_THRESHOLD", DEFAULT_DEDUPE_THRESHOLD) or DEFAULT_DEDUPE_THRESHOLD), help=f"判定为近似重复的相似度阈值（0.5–1，默认 {DEFAULT_DEDUPE_THRESHOLD}）")
+    parser.add_argument("--term-match", choices=list(TERM_MATCH_MODES), default=os.environ.get("TERM_MATCH", "llm") or "llm", help="分类/标签池满后为新术语选择最接近的已有术语的方式：llm 为每次调用生成模型列出全部选项；embed 为嵌入向量余弦检索（需 numpy），仅低置信度时交给生成模型裁决")
+    parser.add_argument("--embed-model", default=os.environ.get("OLLAMA_EMBED_MODEL", DEFAULT_EMBED_MODEL), help=f"--term-match embed 使用的 Ollama 嵌入模型（默认 {DEFAULT_EMBED_MODEL}）")
+    parser.add_argument("--term-embed-cache", default=os.environ.get("TERM_EMBED_CACHE_PATH", ""), help="术语向量缓存（SQLite）路径（默认 .cache/term_embeddings.sqlite3）")
+    parser.add_argument("--ollama-pool-size", type=int, default=int(os.environ.get("OLLAMA_POOL_SIZE", 10) or 10), help="与 Ollama 保持的长连接池大小（建议不小于 --workers）")
+    parser.add_argument("--ollama-timeout", type=float, default=float(os.environ.get("OLLAMA_TIMEOUT", 120) or 120), help="单次 Ollama 调用的读取超时秒数")
+    parser.add_argument("--ollama-stream", action="store_true", default=str(os.environ.get("OLLAMA_STREAM", "")).strip().lower() in ("1", "true", "yes", "on"), help="流式读取 Ollama 输出：记录首字延迟与生成速度，JSON 完整后立即结束生成")
+    parser.add_argument("--ollama-max-tokens", type=int, default=int(os.environ.get("OLLAMA_MAX_TOKENS", 0) or 0), help="流式模式下单次生成的词元上限，超出即中止（默认 0 不限）")
+    parser.add_argument("--ollama-concurrency", type=int, default=int(os.environ.get("OLLAMA_CONCURRENCY", 0) or 0), help="同时发往 Ollama 的最大请求数；延迟升高时自动下调，恢复后回升（默认 0，即等于连接池大小）")
+    parser.add_argument("--ollama-max-rate", type=float, default=float(os.environ.get("OLLAMA_MAX_RATE", 0) or 0), help="Ollama 调用速率硬上限（次/秒，令牌桶；默认 0 表示不限，仅在服务饱和时自适应限流）")
+    parser.add_argument("--metrics-file", default=os.environ.get("METRICS_FILE", ""), help="运行期间定期写出 Prometheus 文本格式的各阶段指标到此文件（默认不写）")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", 0) or 0), help="在 127.0.0.1 的此端口提供 /metrics（默认 0 不启用）")
+    parser.add_argument("--metrics-interval", type=float, default=float(os.environ.get("METRICS_INTERVAL", DEFAULT_METRICS_INTERVAL) or DEFAULT_METRICS_INTERVAL), help=f"指标文件写出间隔秒数（默认 {DEFAULT_METRICS_INTERVAL:g}）")
+    parser.add_argument("--profile", action="store_true", default=str(os.environ.get("PROFILE", "")).strip().lower() in ("1", "true", "yes", "on"), help="对本次运行做性能分析：所有线程的 cProfile 结果合并写出一个 .prof 文件，结束时日志输出耗时最多的函数")
+    parser.add_argument("--profile-dir", default=os.environ.get("PROFILE_DIR", ""), help=f"性能分析输出目录，每次运行新建 <阶段>-<时间> 子目录（默认 {DEFAULT_PROFILE_DIR}）")
+    parser.add_argument("--profile-mem-every", type=int, default=int(os.environ.get("PROFILE_MEM_EVERY", DEFAULT_PROFILE_MEM_EVERY) or 0), help=f"性能分析时每处理多少个页面写出一次 tracemalloc 快照（默认 {DEFAULT_PROFILE_MEM_EVERY}，0 不启用 tracemalloc）")
     args = parser.parse_args()
+    configure_metrics("crawl", args.metrics_file, args.metrics_port, args.metrics_interval)
+    configure_profiling("crawl", args.profile, args.profile_dir, args.profile_mem_every)
 
     start_url = args.start_url
     firecrawl_base = args.firecrawl_base
@@ -1170,10 +1143,24 @@ def main():
     min_delay = args.min_delay
     ollama_base = args.ollama_base
     ollama_model = args.ollama_model
-    ollama_wait = args.ollama_wait
     output_dir = args.output_dir
     firecrawl_token = args.firecrawl_token
     firecrawl_auth = args.firecrawl_auth
+    workers = max(1, args.workers)
+    enrich_mode = args.enrich_mode
+    chunk_tokens = max(64, args.chunk_tokens)
+    llm_cache = configure_llm_cache(enabled=not args.no_llm_cache, path=args.llm_cache_path or None)
+    # 每个输出目录一条流水线，同一目录重复运行时共享阶段记录
+    jobs = open_pipeline_jobs("crawl:" + os.path.abspath(output_dir), args.state_db or None, enabled=not args.no_state_db)
+    max_rate = args.ollama_max_rate
+    if args.ollama_wait and args.ollama_wait > 0:
+        logging.warning(f"--ollama-wait 已弃用：调用间不再固定等待，改用自适应限流；本次按 --ollama-max-rate={1.0 / args.ollama_wait:.3g} 处理")
+        if not max_rate:
+            max_rate = 1.0 / args.ollama_wait
+    configure_ollama_clients(pool_size=max(args.ollama_pool_size, workers), timeout=args.ollama_timeout, max_concurrency=args.ollama_concurrency, max_rate=max_rate, stream=args.ollama_stream, max_tokens=args.ollama_max_tokens)
+    term_matcher = configure_term_matcher(args.term_match, ollama_base, args.embed_model, args.term_embed_cache or None)
+    # 在首次 Firecrawl 请求/轮询期间后台加载 Argos 翻译器
+    warm_zh_en_translator()
     # 构建 Authorization 头值：优先使用 --firecrawl-token / FIRECRAWL_TOKEN
     if firecrawl_token:
         auth_header = f"Bearer {firecrawl_token}"
@@ -1185,22 +1172,32 @@ def main():
     written_files: list[str] = []
     used_urls: set[str] = set()
     # Global pools for categories and tags with caps
-    global_categories_pool: list[str] = []
-    global_tags_pool: list[str] = []
+    global_categories_pool = TaxonomyPool()
+    global_tags_pool = TaxonomyPool()
     last_prev_url: str | None = None
     pages_processed = 0
+    # Sources of the pages in the manifest; without the state DB they are how a resume skips them
+    written_sources: set[str] = set()
 
     # Attempt to resume from existing manifest
     manifest_path = os.path.join(output_dir, "manifest.json")
-    manifest = load_manifest(manifest_path)
+    journal = ManifestJournal(manifest_path)
+    manifest = journal.load()
     latest_next_url = manifest.get("latest_next_url")
+    # Pages fetched before the interruption but never written (the rest of the
+    # batch that was in flight); they go in front of the first batch of this run
+    carried: list[dict] = []
     if manifest:
+        carried = [payload for _source, payload in jobs.pending() if isinstance(payload, dict) and payload.get("url")]
+        if carried:
+            logging.info(f"状态库：{len(carried)} 个已抓取但未写出的页面将优先处理")
         # Restore prior state if available
         pages_processed = int(manifest.get("pages_processed", pages_processed) or 0)
         used_urls = set(manifest.get("used_urls", []))
-        global_categories_pool = manifest.get("global_categories_pool", []) or []
-        global_tags_pool = manifest.get("global_tags_pool", []) or []
+        global_categories_pool = TaxonomyPool.from_manifest(manifest.get("global_categories_pool"))
+        global_tags_pool = TaxonomyPool.from_manifest(manifest.get("global_tags_pool"))
         last_prev_url = manifest.get("last_prev_url") or None
+        written_sources = set(manifest.get("sources") or [])
         prev_files = manifest.get("files", []) or []
         for rel in prev_files:
             try:
@@ -1208,130 +1205,208 @@ def main():
             except Exception:
                 abs_p = rel
             written_files.append(abs_p)
-        if latest_next_url:
-            logging.info("Resuming crawl from manifest next_url")
-            result = call_firecrawl_next(latest_next_url, auth_header, firecrawl_base)
-        else:
-            logging.info(f"No next_url in manifest; starting fresh at {start_url}")
-            start_info = call_firecrawl_start(firecrawl_base, start_url, auth_header)
-            start_url_status = start_info.get("url") if isinstance(start_info, dict) else None
-            result = call_firecrawl_next(start_url_status, auth_header, firecrawl_base) if start_url_status else {}
+    # Near-duplicate detection: fingerprints of pages written by earlier runs seed the index
+    dedupe_index: NearDupIndex | None = None
+    fingerprints: dict[str, int] = {}
+    canonical_pages: dict[str, dict] = {}
+    dedupe_stats = {"skip": 0, "link": 0, "llm_calls_saved": 0}
+    # Change-aware recrawl: pages written before are re-processed only when their content changed
+    change_stats = {"new": 0, "unchanged": 0, "changed": 0}
+    rewrites: dict[str, dict] = {}
+    page_hashes: dict[str, str] = {}
+    if args.dedupe != "off":
+        dedupe_index = NearDupIndex(args.dedupe_threshold)
+        for source, payload in jobs.payloads("written"):
+            if isinstance(payload, dict) and isinstance(payload.get("simhash"), int):
+                dedupe_index.add(payload["simhash"], source)
+                canonical_pages[source] = payload
+    receiver: WebhookReceiver | None = None
+    poller: CrawlPoller | None = None
+    batches = None
+    status_url: str | None = None
+    if manifest and latest_next_url:
+        # 续传总是轮询原抓取任务的状态接口（webhook 事件在中断期间已丢失）
+        logging.info("Resuming crawl from manifest next_url")
+        status_url = latest_next_url
     else:
-        logging.info(f"Starting Firecrawl v2 crawl at {start_url} via {firecrawl_base}")
-        start_info = call_firecrawl_start(firecrawl_base, start_url, auth_header)
+        if manifest:
+            logging.info(f"No next_url in manifest; starting fresh at {start_url}")
+        else:
+            logging.info(f"Starting Firecrawl v2 crawl at {start_url} via {firecrawl_base}")
+        if args.webhook:
+            try:
+                receiver = WebhookReceiver(args.webhook_listen, args.webhook_url, os.environ.get("FIRECRAWL_WEBHOOK_SECRET", "")).start()
+            except Exception as e:
+                logging.warning(f"Firecrawl webhook 接收端启动失败，改用轮询：{e}")
+        start_info = call_firecrawl_start(firecrawl_base, start_url, auth_header, receiver.webhook_config() if receiver else None, args.change_tracking)
         start_url_status = start_info.get("url") if isinstance(start_info, dict) else None
-        result = call_firecrawl_next(start_url_status, auth_header, firecrawl_base) if start_url_status else {}
-        logging.info(f"Firecrawl result: {result}")
-    while True:
-        items, next_url = get_md_and_links_from_firecrawl_result(result)
-
-        for item in items:
-            if max_pages and pages_processed >= max_pages:
+        if receiver and start_url_status:
+            batches = iter_webhook_results(receiver, start_info.get("id"), start_url_status, auth_header, max(1, workers) * 4, args.webhook_idle, firecrawl_base, max(delay, min_delay), args.max_delay)
+        else:
+            status_url = start_url_status
+    if batches is None:
+        # 有下一页游标时立即获取；任务仍在进行时按进度自适应等待
+        poller = CrawlPoller(status_url or "", auth_header, firecrawl_base, min_delay=max(delay, min_delay), max_delay=args.max_delay, target_batch=max(1, workers))
+        batches = iter_polled_results(poller) if status_url else iter(())
+    # 仅含 HTML 的页面整批在进程池中转换为 Markdown：批次一到（预取线程中）即提交，
+    # 轮到该批处理时才取结果，转换与上一批的 LLM 处理重叠
+    html_pool = HtmlConversionPool(args.html_workers, args.html_min_batch)
+    batches = (start_firecrawl_result(result, html_pool) for result in batches)
+    prefetcher: BatchPrefetcher | None = None
+    if args.prefetch > 0:
+        # 后台线程提前获取下一批，Firecrawl 的网络与等待时间与 LLM 处理重叠
+        prefetcher = BatchPrefetcher(batches, args.prefetch)
+        batches = prefetcher
+    journal.set_meta(start_url=start_url, firecrawl_base=firecrawl_base, ollama_base=ollama_base, ollama_model=ollama_model)
+    next_url = latest_next_url
+    for parsed in batches:
+        items, next_url = finish_firecrawl_result(parsed)
+        if carried:
+            carried_sources = {it["url"] for it in carried}
+            items = carried + [it for it in items if it.get("url") not in carried_sources]
+            carried = []
+        if written_sources and not jobs.enabled:
+            # A webhook crawl resumes from its bare status URL and sees every page again
+            fresh = [it for it in items if it.get("url") not in written_sources]
+            if len(fresh) < len(items):
+                logging.info(f"跳过 {len(items) - len(fresh)} 个 manifest 中已写出的页面")
+            items = fresh
+        if manifest and jobs.enabled:
+            # Pages written by an earlier run keep their files and manifest entries unless their content changed
+            unchanged_before = change_stats["unchanged"]
+            items, changed = split_changed_pages(items, jobs, change_stats)
+            rewrites.update(changed)
+            if change_stats["unchanged"] > unchanged_before or changed:
+                logging.info(f"状态库：跳过 {change_stats['unchanged'] - unchanged_before} 个内容未变化的已写出页面，{len(changed)} 个内容已变化的页面将原位更新")
+        if dedupe_index:
+            items = filter_near_duplicates(items, dedupe_index, args.dedupe, fingerprints, dedupe_stats, os.path.join(output_dir, "near_duplicates.jsonl"), enrich_mode, chunk_tokens)
+
+        if max_pages:
+            # Only new pages count towards the limit; rewrites keep their place in the manifest
+            budget, limited = max(0, max_pages - pages_processed), []
+            for it in items:
+                if it.get("url") in rewrites:
+                    limited.append(it)
+                elif budget > 0:
+                    limited.append(it)
+                    budget -= 1
+            if len(limited) < len(items):
                 logging.info(f"Reached max pages limit: {max_pages}")
-                break
-
-            source = item.get("url", "")
-            title = item.get("title") or (urlparse(source).path.rstrip("/").split("/")[-1] or urlparse(source).hostname or "").replace("-", " ")
-            description_raw = item.get("description", "")
-            body = item.get("body", "")
-
-            # Translate title and body to English using local Ollama
-            title_en = translate_to_english_with_ollama(ollama_base, ollama_model, title, wait=ollama_wait) if title else title
-            description_en = translate_to_english_with_ollama(ollama_base, ollama_model, description_raw, wait=ollama_wait) if description_raw else ""
-            summary_en = description_en
-            body_en = translate_to_english_with_ollama(ollama_base, ollama_model, body, wait=ollama_wait) if body else body
-            categories, tags = extract_categories_and_tags_with_ollama(ollama_base, ollama_model, title_en or "", body_en or "", wait=ollama_wait)
-            # Reconcile with global pools under caps (70 categories, 300 tags)
-            categories_final = reconcile_terms(categories, global_categories_pool, 70, ollama_base, ollama_model, True, ollama_wait=ollama_wait)
-            tags_final = reconcile_terms(tags, global_tags_pool, 300, ollama_base, ollama_model, False, ollama_wait=ollama_wait)
-            # Extract up to 70 English SEO keywords
-            keywords = extract_keywords_with_ollama(ollama_base, ollama_model, title_en or "", body_en or "", 70, wait=ollama_wait)
-
-            dir_path, filename = path_to_file_parts(source, output_dir)
-            url_field = make_unique_url_from_title(title_en, used_urls, 30)
-            prev_url = last_prev_url if last_prev_url else None
-
-            # Compute publishDate and lastmod based on scheduling rules
-            publish_date_str = scheduled_timestamp_for_index(pages_processed)
-            lastmod_str = publish_date_str
-
-            full_path = write_markdown_file(dir_path, filename, title_en, description_en, summary_en, url_field, prev_url, body_en, categories_final, tags_final, keywords, publish_date_str, lastmod_str)
-            written_files.append(full_path)
-            last_prev_url = url_field
-            pages_processed += 1
-
-            # Persist manifest after each page to support resume on interruption
-            posix_files: list[str] = []
-            for p in written_files:
+            items = limited
+        for it in items:
+            page_hashes[it.get("url", "")] = item_content_hash(it)
+            jobs.mark(it.get("url", ""), "fetched", payload=it)
+
+        # Enrichment may run concurrently; everything below consumes results in source order
+        for enriched in iter_enriched_items(items, workers, ollama_base, ollama_model, enrich_mode, chunk_tokens, jobs):
+            source = enriched["source"]
+            categories_before, tags_before = len(global_categories_pool), len(global_tags_pool)
+            if enriched.get("duplicate_of"):
+                # Link page: the canonical page's front matter and a link to it instead of a translated copy
+                canonical = canonical_pages.get(enriched["duplicate_of"]) or {}
+                title_en = canonical.get("title") or enriched["duplicate_of"]
+                description_en = summary_en = canonical.get("description") or ""
+                canonical_url = canonical.get("url") or enriched["duplicate_of"]
+                body_en = f"This page is a near-duplicate of [{title_en}]({canonical_url}).\n"
+                keywords = list(canonical.get("keywords") or [])
+                categories_final = list(canonical.get("categories") or [])
+                tags_final = list(canonical.get("tags") or [])
+            else:
+                title_en = enriched["title_en"]
+                description_en = enriched["description_en"]
+                summary_en = enriched["summary_en"]
+                body_en = enriched["body_en"]
+                keywords = enriched["keywords"]
+                # Reconcile with global pools under caps (70 categories, 300 tags)
+                categories_final = reconcile_terms(enriched["categories"], global_categories_pool, 70, ollama_base, ollama_model, True)
+                tags_final = reconcile_terms(enriched["tags"], global_tags_pool, 300, ollama_base, ollama_model, False)
+
+            rewrite = rewrites.pop(source, None)
+            if rewrite:
+                # Changed page: rewrite its file in place, keeping its url, prev link and publishDate
+                old_fm = read_front_matter(rewrite["path"])
+                dir_path, filename = os.path.split(rewrite["path"])
+                url_field = rewrite.get("url") or old_fm.get("url") or make_unique_url_from_title(title_en, used_urls, 30)
+                prev_url = old_fm.get("prev") or None
+                publish_date_str = str(old_fm.get("publishDate") or scheduled_timestamp_for_index(max(0, int(rewrite.get("n") or 1) - 1)))
+                lastmod_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                full_path = write_markdown_file(dir_path, filename, title_en, description_en, summary_en, url_field, prev_url, body_en, categories_final, tags_final, keywords, publish_date_str, lastmod_str)
                 try:
-                    rel_p = os.path.relpath(p, output_dir)
-                except Exception:
-                    rel_p = p
-                posix_files.append(to_posix_path(rel_p))
-            manifest = {
-                "start_url": start_url,
-                "firecrawl_base": firecrawl_base,
-                "ollama_base": ollama_base,
-                "ollama_model": ollama_model,
-                "pages_processed": pages_processed,
-                "files": posix_files,
-                "used_urls": sorted(list(used_urls)),
-                "last_prev_url": last_prev_url,
-                "global_categories_pool": global_categories_pool,
-                "global_tags_pool": global_tags_pool,
-                "latest_next_url": next_url,
-            }
-            os.makedirs(output_dir, exist_ok=True)
-            try:
-                with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as mf:
-                    json.dump(manifest, mf, ensure_ascii=False, indent=2)
-            except Exception as e:
-                logging.warning(f"Failed to persist manifest: {e}")
+                    journal.record_terms(global_categories_pool[categories_before:], global_tags_pool[tags_before:])
+                except Exception as e:
+                    logging.warning(f"Failed to persist manifest: {e}")
+                logging.info(f"内容已变化，原位更新：{full_path}")
+                page_number = int(rewrite.get("n") or 0)
+            else:
+                dir_path, filename = path_to_file_parts(source, output_dir)
+                url_field = make_unique_url_from_title(title_en, used_urls, 30)
+                prev_url = last_prev_url if last_prev_url else None
+
+                # Compute publishDate and lastmod based on scheduling rules
+                publish_date_str = scheduled_timestamp_for_index(pages_processed)
+                lastmod_str = publish_date_str
+
+                full_path = write_markdown_file(dir_path, filename, title_en, description_en, summary_en, url_field, prev_url, body_en, categories_final, tags_final, keywords, publish_date_str, lastmod_str)
+                written_files.append(full_path)
+                last_prev_url = url_field
+                pages_processed += 1
+                page_number = pages_processed
+
+                # Persist manifest after each page to support resume on interruption:
+                # one journal line per page instead of rewriting manifest.json
+                try:
+                    journal.record_page(
+                        manifest_rel_path(full_path, output_dir),
+                        url_field,
+                        pages_processed,
+                        global_categories_pool[categories_before:],
+                        global_tags_pool[tags_before:],
+                        next_url,
+                        source=source,
+                    )
+                except Exception as e:
+                    logging.warning(f"Failed to persist manifest: {e}")
+            written = {"url": url_field, "n": page_number, "content_hash": page_hashes.pop(source, None)}
+            if dedupe_index and source in fingerprints and not enriched.get("duplicate_of"):
+                # What a later near-duplicate of this page needs to link to it
+                written.update(simhash=fingerprints[source], title=title_en, description=description_en, categories=categories_final, tags=tags_final, keywords=keywords)
+                canonical_pages[source] = written
+            # Marked after the manifest entry: a crash in between re-writes the page rather than losing it
+            jobs.mark(source, "written", payload=written, path=full_path)
+            profile_page()
 
         if max_pages and pages_processed >= max_pages:
             break
-
-        if next_url:
-             logging.info(f"Fetching next batch: {next_url}")
-             effective_delay = max(delay, min_delay)
-             time.sleep(effective_delay)
-             result = call_firecrawl_next(next_url, auth_header, firecrawl_base)
-             if not result:
-                 logging.warning("No result returned for next batch; stopping.")
-                 break
-             continue
-        else:
-            logging.info("No next batch; crawl complete.")
-            break
+    else:
+        if receiver or (poller and poller.finished):
+            # 任务已结束：清除状态地址，下次运行重新开始而不是续传
+            next_url = None
+    if prefetcher:
+        prefetcher.close()
+        prefetcher.log_stats()
+    html_pool.close()
+    html_pool.log_stats()
+    if receiver:
+        receiver.close()
+    if poller:
+        poller.log_stats()
+        poller.close()
 
     logging.info(f"Crawl finished. Pages processed: {pages_processed}. Files written: {len(written_files)}")
-    # Summary manifest
-    # Normalize file paths to POSIX style, prefer paths relative to output_dir
-    posix_files: list[str] = []
-    for p in written_files:
-        try:
-            rel_p = os.path.relpath(p, output_dir)
-        except Exception:
-            rel_p = p
-        posix_files.append(to_posix_path(rel_p))
-
-    manifest = {
-        "start_url": start_url,
-        "firecrawl_base": firecrawl_base,
-        "ollama_base": ollama_base,
-        "ollama_model": ollama_model,
-        "pages_processed": pages_processed,
-        "files": posix_files,
-        "used_urls": sorted(list(used_urls)),
-        "last_prev_url": last_prev_url,
-        "global_categories_pool": global_categories_pool,
-        "global_tags_pool": global_tags_pool,
-        "latest_next_url": next_url,
-    }
-    os.makedirs(output_dir, exist_ok=True)
-    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
-        json.dump(manifest, f, ensure_ascii=False, indent=2)
-
+    if manifest and jobs.enabled:
+        logging.info(f"增量抓取统计：新页面={change_stats['new']} 内容未变化（沿用）={change_stats['unchanged']} 内容变化（已更新）={change_stats['changed']}")
+    if dedupe_index:
+        logging.info(f"近似重复检测统计：已索引={dedupe_index.size} 跳过={dedupe_stats['skip']} 链接={dedupe_stats['link']} 节省 LLM 调用约 {dedupe_stats['llm_calls_saved']} 次")
+    llm_cache.log_stats()
+    jobs.log_stats()
+    if term_matcher:
+        term_matcher.log_stats()
+        term_matcher.close()
+    close_ollama_clients()
+    # Summary manifest: fold the journal into manifest.json
+    journal.close(latest_next_url=next_url)
+    close_profiling()
+    close_metrics()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,393 @@
+"""Adaptive polling of a Firecrawl v2 crawl with cursor pagination.
+
+`CrawlPoller` walks `/v2/crawl/{id}` the way the API is paged: while a status
+page carries a `next` cursor it is fetched immediately, with no wait in
+between; only when the cursor runs out on a crawl that is still running does
+the poller sleep. The sleep follows the crawl's progress: it aims to come back
+when about `target_batch` new pages should be ready (from an EWMA of the
+server's completed-pages rate), backs off exponentially while nothing moves,
+stays within [min_delay, max_delay] and is jittered so several crawlers do not
+poll in lockstep. The crawl ends when its status is completed / failed /
+cancelled and no cursor is left.
+
+Each document is delivered exactly once: the poller remembers its position
+(`skip`) so a re-poll only asks for pages after the ones already consumed, and
+de-duplicates by source URL in case the server re-sends data. `resume_url` is
+the status URL at the current position, for resuming after a restart.
+
+One HTTP session is reused for every request. The SDK is only a fallback when
+a raw request fails, and its Document models are converted to the same dict
+shape as the HTTP API (`metadata.sourceURL`, ...).
+
+`BatchPrefetcher` runs any batch iterator (polled or webhook) in a background
+thread a bounded number of batches ahead of the consumer.
+
+Configuration (CLI flags in the scripts take precedence):
+  - FIRECRAWL_PREFETCH    batches fetched ahead while the current one is processed (default 1, 0 = off)
+  - FIRECRAWL_MIN_DELAY   shortest wait between polls of a running crawl (default 1.0)
+  - FIRECRAWL_MAX_DELAY   longest wait while backing off (default 30)
+"""
+
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import requests
+
+from .metrics import get_metrics
+
+DEFAULT_MIN_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_PREFETCH = 1
+JITTER = 0.2
+# First backoff step when nothing moved, even with min_delay = 0
+BACKOFF_START = 0.25
+PROGRESS_LOG_EVERY = 15.0
+RATE_ALPHA = 0.5
+MAX_ERRORS = 5
+REQUEST_TIMEOUT = 60
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# SDK metadata field names -> HTTP API names used throughout the scripts
+_METADATA_ALIASES = {"source_url": "sourceURL", "status_code": "statusCode", "og_title": "ogTitle", "og_description": "ogDescription"}
+_CHANGE_TRACKING_ALIASES = {"change_status": "changeStatus", "previous_scrape_at": "previousScrapeAt"}
+
+
+def document_to_dict(doc: Any) -> Dict[str, Any]:
+    """Firecrawl document (HTTP dict or SDK model) -> HTTP API dict shape."""
+    if isinstance(doc, dict):
+        return doc
+    if hasattr(doc, "model_dump"):
+        out = doc.model_dump(exclude_none=True)
+    else:
+        out = {k: v for k, v in vars(doc).items() if v is not None} if hasattr(doc, "__dict__") else {}
+    tracking = out.pop("change_tracking", None)
+    if isinstance(tracking, dict) and "changeTracking" not in out:
+        out["changeTracking"] = {_CHANGE_TRACKING_ALIASES.get(k, k): v for k, v in tracking.items()}
+    meta = out.get("metadata")
+    if isinstance(meta, dict):
+        for sdk_name, api_name in _METADATA_ALIASES.items():
+            if sdk_name in meta and api_name not in meta:
+                meta[api_name] = meta.pop(sdk_name)
+    return out
+
+
+def document_source(doc: Dict[str, Any]) -> str:
+    meta = doc.get("metadata") if isinstance(doc.get("metadata"), dict) else {}
+    return meta.get("sourceURL") or meta.get("url") or doc.get("url") or ""
+
+
+def url_skip(url: str) -> int:
+    try:
+        return int(dict(parse_qsl(urlparse(url).query)).get("skip", 0) or 0)
+    except ValueError:
+        return 0
+
+
+def with_skip(url: str, skip: int) -> str:
+    parts = urlparse(url)
+    query = dict(parse_qsl(parts.query))
+    if skip > 0:
+        query["skip"] = str(skip)
+    else:
+        query.pop("skip", None)
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+
+def api_key_from_auth(auth_header: str) -> Optional[str]:
+    if auth_header and auth_header.strip():
+        ah = auth_header.strip()
+        return ah[7:].strip() if ah.lower().startswith("bearer ") else ah
+    return os.environ.get("FIRECRAWL_API_KEY") or os.environ.get("FIRECRAWL_TOKEN") or None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default) or default)
+    except ValueError:
+        return default
+
+
+class CrawlPoller:
+    """Exactly-once, cursor-following, adaptively paced reader of one crawl's results."""
+
+    def __init__(
+        self,
+        status_url: str,
+        auth_header: str = "",
+        firecrawl_base: Optional[str] = None,
+        min_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        target_batch: int = 1,
+        seen: Optional[set] = None,
+        jitter: float = JITTER,
+    ):
+        self.cursor = status_url
+        self.status_url = with_skip(status_url, 0)
+        self.consumed = url_skip(status_url)
+        self.auth_header = auth_header
+        m = re.search(r"/v2/crawl/([a-zA-Z0-9\-]+)", status_url or "")
+        self.crawl_id = m.group(1) if m else None
+        parsed = urlparse(status_url or "")
+        parsed_base = f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme and parsed.netloc else None
+        self.firecrawl_base = (firecrawl_base or parsed_base or os.environ.get("FIRECRAWL_BASE_URL") or "http://localhost:3002").rstrip("/")
+        self.min_delay = max(0.0, min_delay if min_delay is not None else _env_float("FIRECRAWL_MIN_DELAY", DEFAULT_MIN_DELAY))
+        self.max_delay = max(self.min_delay, max_delay if max_delay is not None else _env_float("FIRECRAWL_MAX_DELAY", DEFAULT_MAX_DELAY))
+        self.target_batch = max(1, int(target_batch))
+        self.jitter = max(0.0, min(1.0, jitter))
+        self.seen = seen if seen is not None else set()
+        self.delay = self.min_delay
+        self.rate: Optional[float] = None
+        self.status: Optional[str] = None
+        self.total = 0
+        self.completed = 0
+        self.finished = False
+        self.polls = 0
+        self.waits = 0
+        self.waited = 0.0
+        self.duplicates = 0
+        self.delivered = 0
+        self.session = requests.Session()
+        if auth_header:
+            self.session.headers["Authorization"] = auth_header
+        self._sdk = None
+        self._logged_at = 0.0
+
+    @property
+    def resume_url(self) -> str:
+        """Status URL positioned after everything delivered so far."""
+        return with_skip(self.status_url, self.consumed)
+
+    # ---- fetching ----
+    def _fetch_sdk(self) -> Dict[str, Any]:
+        if not self.crawl_id:
+            return {}
+        if self._sdk is None:
+            from firecrawl import Firecrawl  # type: ignore
+
+            kwargs: Dict[str, Any] = {"api_url": self.firecrawl_base}
+            api_key = api_key_from_auth(self.auth_header)
+            if api_key:
+                kwargs["api_key"] = api_key
+            self._sdk = Firecrawl(**kwargs)
+        job = self._sdk.get_crawl_status(self.crawl_id)
+        # The SDK pages through all results itself, so the position restarts at 0
+        return {
+            "status": getattr(job, "status", None),
+            "total": getattr(job, "total", 0),
+            "completed": getattr(job, "completed", 0),
+            "data": [document_to_dict(d) for d in (getattr(job, "data", None) or [])],
+            "next": None,
+            "_skip": 0,
+        }
+
+    def fetch(self, url: str) -> Dict[str, Any]:
+        """One status page: raw HTTP on the shared session, SDK as fallback; {} on failure."""
+        self.polls += 1
+        started = time.perf_counter()
+        page = self._fetch(url)
+        get_metrics().observe("firecrawl_poll", time.perf_counter() - started, error=not page)
+        return page
+
+    def _fetch(self, url: str) -> Dict[str, Any]:
+        try:
+            resp = self.session.get(url, timeout=REQUEST_TIMEOUT)
+            resp.raise_for_status()
+            page = resp.json()
+            if isinstance(page, dict):
+                page["data"] = [document_to_dict(d) for d in (page.get("data") or []) if d is not None]
+                page["_skip"] = url_skip(url)
+                return page
+        except Exception as e:
+            logging.warning(f"Firecrawl 状态查询失败，尝试 SDK：{url}: {e}")
+        try:
+            return self._fetch_sdk()
+        except Exception as e:
+            logging.warning(f"Firecrawl SDK 状态查询失败：{e}")
+            return {}
+
+    # ---- pacing ----
+    def _observe(self, page: Dict[str, Any], now: float, last: Dict[str, float]) -> None:
+        try:
+            completed = int(page.get("completed") or 0)
+        except (TypeError, ValueError):
+            completed = self.completed
+        dt = now - last["t"]
+        progressed = completed - last["completed"]
+        if progressed > 0 and dt > 0:
+            inst = progressed / dt
+            self.rate = inst if self.rate is None else (1 - RATE_ALPHA) * self.rate + RATE_ALPHA * inst
+            last["t"], last["completed"] = now, completed
+            # Come back when about target_batch new pages should be done
+            self.delay = self.target_batch / self.rate
+        else:
+            self.delay = max(BACKOFF_START, self.delay * 2)
+        self.delay = min(self.max_delay, max(self.min_delay, self.delay))
+
+    def _sleep(self) -> None:
+        pause = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.waits += 1
+        self.waited += pause
+        time.sleep(pause)
+
+    # ---- iteration ----
+    def _take(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        data = page.get("data") or []
+        self.consumed = max(self.consumed, int(page.get("_skip") or 0) + len(data))
+        fresh: List[Dict[str, Any]] = []
+        for doc in data:
+            source = document_source(doc)
+            if source:
+                if source in self.seen:
+                    self.duplicates += 1
+                    continue
+                self.seen.add(source)
+            fresh.append(doc)
+        self.delivered += len(fresh)
+        return fresh
+
+    def iter_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield lists of not-yet-delivered documents until the crawl has ended."""
+        url = self.cursor
+        errors = 0
+        last = {"t": time.monotonic(), "completed": float(self.completed)}
+        while True:
+            page = self.fetch(url)
+            if not page:
+                errors += 1
+                if errors >= MAX_ERRORS:
+                    logging.warning(f"Firecrawl 状态查询连续失败 {errors} 次，停止轮询：{url}")
+                    return
+                self.delay = min(self.max_delay, max(self.min_delay, BACKOFF_START, self.delay * 2))
+                self._sleep()
+                continue
+            errors = 0
+            self.status = page.get("status") or self.status
+            self.total = int(page.get("total") or self.total or 0)
+            fresh = self._take(page)
+            self._observe(page, time.monotonic(), last)
+            self.completed = int(page.get("completed") or self.completed or 0)
+            if fresh:
+                yield fresh
+            nxt = page.get("next")
+            if isinstance(nxt, str) and nxt.strip() and nxt.strip() != url:
+                # More results already waiting on the server: follow the cursor right away
+                url = nxt.strip()
+                continue
+            if self.status in TERMINAL_STATUSES:
+                self.finished = True
+                if self.status != "completed":
+                    logging.warning(f"Firecrawl 抓取任务结束：{self.status}")
+                return
+            now = time.monotonic()
+            if now - self._logged_at >= PROGRESS_LOG_EVERY:
+                self._logged_at = now
+                logging.info(f"Firecrawl 抓取进行中：{self.completed}/{self.total} 已交付={self.delivered} 速率={self.rate or 0:.2f} 页/秒 下次等待={self.delay:.1f}s")
+            self._sleep()
+            url = self.resume_url
+
+    def wait_ready(self) -> Dict[str, Any]:
+        """Poll (with the same pacing) until the current page has data or the crawl has ended."""
+        url = self.cursor
+        errors = 0
+        last = {"t": time.monotonic(), "completed": float(self.completed)}
+        while True:
+            page = self.fetch(url)
+            if page:
+                errors = 0
+                if page.get("data") or page.get("next") or page.get("status") in TERMINAL_STATUSES:
+                    page.pop("_skip", None)
+                    return page
+                self._observe(page, time.monotonic(), last)
+            else:
+                errors += 1
+                if errors >= MAX_ERRORS:
+                    return {}
+                self.delay = min(self.max_delay, max(self.min_delay, BACKOFF_START, self.delay * 2))
+            self._sleep()
+
+    def close(self) -> None:
+        try:
+            self.session.close()
+        except Exception:
+            pass
+
+    def log_stats(self) -> None:
+        logging.info(
+            f"Firecrawl 轮询统计：请求={self.polls} 等待次数={self.waits} 等待总时长={self.waited:.1f}s "
+            f"交付页面={self.delivered} 重复丢弃={self.duplicates} 状态={self.status}"
+        )
+
+
+_DONE = object()
+
+
+class BatchPrefetcher:
+    """Run a batch iterator in a background thread, `depth` batches ahead.
+
+    The next status page (or webhook batch) is fetched, and any poll wait spent,
+    while the caller is still enriching the current batch, so network and
+    server time overlap with LLM time. The queue is bounded, so at most `depth`
+    batches are held in memory and the producer stops fetching when the
+    consumer falls behind. Batches come out in the order the iterator produced
+    them; an exception in the producer is re-raised in the consumer.
+    """
+
+    def __init__(self, batches: Iterator[Any], depth: int = 1, name: str = "firecrawl-prefetch"):
+        self.depth = max(1, int(depth))
+        self.batches = 0
+        self.waited = 0.0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.depth)
+        self._stop = threading.Event()
+        self._source = batches
+        self._thread = threading.Thread(target=self._produce, name=name, daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self) -> None:
+        try:
+            for batch in self._source:
+                if not self._put(batch):
+                    return
+            self._put(_DONE)
+        except BaseException as e:  # handed to the consumer thread
+            self._put(e)
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            started = time.monotonic()
+            item = self._queue.get()
+            self.waited += time.monotonic() - started
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            self.batches += 1
+            yield item
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the producer (after its current fetch) and drop queued batches."""
+        self._stop.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._thread.join(timeout)
+
+    def log_stats(self) -> None:
+        logging.info(f"Firecrawl 预取统计：批次={self.batches} 队列深度={self.depth} 等待下一批总时长={self.waited:.1f}s")
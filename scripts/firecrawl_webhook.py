@@ -0,0 +1,222 @@
+"""Local receiver for Firecrawl crawl webhooks.
+
+Instead of sleeping between `/v2/crawl/{id}` status polls, the crawl is started
+with a webhook pointing at a small HTTP server in this process. Firecrawl POSTs
+one `crawl.page` event per finished page, so pages are queued for enrichment
+the moment they are scraped, and `crawl.completed` / `crawl.failed` end the
+stream without another status round-trip.
+
+Webhook delivery is best effort, so two safety nets fall back to the status
+API: when no event arrives for `idle_timeout` seconds the crawl status is
+checked once, and after the crawl ends the status pages are walked once to pick
+up any page whose event never arrived. Pages are de-duplicated by source URL.
+
+The server uses only the standard library and can bind port 0, so it is easy
+to point at a local stand-in for Firecrawl.
+
+Configuration (CLI flags in the scripts take precedence):
+  - FIRECRAWL_WEBHOOK          1 to use webhook mode
+  - FIRECRAWL_WEBHOOK_LISTEN   host:port to bind (default 127.0.0.1:0, any free port)
+  - FIRECRAWL_WEBHOOK_URL      URL Firecrawl should call, when it differs from the
+                               bound address (e.g. Firecrawl running in Docker)
+  - FIRECRAWL_WEBHOOK_SECRET   verify the X-Firecrawl-Signature HMAC when set
+  - FIRECRAWL_WEBHOOK_IDLE     seconds without events before checking status (default 60)
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .firecrawl_poller import TERMINAL_STATUSES, CrawlPoller, document_source, document_to_dict
+
+DEFAULT_PATH = "/firecrawl/webhook"
+DEFAULT_LISTEN = "127.0.0.1:0"
+DEFAULT_IDLE_TIMEOUT = 60.0
+WEBHOOK_EVENTS = ["started", "page", "completed", "failed"]
+TERMINAL_EVENTS = ("completed", "failed", "cancelled")
+
+
+def parse_listen(listen: str) -> Tuple[str, int]:
+    """'host:port', ':port' or 'port' -> (host, port)."""
+    listen = (listen or DEFAULT_LISTEN).strip()
+    host, _, port = listen.rpartition(":")
+    if not _:
+        host, port = "", listen
+    return host or "127.0.0.1", int(port or 0)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        receiver: "WebhookReceiver" = self.server.receiver  # type: ignore[attr-defined]
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length > 0 else b""
+        code = receiver.handle(self.path, raw, self.headers.get("X-Firecrawl-Signature", ""))
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class WebhookReceiver:
+    """Threaded HTTP server queueing Firecrawl crawl webhook events."""
+
+    def __init__(self, listen: str = DEFAULT_LISTEN, public_url: str = "", secret: str = "", path: str = DEFAULT_PATH):
+        self.host, self.port = parse_listen(listen)
+        self.path = path
+        self.public_url = public_url.strip()
+        self.secret = secret or ""
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self.counts: Dict[str, int] = {}
+        self.rejected = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "WebhookReceiver":
+        server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        server.daemon_threads = True
+        server.receiver = self  # type: ignore[attr-defined]
+        self._server = server
+        self.port = server.server_address[1]
+        self._thread = threading.Thread(target=server.serve_forever, name="firecrawl-webhook", daemon=True)
+        self._thread.start()
+        logging.info(f"Firecrawl webhook 接收端已启动：监听 {self.host}:{self.port}，回调地址 {self.url}")
+        return self
+
+    @property
+    def url(self) -> str:
+        if self.public_url:
+            return self.public_url
+        host = "127.0.0.1" if self.host in ("", "0.0.0.0") else self.host
+        return f"http://{host}:{self.port}{self.path}"
+
+    def webhook_config(self) -> Dict[str, Any]:
+        """`webhook` value for the /v2/crawl start request."""
+        return {"url": self.url, "events": list(WEBHOOK_EVENTS)}
+
+    def _signature_ok(self, raw: bytes, signature: str) -> bool:
+        if not self.secret:
+            return True
+        expected = hmac.new(self.secret.encode("utf-8"), raw, hashlib.sha256).hexdigest()
+        given = signature.split("=", 1)[1] if signature.startswith("sha256=") else signature
+        return hmac.compare_digest(expected, given.strip())
+
+    def handle(self, path: str, raw: bytes, signature: str = "") -> int:
+        """Validate and queue one webhook POST; returns the HTTP status to answer with."""
+        if path.split("?", 1)[0].rstrip("/") != self.path.rstrip("/"):
+            return 404
+        if not self._signature_ok(raw, signature):
+            self.rejected += 1
+            logging.warning("Firecrawl webhook 签名校验失败，已丢弃")
+            return 401
+        try:
+            payload = json.loads(raw.decode("utf-8") or "{}")
+        except ValueError:
+            self.rejected += 1
+            return 400
+        if not isinstance(payload, dict):
+            self.rejected += 1
+            return 400
+        kind = str(payload.get("type") or "").split(".")[-1]
+        data = payload.get("data")
+        event = {
+            "type": kind,
+            "id": payload.get("id") or payload.get("jobId"),
+            "data": [document_to_dict(d) for d in data if isinstance(d, dict)] if isinstance(data, list) else [],
+            "error": payload.get("error"),
+        }
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        self.events.put(event)
+        return 200
+
+    def next_batch(self, crawl_id: Optional[str], timeout: float, max_items: int = 0) -> Tuple[List[Dict[str, Any]], str]:
+        """Wait up to `timeout` for page events of `crawl_id` and drain what is queued.
+        Returns (documents, state) with state "page", a terminal event type or "idle"."""
+        docs: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            block = not docs
+            try:
+                event = self.events.get(timeout=max(0.0, deadline - time.monotonic())) if block else self.events.get_nowait()
+            except queue.Empty:
+                return docs, "page" if docs else "idle"
+            if crawl_id and event.get("id") and event["id"] != crawl_id:
+                continue
+            if event["type"] == "page":
+                docs.extend(event["data"])
+                if max_items and len(docs) >= max_items:
+                    return docs, "page"
+            elif event["type"] in TERMINAL_EVENTS:
+                if event["type"] != "completed":
+                    logging.warning(f"Firecrawl 抓取任务结束：{event['type']} {event.get('error') or ''}")
+                return docs, event["type"]
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        summary = " ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+        logging.info(f"Firecrawl webhook 统计：{summary or '无事件'} 拒绝={self.rejected}")
+
+
+def iter_webhook_batches(
+    receiver: WebhookReceiver,
+    crawl_id: Optional[str],
+    status_url: str,
+    auth_header: str = "",
+    max_items: int = 0,
+    idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    firecrawl_base: Optional[str] = None,
+    min_delay: Optional[float] = None,
+    max_delay: Optional[float] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield lists of page documents as webhook events arrive, each source once,
+    then any pages the status API has that no event delivered. The status API is
+    read through a CrawlPoller built from `firecrawl_base`, `min_delay` and `max_delay`."""
+    # The poller shares `seen`, so the final status walk only yields pages no event delivered
+    poller = CrawlPoller(status_url, auth_header, firecrawl_base, min_delay=min_delay, max_delay=max_delay, seen=set())
+    try:
+        while True:
+            docs, state = receiver.next_batch(crawl_id, idle_timeout, max_items)
+            batch = [doc for doc in docs if _first_time(poller.seen, doc)]
+            if batch:
+                yield batch
+            if state in TERMINAL_EVENTS:
+                break
+            if state == "idle":
+                status = poller.fetch(status_url)
+                logging.info(f"Firecrawl webhook {idle_timeout:g}s 内无事件，状态={status.get('status')} 进度={status.get('completed')}/{status.get('total')}")
+                if status.get("status") in TERMINAL_STATUSES:
+                    break
+        # Reconcile with the status API for events that were lost in transit
+        missed = 0
+        for batch in poller.iter_batches():
+            missed += len(batch)
+            yield batch
+        if missed:
+            logging.info(f"Firecrawl webhook 未送达的页面已通过状态接口补齐：{missed} 个")
+    finally:
+        poller.close()
+
+
+def _first_time(seen: set, doc: Dict[str, Any]) -> bool:
+    source = document_source(doc)
+    if not source:
+        return True
+    if source in seen:
+        return False
+    seen.add(source)
+    return True
+
+
+def webhook_enabled_default() -> bool:
+    return str(os.environ.get("FIRECRAWL_WEBHOOK", "")).strip().lower() in ("1", "true", "yes", "on")
@@ -1,8 +1,13 @@
+import logging
 import re
-from typing import Any, List, Tuple
+import threading
+import time
+from typing import Any, Dict, List, Tuple
 
 import yaml  # type: ignore
 
+from .metrics import get_metrics
+
 # CJK detection regex for filtering Chinese characters
 CJK_REGEX = re.compile(
     r"[\u3400-\u4DBF\u4E00-\u9FFF\u3000-\u303F\uFE30-\uFE4F\uF900-\uFAFF\uFF00-\uFFEF\U00020000-\U0002A6DF\U0002A700-\U0002B81F\U0002B820-\U0002CEAF\U0002F800-\U0002FA1F]"
@@ -16,7 +21,7 @@ def contains_cjk(text: str) -> bool:
         return False
 
 
-def get_zh_en_translator():
+def _load_zh_en_translator():
     try:
         from argostranslate import translate as argos_translate  # type: ignore
         installed = argos_translate.get_installed_languages()
@@ -30,6 +35,48 @@ def get_zh_en_translator():
     return None
 
 
+_TRANSLATOR = None
+_TRANSLATOR_LOADED = False
+_TRANSLATOR_LOAD_LOCK = threading.Lock()
+# Argos/ctranslate2 translation objects are shared, so calls are serialized
+_TRANSLATOR_CALL_LOCK = threading.Lock()
+
+
+def _serialized(fn):
+    def translate(text: str) -> str:
+        with _TRANSLATOR_CALL_LOCK, get_metrics().timer("argos"):
+            return fn(text)
+    return translate
+
+
+def get_zh_en_translator():
+    """Return the process-wide Argos zh->en translate function, or None if Argos or
+    the language pair is not installed. Loaded once, on first use or by
+    warm_zh_en_translator(); later calls return the cached handle."""
+    global _TRANSLATOR, _TRANSLATOR_LOADED
+    if _TRANSLATOR_LOADED:
+        return _TRANSLATOR
+    with _TRANSLATOR_LOAD_LOCK:
+        if not _TRANSLATOR_LOADED:
+            t0 = time.perf_counter()
+            fn = _load_zh_en_translator()
+            _TRANSLATOR = _serialized(fn) if fn else None
+            _TRANSLATOR_LOADED = True
+            elapsed = time.perf_counter() - t0
+            if _TRANSLATOR:
+                logging.info(f"Argos 翻译器已加载：zh->en 耗时={elapsed:.2f}s")
+            else:
+                logging.info(f"Argos 翻译器不可用（未安装 argostranslate 或 zh->en 模型），检查耗时={elapsed:.2f}s")
+    return _TRANSLATOR
+
+
+def warm_zh_en_translator() -> threading.Thread:
+    """Load the translator on a background thread so the cost overlaps other startup work."""
+    thread = threading.Thread(target=get_zh_en_translator, name="argos-warm", daemon=True)
+    thread.start()
+    return thread
+
+
 def translate_if_cjk(s: Any, translator) -> Any:
     if not isinstance(s, str):
         return s
@@ -51,36 +98,78 @@ def translate_front_matter_fields(title: str, description: str, categories: List
     return t, d, cats2, tags2, kws2
 
 
-def translate_body_cjk_to_en(body: str, cancelled: bool = False) -> Tuple[str, int]:
-    translator = get_zh_en_translator()
+# Consecutive CJK characters, found in one finditer/sub pass
+CJK_RUN_REGEX = re.compile(CJK_REGEX.pattern + "+")
+# Unique runs sent to Argos per call, and the character cap for one batch
+ARGOS_BATCH_RUNS = 64
+ARGOS_BATCH_CHARS = 4000
+
+
+def _translate_runs(runs: List[str], translator, cancelled: bool = False) -> Dict[str, str]:
+    """Translate unique CJK runs with as few translator calls as possible.
+    Runs are joined with newlines (Argos translates line by line) and split back;
+    if the line count does not survive, that batch falls back to one call per run."""
+    out: Dict[str, str] = {}
+    if not translator:
+        return out
+    batch: List[str] = []
+    size = 0
+
+    def flush() -> None:
+        nonlocal batch, size
+        if not batch:
+            return
+        if cancelled:
+            raise KeyboardInterrupt
+        lines: List[str] = []
+        if len(batch) > 1:
+            try:
+                lines = (translator("\n".join(batch)) or "").split("\n")
+            except Exception:
+                lines = []
+        if len(lines) == len(batch):
+            for src, trans in zip(batch, lines):
+                out[src] = trans.strip()
+        else:
+            for src in batch:
+                try:
+                    out[src] = (translator(src) or "").strip()
+                except Exception:
+                    out[src] = ""
+        batch = []
+        size = 0
+
+    for run in runs:
+        if batch and (len(batch) >= ARGOS_BATCH_RUNS or size + len(run) > ARGOS_BATCH_CHARS):
+            flush()
+        batch.append(run)
+        size += len(run) + 1
+    flush()
+    return out
+
+
+def translate_body_cjk_to_en(body: str, cancelled: bool = False, translator=None) -> Tuple[str, int]:
+    """Replace every run of CJK characters in `body` with its Argos translation.
+    Identical runs are translated once; `translator` defaults to get_zh_en_translator().
+    Returns (text, number of runs replaced). Without a translator the runs are
+    blanked out, as is any CJK left in the translations."""
+    if translator is None:
+        translator = get_zh_en_translator()
     replaced = 0
     try:
-        out_chars: List[str] = []
-        i = 0
-        n = len(body)
-        while i < n:
-            if cancelled:
-                raise KeyboardInterrupt
-            ch = body[i]
-            if CJK_REGEX.match(ch):
-                j = i + 1
-                while j < n and CJK_REGEX.match(body[j]):
-                    j += 1
-                src = body[i:j]
-                trans = ""
-                if translator:
-                    try:
-                        trans = translator(src) or ""
-                    except Exception:
-                        trans = ""
-                replaced += 1
-                trans = trans.strip()
-                out_chars.append(f" {trans} " if trans else " ")
-                i = j
-            else:
-                out_chars.append(ch)
-                i += 1
-        out = "".join(out_chars)
+        if cancelled:
+            raise KeyboardInterrupt
+        runs = CJK_RUN_REGEX.findall(body)
+        if not runs:
+            return body, 0
+        replaced = len(runs)
+        translations = _translate_runs(list(dict.fromkeys(runs)), translator, cancelled)
+
+        def _sub(m: "re.Match[str]") -> str:
+            trans = translations.get(m.group(0), "")
+            return f" {trans} " if trans else " "
+
+        out = CJK_RUN_REGEX.sub(_sub, body)
         # Cleanup any residual CJK chars
         out = CJK_REGEX.sub("", out)
         return out, replaced
@@ -95,6 +184,18 @@ def build_yaml(fm: dict) -> str:
     dumped = yaml.safe_dump(fm, allow_unicode=True, sort_keys=False)
     return "---\n" + dumped + "---\n\n"
 
+
+def read_front_matter(path: str) -> dict:
+    """Front matter of a Markdown file written by build_yaml(); {} if missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        m = re.match(r"^---\r?\n([\s\S]*?)\r?\n---\r?\n", content)
+        data = yaml.safe_load(m.group(1)) if m else None
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
 # ---- Ollama response parsing utilities ----
 import json
 
@@ -0,0 +1,271 @@
+"""HTML to Markdown conversion for Firecrawl results, optionally in a process pool.
+
+When Firecrawl returns only HTML, every page has to be converted before it can
+be translated. The conversion is pure-Python CPU work; done inline for a batch
+of hundreds of pages it holds up everything else in the crawl loop.
+`HtmlConversionPool` converts a whole batch in worker processes that stay up
+for the whole crawl, so interpreter start-up and imports are paid once per
+worker. Every page still gets its own `html2text.HTML2Text`, built from the
+shared settings in `_new_converter`: an instance keeps parser state (such as
+list nesting) between `handle()` calls, and a reused one changes the output.
+Building one costs microseconds next to the milliseconds of the conversion.
+
+`submit()` hands a batch to the workers and returns at once; the crawler calls
+it from the Firecrawl prefetch thread as each batch arrives and only collects
+the Markdown (`PendingConversion.result()`) when the batch's turn comes, so the
+conversion runs while the previous batch is still being enriched.
+
+Batches with fewer HTML-only pages than `min_batch` are converted inline, so
+crawls that get Markdown from Firecrawl never start the pool. If the pool
+breaks, the remaining batches are converted inline.
+
+Configuration (CLI flags in the scripts take precedence):
+  - HTML_CONVERT_WORKERS     worker processes (default: CPU count - 1, at most 4; 0 converts inline)
+  - HTML_CONVERT_MIN_BATCH   HTML-only pages in a batch needed to use the pool (default 8)
+"""
+
+import html as html_module
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Sequence
+
+import html2text  # type: ignore
+from markdownify import markdownify as md  # type: ignore
+
+from .metrics import get_metrics
+
+DEFAULT_MIN_BATCH = 8
+
+def default_workers() -> int:
+    return max(0, min(4, (os.cpu_count() or 1) - 1))
+
+
+def _new_converter() -> "html2text.HTML2Text":
+    h = html2text.HTML2Text()
+    h.ignore_links = False  # always keep links
+    h.ignore_images = False
+    h.inline_links = True   # keep original link inline so URL is visible in context
+    h.body_width = 0
+    return h
+
+
+def convert_images_to_reference(md_text: str) -> str:
+    """Convert inline image syntax to reference-style images and append references.
+    Example: ![alt](url "title") -> ![alt][img-1] with a footnote [img-1]: url "title"
+    """
+    refs = []
+    counter = 1
+
+    def repl(m):
+        nonlocal counter
+        alt = m.group(1) or ""
+        url = m.group(2)
+        title = m.group(3)
+        ref_id = f"img-{counter}"
+        counter += 1
+        refs.append((ref_id, url, title))
+        return f"![{alt}][{ref_id}]"
+
+    # Only transform inline pattern; keep existing reference-style untouched
+    new_md = re.sub(r"!\[([^\]]*)\]\(([^)\s]+)(?:\s+\"([^\"]*)\")?\)", repl, md_text)
+    if refs:
+        new_md = new_md.rstrip() + "\n\n"
+        for ref_id, url, title in refs:
+            if title:
+                new_md += f"[{ref_id}]: {url} \"{title}\"\n"
+            else:
+                new_md += f"[{ref_id}]: {url}\n"
+    return new_md
+
+
+def html_to_markdown(html: str) -> str:
+    """Convert HTML to Markdown while preserving links and using reference-style images.
+    Tries `html2text`, then `markdownify`, and finally a robust fallback.
+    """
+    if not html:
+        return ""
+    # Try html2text
+    try:
+        md_text = _new_converter().handle(html)
+        return convert_images_to_reference(md_text)
+    except Exception:
+        pass
+    # Try markdownify
+    try:
+        md_text = md(html, heading_style="ATX")
+        return convert_images_to_reference(md_text)
+    except Exception:
+        pass
+    # Fallback: transform <a> and <img> first, then strip other tags, preserving references.
+    img_refs = []
+    img_counter = 1
+
+    def img_repl(m):
+        nonlocal img_counter
+        src = m.group(1)
+        alt = m.group(2) or ""
+        title = m.group(3)
+        ref_id = f"img-{img_counter}"
+        img_counter += 1
+        img_refs.append((ref_id, src, title))
+        return f"![{alt}][{ref_id}]"
+
+    def a_repl(m):
+        href = m.group(1)
+        text = m.group(2).strip()
+        text = text if text else href
+        return f"[{text}]({href})"
+
+    working = html
+    # Remove script/style content early
+    working = re.sub(r"(?is)<(script|style)[^>]*>.*?</\\1>", "", working)
+    # Replace images with reference-style placeholders
+    working = re.sub(r"(?is)<img[^>]*src=\"([^\"]+)\"[^>]*(?:alt=\"([^\"]*)\")?[^>]*(?:title=\"([^\"]*)\")?[^>]*>", img_repl, working)
+    # Replace anchors with inline markdown links
+    working = re.sub(r"(?is)<a[^>]*href=\"([^\"]+)\"[^>]*>(.*?)</a>", a_repl, working)
+    # Basic line breaks
+    working = re.sub(r"(?is)<br\\s*/?>", "\n", working)
+    working = re.sub(r"(?is)</p\\s*>", "\n\n", working)
+    # strip remaining tags
+    working = re.sub(r"(?is)<[^>]+>", "", working)
+    md_text = html_module.unescape(working).strip()
+    if img_refs:
+        md_text = md_text.rstrip() + "\n\n"
+        for ref_id, src, title in img_refs:
+            if title:
+                md_text += f"[{ref_id}]: {src} \"{title}\"\n"
+            else:
+                md_text += f"[{ref_id}]: {src}\n"
+    return md_text
+
+
+def _init_worker() -> None:
+    # Warm up the converter and regexes before the first batch arrives
+    html_to_markdown("<p>warm-up</p>")
+
+
+def _convert_chunk(htmls: List[str]) -> List[str]:
+    return [html_to_markdown(h) for h in htmls]
+
+
+class PendingConversion:
+    """Markdown of one submitted batch; `result()` waits for the worker processes."""
+
+    def __init__(self, pool: "HtmlConversionPool", htmls: List[str], futures: List[Future], started: float):
+        self.pool = pool
+        self.htmls = htmls
+        self.futures = futures
+        self.started = started
+        self.finished = started
+        self._out: Optional[List[str]] = None
+        for fut in futures:
+            fut.add_done_callback(self._done)
+
+    @classmethod
+    def completed(cls, pool: "HtmlConversionPool", out: List[str]) -> "PendingConversion":
+        pending = cls(pool, [], [], time.monotonic())
+        pending._out = out
+        return pending
+
+    def _done(self, _fut: Future) -> None:
+        self.finished = max(self.finished, time.monotonic())
+
+    def result(self) -> List[str]:
+        """Markdown for each HTML string, in order (converted inline if the pool failed)."""
+        if self._out is not None:
+            return self._out
+        waited = time.monotonic()
+        try:
+            out = [body for fut in self.futures for body in fut.result()]
+            task = "pool"
+        except Exception as e:
+            logging.warning(f"HTML 转换进程池出错，改为在主进程中转换：{e}")
+            self.pool.close()
+            self.pool.workers = 0
+            self.started = time.monotonic()
+            out = _convert_chunk(self.htmls)
+            self.finished = time.monotonic()
+            task = "inline"
+        self.pool._record(len(self.htmls), self.finished - self.started, task, time.monotonic() - waited)
+        self._out = out
+        self.htmls = []
+        return out
+
+
+class HtmlConversionPool:
+    """Converts batches of HTML pages to Markdown, in worker processes for large batches."""
+
+    def __init__(self, workers: Optional[int] = None, min_batch: int = DEFAULT_MIN_BATCH):
+        self.workers = default_workers() if workers is None else max(0, workers)
+        self.min_batch = max(1, min_batch)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"pages": 0, "pooled": 0, "seconds": 0.0, "waited": 0.0}
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._executor is None and self.workers > 0:
+            try:
+                # spawn: the crawler already runs threads, which fork does not copy safely
+                ctx = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_worker)
+                logging.info(f"HTML 转换进程池已启动：{self.workers} 个进程")
+            except Exception as e:
+                logging.warning(f"HTML 转换进程池启动失败，改为在主进程中转换：{e}")
+                self.workers = 0
+        return self._executor
+
+    def submit(self, htmls: Sequence[str]) -> PendingConversion:
+        """Start converting a batch; large batches go to the worker processes and
+        this returns before they finish, small ones are converted right here."""
+        htmls = list(htmls)
+        started = time.monotonic()
+        with self._lock:
+            pool = self._pool() if len(htmls) >= self.min_batch else None
+            if pool is not None:
+                # A few chunks per worker: balanced load without one task per page
+                size = max(1, -(-len(htmls) // (self.workers * 4)))
+                try:
+                    futures = [pool.submit(_convert_chunk, htmls[i:i + size]) for i in range(0, len(htmls), size)]
+                    return PendingConversion(self, htmls, futures, started)
+                except Exception as e:
+                    logging.warning(f"HTML 转换进程池出错，改为在主进程中转换：{e}")
+                    self._shutdown()
+                    self.workers = 0
+        out = _convert_chunk(htmls)
+        if htmls:
+            self._record(len(htmls), time.monotonic() - started, "inline")
+        return PendingConversion.completed(self, out)
+
+    def convert(self, htmls: Sequence[str]) -> List[str]:
+        """Markdown for each HTML string, in order."""
+        return self.submit(htmls).result()
+
+    def _record(self, pages: int, elapsed: float, task: str, waited: float = 0.0) -> None:
+        with self._lock:
+            self.stats["pages"] += pages
+            self.stats["seconds"] += elapsed
+            self.stats["waited"] += waited
+            if task == "pool":
+                self.stats["pooled"] += pages
+        get_metrics().observe("html_convert", elapsed, task=task)
+
+    def log_stats(self) -> None:
+        st = self.stats
+        if not st["pages"]:
+            return
+        rate = st["pages"] / st["seconds"] if st["seconds"] > 0 else 0.0
+        logging.info(f"HTML 转换统计：页面={st['pages']}（进程池={st['pooled']}） 耗时={st['seconds']:.2f}s 速度={rate:.1f} 页/秒 主循环等待={st['waited']:.2f}s")
+
+    def close(self) -> None:
+        with self._lock:
+            self._shutdown()
+
+    def _shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
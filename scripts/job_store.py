@@ -0,0 +1,237 @@
+"""SQLite job store recording how far each source page has got through the pipeline.
+
+Every (pipeline, source, stage) row marks one finished stage — fetched,
+translated, enriched, written — together with the stage's output: a JSON
+payload (the fetched item, the translated body, the enrichment result, ...)
+and/or the path of the file it produced. On restart a page resumes after its
+last finished stage, so LLM work that already completed is reused instead of
+repeated, and pages fetched but not yet written before a crash are picked up
+again instead of being lost with the rest of their batch.
+
+`pipeline` namespaces the rows: the crawler uses one per output directory, the
+CN scripts share "cn" and find a file's source URL through the path recorded
+by the stage that wrote it.
+
+Configuration (CLI flags in the scripts take precedence):
+  - STATE_DB    database path (default `.cache/pipeline_state.sqlite3`)
+  - STATE_DB=0  disable the store (same as --no-state-db)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_STATE_PATH = os.path.join(".cache", "pipeline_state.sqlite3")
+STAGES = ("fetched", "translated", "enriched", "written")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """Thread-safe SQLite store of finished pipeline stages."""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " pipeline TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " path TEXT,"
+            " input_hash TEXT,"
+            " payload TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (pipeline, source, stage))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_path ON jobs(path)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_seq ON jobs(pipeline, stage, seq)")
+        conn.commit()
+        self._conn = conn
+
+    def mark(self, pipeline: str, source: str, stage: str, payload: Any = None, path: Optional[str] = None, input_hash: Optional[str] = None) -> None:
+        """Record `stage` as finished for `source`, replacing an earlier record of the same stage."""
+        if stage not in STAGES:
+            raise ValueError(f"unknown stage: {stage}")
+        data = json.dumps(payload, ensure_ascii=False) if payload is not None else None
+        abs_path = os.path.abspath(path) if path else None
+        with self._lock:
+            # seq keeps the order in which sources were first fetched
+            row = self._conn.execute("SELECT MIN(seq) FROM jobs WHERE pipeline = ? AND source = ?", (pipeline, source)).fetchone()
+            seq = row[0] if row and row[0] is not None else self._conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs WHERE pipeline = ?", (pipeline,)).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (pipeline, source, stage, seq, path, input_hash, payload, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (pipeline, source, stage, seq, abs_path, input_hash, data, time.time()),
+            )
+            self._conn.commit()
+
+    def get(self, pipeline: str, source: str, stage: str) -> Optional[Dict[str, Any]]:
+        """Return {"payload", "path", "input_hash", "updated_at"} for a finished stage, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, path, input_hash, updated_at FROM jobs WHERE pipeline = ? AND source = ? AND stage = ?",
+                (pipeline, source, stage),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            payload = json.loads(row[0]) if row[0] is not None else None
+        except ValueError:
+            payload = None
+        return {"payload": payload, "path": row[1], "input_hash": row[2], "updated_at": row[3]}
+
+    def pending(self, pipeline: str, stage: str = "written") -> List[Tuple[str, Any]]:
+        """(source, fetched payload) for sources fetched but without `stage`, in fetch order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.source, f.payload FROM jobs f WHERE f.pipeline = ? AND f.stage = 'fetched' AND NOT EXISTS ("
+                " SELECT 1 FROM jobs d WHERE d.pipeline = f.pipeline AND d.source = f.source AND d.stage = ?)"
+                " ORDER BY f.seq",
+                (pipeline, stage),
+            ).fetchall()
+        out: List[Tuple[str, Any]] = []
+        for source, data in rows:
+            try:
+                out.append((source, json.loads(data) if data is not None else None))
+            except ValueError:
+                out.append((source, None))
+        return out
+
+    def payloads(self, pipeline: str, stage: str) -> List[Tuple[str, Any]]:
+        """(source, payload) of every source that finished `stage`, in fetch order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT source, payload FROM jobs WHERE pipeline = ? AND stage = ? ORDER BY seq", (pipeline, stage)).fetchall()
+        out: List[Tuple[str, Any]] = []
+        for source, data in rows:
+            try:
+                out.append((source, json.loads(data) if data is not None else None))
+            except ValueError:
+                out.append((source, None))
+        return out
+
+    def source_for_path(self, path: str, pipeline: Optional[str] = None) -> Optional[str]:
+        """Source whose most recent stage output is `path`."""
+        query = "SELECT source FROM jobs WHERE path = ?"
+        params: List[Any] = [os.path.abspath(path)]
+        if pipeline:
+            query += " AND pipeline = ?"
+            params.append(pipeline)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY updated_at DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def counts(self, pipeline: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT stage, COUNT(*) FROM jobs WHERE pipeline = ? GROUP BY stage", (pipeline,)).fetchall()
+        found = dict(rows)
+        return {stage: int(found.get(stage, 0)) for stage in STAGES}
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+
+class PipelineJobs:
+    """JobStore bound to one pipeline. Every method is a no-op when the store is disabled,
+    so callers do not need to special-case `--no-state-db`."""
+
+    def __init__(self, store: Optional[JobStore], pipeline: str):
+        self.store = store
+        self.pipeline = pipeline
+        self.reused: Dict[str, int] = {stage: 0 for stage in STAGES}
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def mark(self, source: str, stage: str, payload: Any = None, path: Optional[str] = None, input_hash: Optional[str] = None) -> None:
+        if self.store is None or not source:
+            return
+        try:
+            self.store.mark(self.pipeline, source, stage, payload, path, input_hash)
+        except Exception as e:
+            logging.warning(f"状态库写入失败：{source} {stage}: {e}")
+
+    def get(self, source: str, stage: str, input_hash: Optional[str] = None, require_path: bool = False) -> Optional[Dict[str, Any]]:
+        """Finished-stage record, or None if missing, made for a different input, or its file is gone."""
+        if self.store is None or not source:
+            return None
+        try:
+            rec = self.store.get(self.pipeline, source, stage)
+        except Exception as e:
+            logging.warning(f"状态库读取失败：{source} {stage}: {e}")
+            return None
+        if rec is None:
+            return None
+        if input_hash is not None and rec.get("input_hash") != input_hash:
+            return None
+        if require_path and not (rec.get("path") and os.path.exists(rec["path"])):
+            return None
+        self.reused[stage] += 1
+        return rec
+
+    def pending(self, stage: str = "written") -> List[Tuple[str, Any]]:
+        if self.store is None:
+            return []
+        try:
+            return self.store.pending(self.pipeline, stage)
+        except Exception as e:
+            logging.warning(f"状态库读取失败：{e}")
+            return []
+
+    def payloads(self, stage: str) -> List[Tuple[str, Any]]:
+        if self.store is None:
+            return []
+        try:
+            return self.store.payloads(self.pipeline, stage)
+        except Exception as e:
+            logging.warning(f"状态库读取失败：{e}")
+            return []
+
+    def source_for_path(self, path: str) -> Optional[str]:
+        if self.store is None:
+            return None
+        try:
+            return self.store.source_for_path(path, self.pipeline)
+        except Exception:
+            return None
+
+    def log_stats(self) -> None:
+        if self.store is None:
+            return
+        try:
+            counts = self.store.counts(self.pipeline)
+        except Exception:
+            return
+        done = " ".join(f"{stage}={counts[stage]}" for stage in STAGES)
+        reused = " ".join(f"{stage}={self.reused[stage]}" for stage in STAGES if self.reused[stage])
+        logging.info(f"状态库统计（{self.pipeline}）：已完成 {done}；本次复用 {reused or '无'}；路径={self.store.path}")
+
+
+def open_pipeline_jobs(pipeline: str, path: Optional[str] = None, enabled: bool = True) -> PipelineJobs:
+    """Open the shared store (path from the argument, STATE_DB or the default) bound to `pipeline`."""
+    env = str(os.environ.get("STATE_DB", "")).strip()
+    if not enabled or env.lower() in ("0", "false", "no", "off"):
+        return PipelineJobs(None, pipeline)
+    db_path = path or env or DEFAULT_STATE_PATH
+    try:
+        return PipelineJobs(JobStore(db_path), pipeline)
+    except Exception as e:
+        logging.warning(f"状态库不可用，按无状态运行：{db_path}: {e}")
+        return PipelineJobs(None, pipeline)
@@ -0,0 +1,240 @@
+"""Persistent, content-addressed cache for Ollama generate calls.
+
+Responses are stored in a SQLite database keyed by sha256 over the model name,
+generation options and prompt, so re-running or resuming a crawl sends only the
+prompts that actually changed. Entries are evicted by age and by total size
+(least recently used first).
+
+Configuration (CLI flags in the scripts take precedence):
+  - LLM_CACHE=0               disable the cache (same as --no-llm-cache)
+  - LLM_CACHE_PATH            database path (default `.cache/llm_cache.sqlite3`)
+  - LLM_CACHE_MAX_MB          size cap in MB (default 512)
+  - LLM_CACHE_MAX_AGE_DAYS    entries older than this are dropped (default 30)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite3")
+DEFAULT_MAX_MB = 512.0
+DEFAULT_MAX_AGE_DAYS = 30.0
+# Run eviction every N writes in addition to once at startup
+EVICT_EVERY = 200
+
+
+def make_cache_key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Return the content address for one generate request."""
+    material = json.dumps(
+        {"model": model or "", "options": options or {}, "prompt": prompt or ""},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Thread-safe SQLite store of model responses.
+
+    A disabled cache never reads or writes but still counts misses, so callers
+    do not need to special-case `--no-llm-cache`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_mb: float = DEFAULT_MAX_MB, max_age_days: float = DEFAULT_MAX_AGE_DAYS, enabled: bool = True):
+        self.path = path
+        self.max_bytes = int(max(0.0, max_mb) * 1024 * 1024)
+        self.max_age_s = max(0.0, max_age_days) * 86400.0
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if not enabled:
+            return
+        try:
+            parent = os.path.dirname(os.path.abspath(path))
+            os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            conn.commit()
+            self._conn = conn
+        except Exception as e:
+            logging.warning(f"LLM 缓存不可用，改为直连模型：{path}: {e}")
+            self.enabled = False
+            self._conn = None
+            return
+        self.evict()
+
+    def get(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Return the cached response text, or None on a miss."""
+        if not self.enabled or self._conn is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        key = make_cache_key(model, prompt, options)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.max_age_s and now - row[1] > self.max_age_s:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+            except Exception as e:
+                logging.warning(f"LLM 缓存读取失败：{e}")
+                self.misses += 1
+                return None
+
+    def put(self, model: str, prompt: str, options: Optional[Dict[str, Any]], response: str) -> None:
+        """Store a successful response. Empty responses are not cached."""
+        if not self.enabled or self._conn is None or not isinstance(response, str) or not response.strip():
+            return
+        key = make_cache_key(model, prompt, options)
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model or "", response, len(response.encode("utf-8")), now, now),
+                )
+                self._conn.commit()
+                self.writes += 1
+                due = self.writes % EVICT_EVERY == 0
+            except Exception as e:
+                logging.warning(f"LLM 缓存写入失败：{e}")
+                return
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop entries past the age limit, then least recently used entries
+        until the total size fits under the cap. Returns the number removed."""
+        if not self.enabled or self._conn is None:
+            return 0
+        removed = 0
+        with self._lock:
+            try:
+                if self.max_age_s:
+                    cur = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_s,))
+                    removed += cur.rowcount or 0
+                if self.max_bytes:
+                    total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                    if total > self.max_bytes:
+                        excess = total - self.max_bytes
+                        doomed = []
+                        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+                            doomed.append((key,))
+                            excess -= size
+                            if excess <= 0:
+                                break
+                        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                        removed += len(doomed)
+                self._conn.commit()
+            except Exception as e:
+                logging.warning(f"LLM 缓存清理失败：{e}")
+            self.evicted += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = 0
+            size = 0
+            if self.enabled and self._conn is not None:
+                try:
+                    entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+                except Exception:
+                    pass
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "writes": self.writes,
+                "evicted": self.evicted,
+                "entries": entries,
+                "size_bytes": size,
+            }
+
+    def log_stats(self) -> None:
+        s = self.stats()
+        if not s["enabled"]:
+            logging.info(f"LLM 缓存已禁用：调用次数={s['misses']}")
+            return
+        logging.info(
+            f"LLM 缓存统计：命中={s['hits']} 未命中={s['misses']} 命中率={s['hit_rate']:.1%} "
+            f"写入={s['writes']} 淘汰={s['evicted']} 条目={s['entries']} 大小={s['size_bytes'] / 1048576:.1f}MB 路径={s['path']}"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+
+_CACHE: Optional[LLMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default) or default)
+    except Exception:
+        return default
+
+
+def configure_llm_cache(enabled: bool = True, path: Optional[str] = None, max_mb: Optional[float] = None, max_age_days: Optional[float] = None) -> LLMCache:
+    """(Re)build the process-wide cache; missing values fall back to the environment."""
+    global _CACHE
+    env_enabled = str(os.environ.get("LLM_CACHE", "1")).strip().lower() not in ("0", "false", "no", "off")
+    cache = LLMCache(
+        path=path or os.environ.get("LLM_CACHE_PATH") or DEFAULT_CACHE_PATH,
+        max_mb=max_mb if max_mb is not None else _env_float("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB),
+        max_age_days=max_age_days if max_age_days is not None else _env_float("LLM_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS),
+        enabled=enabled and env_enabled,
+    )
+    with _CACHE_LOCK:
+        old, _CACHE = _CACHE, cache
+    if old is not None:
+        old.close()
+    return cache
+
+
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide cache, creating it from the environment on first use."""
+    with _CACHE_LOCK:
+        cache = _CACHE
+    if cache is None:
+        cache = configure_llm_cache()
+    return cache
@@ -0,0 +1,222 @@
+"""Append-only journal for the crawler's resume manifest.
+
+manifest.json stays the snapshot format. Between snapshots, each written page
+appends one JSON line to `manifest.journal.jsonl` next to it, so persisting a
+page costs the same whether the crawl is at page 10 or page 100000. The
+snapshot is rewritten (compaction) once the journal holds as many events as the
+snapshot has pages (at least COMPACT_MIN_EVENTS), which keeps the amortised cost
+per page constant, and once more when the crawl ends.
+
+Resume reads the snapshot and replays the journal on top. Page events carry
+the running page count, so events already folded into a snapshot (a crash
+between writing the snapshot and truncating the journal) are skipped, and a
+torn last line from a crash mid-write is ignored.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from .metrics import get_metrics
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+COMPACT_MIN_EVENTS = 256
+META_KEYS = ("start_url", "firecrawl_base", "ollama_base", "ollama_model")
+
+
+def journal_path_for(manifest_path: str) -> str:
+    return os.path.splitext(manifest_path)[0] + JOURNAL_SUFFIX
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {
+        "start_url": None,
+        "firecrawl_base": None,
+        "ollama_base": None,
+        "ollama_model": None,
+        "pages_processed": 0,
+        "files": [],
+        "used_urls": [],
+        "sources": [],
+        "last_prev_url": None,
+        "global_categories_pool": [],
+        "global_tags_pool": [],
+        "latest_next_url": None,
+    }
+
+
+def _normalize(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    state = _empty_state()
+    state.update({k: v for k, v in snapshot.items() if k in state})
+    for key in ("files", "used_urls", "sources", "global_categories_pool", "global_tags_pool"):
+        state[key] = list(state.get(key) or [])
+    state["pages_processed"] = int(state.get("pages_processed") or 0)
+    return state
+
+
+def _apply_event(state: Dict[str, Any], used: set, event: Dict[str, Any]) -> bool:
+    """Fold one journal event into `state`. Returns False for events already in the snapshot."""
+    op = event.get("op")
+    if op == "meta":
+        for key in META_KEYS:
+            if key in event:
+                state[key] = event[key]
+        return True
+    if op == "terms":
+        # Pool terms added while rewriting a page already in the manifest; replaying
+        # one twice only repeats terms, which TaxonomyPool folds on load
+        state["global_categories_pool"].extend(event.get("categories") or [])
+        state["global_tags_pool"].extend(event.get("tags") or [])
+        return True
+    if op != "page":
+        return False
+    n = int(event.get("n") or 0)
+    if n <= state["pages_processed"]:
+        return False
+    state["pages_processed"] = n
+    if event.get("file"):
+        state["files"].append(event["file"])
+    url = event.get("url")
+    if url:
+        if url not in used:
+            used.add(url)
+            state["used_urls"].append(url)
+        state["last_prev_url"] = url
+    if event.get("source"):
+        state["sources"].append(event["source"])
+    state["global_categories_pool"].extend(event.get("categories") or [])
+    state["global_tags_pool"].extend(event.get("tags") or [])
+    state["latest_next_url"] = event.get("next")
+    return True
+
+
+def _replay(manifest_path: str) -> tuple[Dict[str, Any], int, bool]:
+    found = False
+    state = _empty_state()
+    try:
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                state = _normalize(json.load(f))
+            found = True
+    except Exception as e:
+        logging.warning(f"Failed to load manifest at {manifest_path}: {e}")
+    used = set(state["used_urls"])
+    events = 0
+    path = journal_path_for(manifest_path)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for lineno, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # A torn line can only be the last one written before a crash
+                        logging.warning(f"Ignoring unreadable manifest journal line {lineno} in {path}")
+                        continue
+                    if isinstance(event, dict) and _apply_event(state, used, event):
+                        events += 1
+                        found = True
+        except Exception as e:
+            logging.warning(f"Failed to replay manifest journal at {path}: {e}")
+    return state, events, found
+
+
+def replay_manifest(manifest_path: str) -> Dict[str, Any]:
+    """Snapshot plus replayed journal, or {} when neither exists."""
+    state, _events, found = _replay(manifest_path)
+    return state if found else {}
+
+
+class ManifestJournal:
+    """Owns the manifest state for one crawl and persists it incrementally."""
+
+    def __init__(self, manifest_path: str, compact_min_events: int = COMPACT_MIN_EVENTS):
+        self.manifest_path = manifest_path
+        self.journal_path = journal_path_for(manifest_path)
+        self.compact_min_events = max(1, int(compact_min_events))
+        self.state = _empty_state()
+        self._used: set = set()
+        self._events = 0
+        self._fh = None
+
+    def load(self) -> Dict[str, Any]:
+        """Replay snapshot + journal. Returns a copy of the state ({} if nothing was saved)."""
+        state, events, found = _replay(self.manifest_path)
+        self.state = state
+        self._used = set(state["used_urls"])
+        self._events = events
+        if events:
+            logging.info(f"Replayed {events} manifest journal events from {self.journal_path}")
+        return json.loads(json.dumps(state)) if found else {}
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        with get_metrics().timer("manifest_save", task="journal"):
+            if self._fh is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+                self._fh = open(self.journal_path, "a", encoding="utf-8")
+            self._fh.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._fh.flush()
+
+    def set_meta(self, **meta: Any) -> None:
+        event = {"op": "meta", **{k: v for k, v in meta.items() if k in META_KEYS}}
+        _apply_event(self.state, self._used, event)
+        self._append(event)
+
+    def record_page(self, file: str, url: str, pages_processed: int, categories_added: List[str], tags_added: List[str], latest_next_url: Optional[str], source: str = "") -> None:
+        """Append one page; compacts when the journal has grown as large as the snapshot.
+        `source` is the crawled URL, kept so a resume can skip pages already written."""
+        event = {
+            "op": "page",
+            "n": pages_processed,
+            "file": file,
+            "url": url,
+            "source": source,
+            "categories": list(categories_added),
+            "tags": list(tags_added),
+            "next": latest_next_url,
+        }
+        if not _apply_event(self.state, self._used, event):
+            return
+        self._append(event)
+        self._events += 1
+        if self._events >= max(self.compact_min_events, self.state["pages_processed"] - self._events):
+            self.compact()
+
+    def record_terms(self, categories_added: List[str], tags_added: List[str]) -> None:
+        """Append pool terms added outside a new page (a changed page rewritten in place)."""
+        if not categories_added and not tags_added:
+            return
+        event = {"op": "terms", "categories": list(categories_added), "tags": list(tags_added)}
+        _apply_event(self.state, self._used, event)
+        self._append(event)
+        self._events += 1
+
+    def compact(self) -> None:
+        """Write the snapshot atomically, then truncate the journal."""
+        snapshot = dict(self.state)
+        snapshot["used_urls"] = sorted(self.state["used_urls"])
+        tmp = self.manifest_path + ".tmp"
+        with get_metrics().timer("manifest_save", task="snapshot"):
+            os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.manifest_path)
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            with open(self.journal_path, "w", encoding="utf-8"):
+                pass
+        logging.info(f"Manifest compacted: pages={self.state['pages_processed']} journal events folded={self._events}")
+        self._events = 0
+
+    def close(self, latest_next_url: Optional[str] = None) -> None:
+        """Final snapshot for the run; the journal is removed afterwards."""
+        self.state["latest_next_url"] = latest_next_url
+        self.compact()
+        try:
+            os.remove(self.journal_path)
+        except OSError:
+            pass
@@ -0,0 +1,256 @@
+"""Markdown-aware, token-budgeted chunking for LLM translation.
+
+The body is first cut into blocks that must stay whole — fenced code, headings,
+tables, lists, block quotes and paragraphs — and the blocks are then packed
+greedily into chunks of at most `max_tokens` estimated tokens. Chunk
+boundaries only ever fall between blocks, so no construct is split across two
+requests, and `"".join(chunk_markdown(text))` reproduces the input exactly.
+
+Two blocks may exceed the budget on their own: paragraphs are split at sentence
+ends and lists at top-level item boundaries. Oversized code fences and tables
+are emitted as a single chunk rather than broken.
+
+Configuration (CLI flags in the scripts take precedence):
+  - CHUNK_TOKENS   token budget per chunk (default 1024)
+"""
+
+import re
+from typing import List, Tuple
+
+from .fm_utils import CJK_REGEX
+
+DEFAULT_CHUNK_TOKENS = 1024
+# Room for the instruction prompt wrapped around each chunk
+PROMPT_TOKENS = 256
+# English output is usually longer than the Chinese source, in tokens
+OUTPUT_RATIO = 1.5
+MIN_NUM_CTX = 1024
+MAX_NUM_CTX = 32768
+# Slow end of local generation (CPU-only, small quantized models) and the time
+# to load the model and evaluate the prompt, for sizing read timeouts
+MIN_TOKENS_PER_SECOND = 8.0
+TIMEOUT_OVERHEAD = 30.0
+
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_HEADING_RE = re.compile(r"^ {0,3}#{1,6}(\s|$)")
+_LIST_RE = re.compile(r"^( *)([*+-]|\d{1,9}[.)])(\s|$)")
+_TABLE_RE = re.compile(r"^\s*\|")
+_QUOTE_RE = re.compile(r"^ {0,3}>")
+_SENTENCE_END_RE = re.compile(r"(?:[。！？!?；;]+[\"'”’」』）)]*|\.(?=\s))\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: one token per CJK character, four characters per token otherwise."""
+    if not text:
+        return 0
+    cjk = len(CJK_REGEX.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def num_ctx_for(chunk_tokens: int) -> int:
+    """Context window that fits one chunk, the prompt and the translated output.
+    Rounded up to a power of two and derived from the budget only, so every call
+    in a run uses the same num_ctx (Ollama reloads the model when it changes)."""
+    need = int(max(0, chunk_tokens) * (1 + OUTPUT_RATIO)) + PROMPT_TOKENS
+    size = MIN_NUM_CTX
+    while size < need and size < MAX_NUM_CTX:
+        size *= 2
+    return size
+
+
+def read_timeout_for(chunk_tokens: int) -> float:
+    """Read timeout for translating a chunk of `chunk_tokens` tokens. A
+    non-streaming call returns nothing until the whole translation is generated,
+    so the timeout grows with the expected output length."""
+    return TIMEOUT_OVERHEAD + max(0, chunk_tokens) * OUTPUT_RATIO / MIN_TOKENS_PER_SECOND
+
+
+def split_padding(text: str) -> Tuple[str, str, str]:
+    """Split `text` into (leading whitespace, content, trailing whitespace) so a
+    translated chunk can be put back with the original spacing."""
+    core = text.strip()
+    if not core:
+        return text, "", ""
+    start = text.find(core)
+    return text[:start], core, text[start + len(core):]
+
+
+def _is_blank(line: str) -> bool:
+    return not line.strip()
+
+
+def _starts_block(line: str) -> bool:
+    return bool(_FENCE_RE.match(line) or _HEADING_RE.match(line) or _TABLE_RE.match(line) or _QUOTE_RE.match(line))
+
+
+def split_blocks(text: str) -> List[Tuple[str, str]]:
+    """Return [(kind, text)] covering `text` exactly. Blank lines are attached to
+    the block before them. Kinds: code, heading, table, list, quote, paragraph."""
+    lines = (text or "").splitlines(keepends=True)
+    blocks: List[Tuple[str, str]] = []
+    n = len(lines)
+    i = 0
+    lead: List[str] = []
+    while i < n and _is_blank(lines[i]):
+        lead.append(lines[i])
+        i += 1
+    while i < n:
+        line = lines[i]
+        start = i
+        fence = _FENCE_RE.match(line)
+        if fence:
+            marker = fence.group(1)
+            i += 1
+            while i < n:
+                closing = _FENCE_RE.match(lines[i])
+                i += 1
+                if closing and closing.group(1)[0] == marker[0] and len(closing.group(1)) >= len(marker) and not lines[i - 1].strip()[len(closing.group(1)):].strip():
+                    break
+            kind = "code"
+        elif _HEADING_RE.match(line):
+            i += 1
+            kind = "heading"
+        elif _TABLE_RE.match(line):
+            while i < n and _TABLE_RE.match(lines[i]):
+                i += 1
+            kind = "table"
+        elif _LIST_RE.match(line):
+            i += 1
+            while i < n:
+                cur = lines[i]
+                if _is_blank(cur):
+                    # Loose list: blank lines belong to the list if it continues afterwards
+                    j = i
+                    while j < n and _is_blank(lines[j]):
+                        j += 1
+                    if j < n and (_LIST_RE.match(lines[j]) or lines[j][:1] in (" ", "\t")):
+                        i = j
+                        continue
+                    break
+                if _LIST_RE.match(cur) or cur[:1] in (" ", "\t") or not _starts_block(cur):
+                    i += 1
+                    continue
+                break
+            kind = "list"
+        elif _QUOTE_RE.match(line):
+            i += 1
+            while i < n and not _is_blank(lines[i]) and (_QUOTE_RE.match(lines[i]) or not _starts_block(lines[i])):
+                i += 1
+            kind = "quote"
+        else:
+            i += 1
+            while i < n and not _is_blank(lines[i]) and not _starts_block(lines[i]) and not _LIST_RE.match(lines[i]):
+                i += 1
+            kind = "paragraph"
+        while i < n and _is_blank(lines[i]):
+            i += 1
+        blocks.append((kind, "".join(lines[start:i])))
+    if lead:
+        lead_text = "".join(lead)
+        if blocks:
+            blocks[0] = (blocks[0][0], lead_text + blocks[0][1])
+        else:
+            blocks.append(("paragraph", lead_text))
+    return blocks
+
+
+def _pack(pieces: List[str], max_tokens: int) -> List[str]:
+    out: List[str] = []
+    cur = ""
+    for piece in pieces:
+        if cur and estimate_tokens(cur) + estimate_tokens(piece) > max_tokens:
+            out.append(cur)
+            cur = ""
+        cur += piece
+    if cur:
+        out.append(cur)
+    return out
+
+
+def _hard_split(text: str, max_tokens: int) -> List[str]:
+    # Last resort for a single run-on sentence: cut at whitespace near the budget
+    out: List[str] = []
+    rest = text
+    while estimate_tokens(rest) > max_tokens:
+        cut = max_tokens
+        step = max(1, max_tokens // 4)
+        while cut + step < len(rest) and estimate_tokens(rest[:cut + step]) <= max_tokens:
+            cut += step
+        space = rest.rfind(" ", 0, cut)
+        if space > cut // 2:
+            cut = space + 1
+        out.append(rest[:cut])
+        rest = rest[cut:]
+    if rest:
+        out.append(rest)
+    return out
+
+
+def _split_paragraph(text: str, max_tokens: int) -> List[str]:
+    sentences: List[str] = []
+    pos = 0
+    for m in _SENTENCE_END_RE.finditer(text):
+        if m.end() > pos:
+            sentences.append(text[pos:m.end()])
+            pos = m.end()
+    if pos < len(text):
+        sentences.append(text[pos:])
+    pieces: List[str] = []
+    for s in sentences:
+        pieces.extend(_hard_split(s, max_tokens) if estimate_tokens(s) > max_tokens else [s])
+    return _pack(pieces, max_tokens)
+
+
+def _split_list(text: str, max_tokens: int) -> List[str]:
+    lines = text.splitlines(keepends=True)
+    first = _LIST_RE.match(lines[0])
+    indent = len(first.group(1)) if first else 0
+    items: List[str] = []
+    for line in lines:
+        m = _LIST_RE.match(line)
+        if items and m and len(m.group(1)) == indent:
+            items.append(line)
+        elif items:
+            items[-1] += line
+        else:
+            items.append(line)
+    return _pack(items, max_tokens)
+
+
+def chunk_markdown(text: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """Split Markdown into chunks of at most ~max_tokens without breaking a construct.
+    A new section (heading) starts a new chunk once the current one is half full,
+    and a heading is never left as the last block of a chunk."""
+    if not text:
+        return []
+    max_tokens = max(32, int(max_tokens or DEFAULT_CHUNK_TOKENS))
+    chunks: List[str] = []
+    cur: List[Tuple[str, str]] = []
+    cur_tokens = 0
+
+    def flush() -> None:
+        nonlocal cur, cur_tokens
+        carry: List[Tuple[str, str]] = []
+        if len(cur) > 1 and cur[-1][0] == "heading":
+            carry = [cur.pop()]
+        chunks.append("".join(t for _, t in cur))
+        cur = carry
+        cur_tokens = sum(estimate_tokens(t) for _, t in cur)
+
+    for kind, block in split_blocks(text):
+        tokens = estimate_tokens(block)
+        if tokens > max_tokens and kind == "paragraph":
+            pieces = _split_paragraph(block, max_tokens)
+        elif tokens > max_tokens and kind == "list":
+            pieces = _split_list(block, max_tokens)
+        else:
+            pieces = [block]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if cur and (cur_tokens + piece_tokens > max_tokens or (kind == "heading" and cur_tokens >= max_tokens // 2)):
+                flush()
+            cur.append((kind, piece))
+            cur_tokens += piece_tokens
+    if cur:
+        chunks.append("".join(t for _, t in cur))
+    return chunks
@@ -0,0 +1,244 @@
+"""Per-stage call counts, error counts and latency histograms for the pipeline scripts.
+
+The scripts log start/end lines around their slow calls, but nothing adds
+them up. `MetricsRegistry` collects, for every stage, how often it ran, how
+often it failed and a latency histogram. Stages:
+  - firecrawl_start / firecrawl_poll   Firecrawl crawl start and status requests
+  - html_convert                       HTML to Markdown batches (task: pool / inline)
+  - ollama                             Ollama calls (task: translation, taxonomy extraction, ...)
+  - argos                              Argos zh->en translator calls
+  - file_write                         Markdown files written
+  - manifest_save                      manifest journal appends and snapshots (task: journal / snapshot)
+
+Recording is always on and costs a lock and a few additions per call. With
+`configure_metrics(path=..., port=...)` the registry is also exported in the
+Prometheus text format while the run goes on: written to a file every
+`interval` seconds (atomically, for node_exporter's textfile collector or a
+plain `cat`), and/or served at http://127.0.0.1:<port>/metrics. At the end of a
+run `close_metrics()` writes the file one last time and logs a per-stage
+summary with approximate p50/p95, so the bottleneck stage shows up in the log.
+
+Configuration (CLI flags in the scripts take precedence):
+  - METRICS_FILE       Prometheus text file to write (default: none)
+  - METRICS_PORT       local port to serve /metrics on (default 0: off)
+  - METRICS_INTERVAL   seconds between file writes (default 15)
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+DEFAULT_INTERVAL = 15.0
+METRIC_PREFIX = "pipeline_stage"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_le(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class _Series:
+    __slots__ = ("count", "errors", "total", "buckets")
+
+    def __init__(self, size: int):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        # Per-bucket (not cumulative) counts; the last one is +Inf
+        self.buckets = [0] * size
+
+
+class MetricsRegistry:
+    """Thread-safe per-(stage, task) counters and latency histograms."""
+
+    def __init__(self, job: str = "pipeline", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.job = job
+        self.bounds: Tuple[float, ...] = tuple(sorted(buckets)) + (float("inf"),)
+        self.started = time.time()
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, error: bool = False, task: str = "") -> None:
+        key = (stage, task or "")
+        idx = next(i for i, bound in enumerate(self.bounds) if seconds <= bound)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.bounds))
+            series.count += 1
+            series.total += seconds
+            series.buckets[idx] += 1
+            if error:
+                series.errors += 1
+
+    @contextmanager
+    def timer(self, stage: str, task: str = "") -> Iterator[None]:
+        """Time the block; an exception counts as an error and is re-raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, time.perf_counter() - started, error=True, task=task)
+            raise
+        self.observe(stage, time.perf_counter() - started, task=task)
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, str], int, int, float, List[int]]]:
+        with self._lock:
+            return [(key, s.count, s.errors, s.total, list(s.buckets)) for key, s in sorted(self._series.items())]
+
+    def render(self) -> str:
+        """The registry in the Prometheus text exposition format (0.0.4)."""
+        rows = self._snapshot()
+        hist = f"{METRIC_PREFIX}_duration_seconds"
+        errs = f"{METRIC_PREFIX}_errors_total"
+        lines = [
+            f"# HELP {hist} Latency of pipeline stage calls.",
+            f"# TYPE {hist} histogram",
+        ]
+        for (stage, task), count, _errors, total, buckets in rows:
+            labels = f'job="{_escape(self.job)}",stage="{_escape(stage)}",task="{_escape(task)}"'
+            cumulative = 0
+            for bound, n in zip(self.bounds, buckets):
+                cumulative += n
+                lines.append(f'{hist}_bucket{{{labels},le="{_format_le(bound)}"}} {cumulative}')
+            lines.append(f"{hist}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{hist}_count{{{labels}}} {count}")
+        lines += [f"# HELP {errs} Failed pipeline stage calls.", f"# TYPE {errs} counter"]
+        for (stage, task), _count, errors, _total, _buckets in rows:
+            lines.append(f'{errs}{{job="{_escape(self.job)}",stage="{_escape(stage)}",task="{_escape(task)}"}} {errors}')
+        lines += [
+            "# HELP pipeline_run_start_time_seconds Start of the run, seconds since the epoch.",
+            "# TYPE pipeline_run_start_time_seconds gauge",
+            f'pipeline_run_start_time_seconds{{job="{_escape(self.job)}"}} {self.started:.3f}',
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Write render() to `path` via a temporary file, so readers never see half a file."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def _quantile(self, buckets: List[int], count: int, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation (the largest finite bound for +Inf)
+        target = q * count
+        cumulative = 0
+        for bound, n in zip(self.bounds, buckets):
+            cumulative += n
+            if cumulative >= target:
+                return bound if bound != float("inf") else self.bounds[-2]
+        return self.bounds[-2]
+
+    def log_stats(self) -> None:
+        rows = self._snapshot()
+        if not rows:
+            return
+        # Largest total time first: the bottleneck heads the list
+        rows.sort(key=lambda r: r[3], reverse=True)
+        logging.info("各阶段耗时统计（按总耗时排序，p50/p95 为直方图桶上界估计）：")
+        for (stage, task), count, errors, total, buckets in rows:
+            name = f"{stage}[{task}]" if task else stage
+            logging.info(
+                f"  {name}: 次数={count} 错误={errors} 总耗时={total:.2f}s 平均={total / count:.3f}s "
+                f"p50≤{self._quantile(buckets, count, 0.5):g}s p95≤{self._quantile(buckets, count, 0.95):g}s"
+            )
+
+
+class MetricsExporter:
+    """Writes the registry to a text file periodically and/or serves it over HTTP."""
+
+    def __init__(self, registry: MetricsRegistry, path: str = "", port: int = 0, interval: float = DEFAULT_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = max(1.0, float(interval))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        if path:
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+        if port:
+            handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+            self._server = ThreadingHTTPServer(("127.0.0.1", int(port)), handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logging.info(f"指标服务已启动：http://127.0.0.1:{self._server.server_port}/metrics")
+
+    def _write(self) -> None:
+        try:
+            self.registry.write_textfile(self.path)
+        except Exception as e:
+            logging.warning(f"写入指标文件失败：{self.path}: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._write()
+            logging.info(f"指标已写入：{self.path}")
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        data = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+_REGISTRY = MetricsRegistry()
+_EXPORTER: Optional[MetricsExporter] = None
+
+
+def configure_metrics(job: str, path: str = "", port: int = 0, interval: float = DEFAULT_INTERVAL) -> MetricsRegistry:
+    """Start a fresh registry for this run, exported to `path` and/or `port` when given."""
+    global _REGISTRY, _EXPORTER
+    close_metrics(log=False)
+    _REGISTRY = MetricsRegistry(job)
+    if path or port:
+        try:
+            _EXPORTER = MetricsExporter(_REGISTRY, path, port, interval)
+        except Exception as e:
+            logging.warning(f"指标导出不可用，仅在结束时记录日志：{e}")
+    return _REGISTRY
+
+
+def get_metrics() -> MetricsRegistry:
+    return _REGISTRY
+
+
+def close_metrics(log: bool = True) -> None:
+    """Final export and (by default) the per-stage summary in the log."""
+    global _EXPORTER
+    if _EXPORTER is not None:
+        _EXPORTER.close()
+        _EXPORTER = None
+    if log:
+        _REGISTRY.log_stats()
@@ -0,0 +1,122 @@
+"""SimHash near-duplicate detection for crawled pages.
+
+Sites repeat themselves: pagination, print views and tag listings differ from
+another page by a few lines, yet each copy would be translated and enriched
+with the full set of Ollama calls. `NearDupIndex` fingerprints every page body
+as it comes out of the Firecrawl batch and flags pages whose fingerprint is
+within a few bits of one already seen.
+
+The body is normalized first: link targets and image references are dropped,
+link text is kept, digits and punctuation go away and text is lower-cased.
+It is split into tokens (Latin words, single CJK characters) and hashed as
+overlapping 4-token shingles into a 64-bit SimHash. Similarity is
+1 - hamming_distance / 64. Lookups use band buckets: with at most k differing
+bits, at least one of k + 1 bands matches exactly, so only pages sharing a
+band are compared.
+
+Configuration (CLI flags in the scripts take precedence):
+  - DEDUPE             off (default), skip or link
+  - DEDUPE_THRESHOLD   similarity at or above which a page is a near-duplicate (default 0.95)
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+BITS = 64
+SHINGLE = 4
+# Bodies shorter than this many tokens fingerprint too coarsely to compare
+MIN_TOKENS = 30
+DEFAULT_THRESHOLD = 0.95
+DEDUPE_MODES = ("off", "skip", "link")
+
+_LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_REF_DEF_RE = re.compile(r"^\s*\[[^\]]+\]:\s*\S+.*$", re.MULTILINE)
+_URL_RE = re.compile(r"https?://\S+")
+_TOKEN_RE = re.compile(r"[a-z]+|[\u3400-\u4DBF\u4E00-\u9FFF]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized tokens of a Markdown body (Latin words and single CJK characters)."""
+    text = _REF_DEF_RE.sub(" ", text or "")
+    text = _LINK_RE.sub(r" \1 ", text)
+    text = _URL_RE.sub(" ", text)
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(tokens: List[str]) -> Optional[int]:
+    """64-bit SimHash over overlapping shingles, or None for bodies too short to compare."""
+    if len(tokens) < MIN_TOKENS:
+        return None
+    weights: Dict[int, int] = {}
+    for i in range(len(tokens) - SHINGLE + 1):
+        h = _hash64(" ".join(tokens[i:i + SHINGLE]))
+        weights[h] = weights.get(h, 0) + 1
+    totals = [0] * BITS
+    for h, w in weights.items():
+        for bit in range(BITS):
+            totals[bit] += w if (h >> bit) & 1 else -w
+    out = 0
+    for bit, total in enumerate(totals):
+        if total > 0:
+            out |= 1 << bit
+    return out
+
+
+def similarity(a: int, b: int) -> float:
+    return 1.0 - bin(a ^ b).count("1") / BITS
+
+
+class NearDupIndex:
+    """Fingerprints of pages seen so far, bucketed by band for sub-linear lookup."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = min(1.0, max(0.5, threshold))
+        self.max_bits = int((1.0 - self.threshold) * BITS + 1e-9)
+        self.bands = self.max_bits + 1
+        self.band_bits = BITS // self.bands
+        self._buckets: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(self.bands)]
+        self.size = 0
+
+    def _band_keys(self, fp: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        keys = [(fp >> (i * self.band_bits)) & mask for i in range(self.bands - 1)]
+        # The last band takes the leftover high bits
+        keys.append(fp >> ((self.bands - 1) * self.band_bits))
+        return keys
+
+    def find(self, fp: int) -> Optional[Tuple[str, float]]:
+        """Most similar indexed page at or above the threshold: (source, similarity)."""
+        best: Optional[Tuple[str, float]] = None
+        seen = set()
+        for band, key in enumerate(self._band_keys(fp)):
+            for other, source in self._buckets[band].get(key, ()):
+                if source in seen:
+                    continue
+                seen.add(source)
+                sim = similarity(fp, other)
+                if sim >= self.threshold and (best is None or sim > best[1]):
+                    best = (source, sim)
+        return best
+
+    def add(self, fp: int, source: str) -> None:
+        for band, key in enumerate(self._band_keys(fp)):
+            self._buckets[band].setdefault(key, []).append((fp, source))
+        self.size += 1
+
+    def check(self, body: str, source: str) -> Tuple[Optional[int], Optional[Tuple[str, float]]]:
+        """Fingerprint `body`; returns (fingerprint, (canonical source, similarity) or None).
+        Pages that are not duplicates are added to the index as future canonicals."""
+        fp = simhash(tokenize(body))
+        if fp is None:
+            return None, None
+        match = self.find(fp)
+        if match is None:
+            self.add(fp, source)
+            return fp, None
+        # The same source seen again (e.g. on resume) is not its own duplicate
+        return fp, None if match[0] == source else match
@@ -0,0 +1,161 @@
+"""Character-trigram TF-IDF index for closest-term lookups.
+
+`choose_closest_with_ollama` falls back to picking the most similar option
+locally. Running difflib.SequenceMatcher against every option in pure Python
+costs several milliseconds per term on a full 300-tag pool. `NgramIndex` keeps the
+trigram counts of the pool (each term lower-cased and padded with spaces, so
+word starts and ends count) as a NumPy count matrix and answers a batch of
+queries with one matrix product of TF-IDF vectors, ranked by cosine
+similarity.
+
+The index grows incrementally: `sync(options)` only adds the terms appended to
+the pool since the last call. The weighted, normalized matrix is rebuilt lazily
+after additions; once the pool is full, queries reuse it as is.
+
+NumPy is optional. Without it, or when a term shares no trigram with any
+option, the SequenceMatcher ratio decides as before.
+"""
+
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # optional dependency
+    np = None  # type: ignore
+
+NGRAM = 3
+
+
+def char_ngrams(text: str, n: int = NGRAM) -> Dict[str, int]:
+    """Counts of the character n-grams of ` text ` (lower-cased)."""
+    padded = f" {text.lower().strip()} "
+    counts: Dict[str, int] = {}
+    for i in range(max(1, len(padded) - n + 1)):
+        gram = padded[i:i + n]
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def closest_by_ratio(term: str, options: Sequence[str]) -> str:
+    """Option with the highest SequenceMatcher ratio (first one on ties)."""
+    best = options[0]
+    best_score = -1.0
+    for opt in options:
+        score = SequenceMatcher(None, term.lower(), opt.lower()).ratio()
+        if score > best_score:
+            best_score = score
+            best = opt
+    return best
+
+
+class NgramIndex:
+    """Incrementally built trigram TF-IDF matrix over an ordered list of terms."""
+
+    def __init__(self, terms: Optional[Sequence[str]] = None):
+        self.terms: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self._counts = np.zeros((16, 64), dtype=np.float32)
+        self._df = np.zeros(64, dtype=np.float32)
+        self._weighted = None
+        self._idf = None
+        if terms:
+            self.add(terms)
+
+    def _grow(self, rows: int, cols: int) -> None:
+        r, c = self._counts.shape
+        if rows <= r and cols <= c:
+            return
+        new_r = max(r, 1 << max(0, rows - 1).bit_length())
+        new_c = max(c, 1 << max(0, cols - 1).bit_length())
+        counts = np.zeros((new_r, new_c), dtype=np.float32)
+        counts[:r, :c] = self._counts
+        df = np.zeros(new_c, dtype=np.float32)
+        df[:c] = self._df
+        self._counts, self._df = counts, df
+
+    def add(self, terms: Sequence[str]) -> None:
+        for term in terms:
+            grams = char_ngrams(term)
+            for gram in grams:
+                if gram not in self.vocab:
+                    self.vocab[gram] = len(self.vocab)
+            row = len(self.terms)
+            self._grow(row + 1, len(self.vocab))
+            for gram, count in grams.items():
+                col = self.vocab[gram]
+                self._counts[row, col] = count
+                self._df[col] += 1
+            self.terms.append(term)
+        if terms:
+            self._weighted = None
+
+    def sync(self, options: Sequence[str]) -> bool:
+        """Index the terms appended to `options` since the last sync.
+        Returns False (and changes nothing) if `options` does not extend the indexed terms."""
+        n = len(self.terms)
+        if len(options) < n or list(options[:n]) != self.terms:
+            return False
+        if len(options) > n:
+            self.add(options[n:])
+        return True
+
+    def _refresh(self) -> None:
+        rows, cols = len(self.terms), len(self.vocab)
+        # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+        self._idf = np.log((1.0 + rows) / (1.0 + self._df[:cols])) + 1.0
+        weighted = self._counts[:rows, :cols] * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._weighted = weighted / norms
+
+    def _query_matrix(self, queries: Sequence[str]):
+        q = np.zeros((len(queries), len(self.vocab)), dtype=np.float32)
+        for i, text in enumerate(queries):
+            for gram, count in char_ngrams(text).items():
+                col = self.vocab.get(gram)
+                if col is not None:
+                    q[i, col] = count
+        q *= self._idf
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return q / norms
+
+    def scores(self, queries: Sequence[str]):
+        """(len(queries), len(terms)) cosine similarities, computed in one product."""
+        if self._weighted is None:
+            self._refresh()
+        return self._query_matrix(queries) @ self._weighted.T
+
+    def closest(self, queries: Sequence[str]) -> List[str]:
+        """Closest indexed term for each query, batched."""
+        if not self.terms:
+            return list(queries)
+        sims = self.scores(queries)
+        best = sims.argmax(axis=1)
+        out: List[str] = []
+        for i, query in enumerate(queries):
+            j = int(best[i])
+            # No shared trigram: nothing to rank by, let the ratio decide
+            out.append(self.terms[j] if sims[i, j] > 0 else closest_by_ratio(query, self.terms))
+        return out
+
+
+_INDEXES: Dict[str, "NgramIndex"] = {}
+
+
+def closest_option(term: str, options: Sequence[str], pool: str = "") -> str:
+    """Closest of `options` to `term`. The index kept for `pool` (e.g. "tag") is
+    extended as that pool grows; option lists that are not a continuation of it
+    (such as a shortlist of candidates) get a throwaway index."""
+    if not options:
+        return term
+    if np is None:
+        return closest_by_ratio(term, options)
+    index = _INDEXES.get(pool)
+    if index is None or not index.sync(options):
+        index = NgramIndex(options)
+        if pool and (pool not in _INDEXES or len(options) >= len(_INDEXES[pool].terms)):
+            _INDEXES[pool] = index
+    return index.closest([term])[0]
+
@@ -0,0 +1,544 @@
+"""Shared, pooled Ollama HTTP client.
+
+One OllamaClient per Ollama base URL lives for the whole run. The sync path
+reuses a requests.Session whose connection pool keeps TCP connections alive
+between calls (and between chunks/pages); the async path reuses an
+httpx.AsyncClient per event loop. Every generate call goes through the
+persistent LLM cache (see llm_cache.py), and every request that reaches the
+server takes a slot from the client's AdaptiveLimiter (see rate_limiter.py).
+
+In streaming mode the response is read token by token: time-to-first-token and
+tokens/s are recorded, callers may watch tokens through `on_token`, and the
+connection is dropped (which makes Ollama stop generating) as soon as a
+complete JSON value has arrived (`stop_on_json`) or the token cap is hit. With
+a `validate` callback only a value it accepts ends the stream, so an example
+such as "[1]" or a quoted "{}" ahead of the real answer is skipped.
+
+Configuration (CLI flags in the scripts take precedence):
+  - OLLAMA_POOL_SIZE   keep-alive connections per server (default 10)
+  - OLLAMA_TIMEOUT     default per-call read timeout in seconds (default 120)
+  - OLLAMA_CONCURRENCY max in-flight generate calls (default: pool size)
+  - OLLAMA_MAX_RATE    hard cap in generate calls per second (default 0 = none)
+  - OLLAMA_STREAM=1    stream all generate calls
+  - OLLAMA_MAX_TOKENS  abort a streamed generation after this many tokens (default 0 = none)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx  # type: ignore
+import requests
+from requests.adapters import HTTPAdapter
+
+from .llm_cache import get_llm_cache
+from .metrics import get_metrics
+from .rate_limiter import AdaptiveLimiter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+# Status codes Ollama (or a proxy in front of it) uses when it is out of capacity
+OVERLOAD_STATUS = (429, 502, 503, 504)
+
+
+class JsonStopDetector:
+    """Incrementally watch streamed text for the first complete top-level JSON
+    object or array, ignoring anything inside <think>...</think>. With `accept`,
+    values it rejects (e.g. an "[1]" example in a preamble) are skipped."""
+
+    THINK_OPEN = "<think>"
+    THINK_CLOSE = "</think>"
+
+    def __init__(self, accept: Optional[Callable[[str], bool]] = None) -> None:
+        self.accept = accept
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_think = False
+        self.in_str = False
+        self.escaped = False
+        self.start = 0
+        self.end: Optional[int] = None
+
+    def feed(self, text: str) -> bool:
+        """Append streamed text; returns True once a JSON value is complete (see `end`)."""
+        if self.end is not None:
+            return True
+        self.buf += text
+        buf = self.buf
+        i = self.pos
+        n = len(buf)
+        while i < n:
+            if self.in_think:
+                close = buf.find(self.THINK_CLOSE, i)
+                if close < 0:
+                    # Keep a possible partial closing tag for the next feed
+                    i = max(i, n - len(self.THINK_CLOSE) + 1)
+                    break
+                i = close + len(self.THINK_CLOSE)
+                self.in_think = False
+                continue
+            ch = buf[i]
+            if self.depth == 0:
+                if ch == "<":
+                    head = buf[i:i + len(self.THINK_OPEN)]
+                    if head == self.THINK_OPEN:
+                        self.in_think = True
+                        i += len(self.THINK_OPEN)
+                        continue
+                    if self.THINK_OPEN.startswith(head):
+                        # Partial tag at the end of the buffer: wait for more text
+                        break
+                elif ch in "{[":
+                    self.depth = 1
+                    self.start = i
+                i += 1
+                continue
+            if self.in_str:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    candidate = buf[self.start:i + 1]
+                    try:
+                        json.loads(candidate)
+                    except ValueError:
+                        # Balanced but not JSON (e.g. a Markdown "[link]"): rescan after its opener
+                        self.in_str = False
+                        self.escaped = False
+                        i = self.start + 1
+                        continue
+                    if self.accept is not None and not _safe_validate(self.accept, candidate):
+                        # JSON, but not the answer the caller wants: keep looking after it
+                        i += 1
+                        continue
+                    self.end = i + 1
+                    self.pos = i + 1
+                    return True
+            i += 1
+        self.pos = i
+        return False
+
+
+class OllamaClient:
+    """Long-lived client for one Ollama server with sync and async variants."""
+
+    def __init__(self, base_url: str, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, max_concurrency: int = 0, max_rate: float = 0.0, stream: bool = False, max_tokens: int = 0):
+        self.base_url = (base_url or "http://localhost:11434").rstrip("/")
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = float(timeout)
+        self.connect_timeout = float(connect_timeout)
+        self.limiter = AdaptiveLimiter(max_concurrency=max_concurrency or self.pool_size, max_rate=max_rate, name=self.base_url)
+        self.stream = bool(stream)
+        self.max_tokens = max(0, int(max_tokens or 0))
+        self._stream_lock = threading.Lock()
+        self.stream_stats: Dict[str, float] = {"calls": 0, "tokens": 0, "ttft_sum": 0.0, "gen_seconds": 0.0, "stopped_json": 0, "stopped_length": 0}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._async_lock = threading.Lock()
+        self._async_clients: Dict[int, Any] = {}
+
+    # ---- helpers ----
+    def _payload(self, model: str, prompt: str, options: Optional[Dict[str, Any]], fmt: Optional[str], stream: bool = False) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "stream": stream}
+        if options:
+            payload["options"] = options
+        if fmt:
+            payload["format"] = fmt
+        return payload
+
+    @staticmethod
+    def _cache_options(options: Optional[Dict[str, Any]], fmt: Optional[str]) -> Optional[Dict[str, Any]]:
+        return {**(options or {}), "format": fmt} if fmt else options
+
+    def _read_timeout(self, timeout: Optional[float]) -> float:
+        return float(timeout) if timeout and timeout > 0 else self.timeout
+
+    # ---- sync ----
+    def generate_raw(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None, fmt: Optional[str] = None, timeout: Optional[float] = None, task: str = "") -> Dict[str, Any]:
+        """POST /api/generate (non-streaming) and return the decoded JSON envelope.
+        `task` groups the call's latency in the limiter. Raises requests.RequestException
+        on transport or HTTP errors."""
+        with self.limiter.slot(task) as slot:
+            try:
+                resp = self.session.post(
+                    self.base_url + "/api/generate",
+                    json=self._payload(model, prompt, options, fmt),
+                    timeout=(self.connect_timeout, self._read_timeout(timeout)),
+                )
+            except (requests.Timeout, requests.ConnectionError):
+                slot["overloaded"] = True
+                raise
+            slot["overloaded"] = resp.status_code in OVERLOAD_STATUS
+        if resp.status_code == 404:
+            logging.error(f"Ollama 模型未找到：{model}。请先拉取或更换模型。")
+        resp.raise_for_status()
+        data = resp.json()
+        return data if isinstance(data, dict) else {}
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        fmt: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        stop_on_json: bool = False,
+        max_tokens: Optional[int] = None,
+        task: str = "",
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """POST /api/generate with `stream: true` and read the response token by token.
+        Returns (text, info) where info holds ttft/tokens/seconds/tokens_per_s and
+        `stopped` ("json", "length" or None). With stop_on_json and a complete JSON
+        value after any <think> block (one `validate` accepts, when given), the
+        text is exactly that value; otherwise the stream runs to its end.
+        Raises like generate_raw()."""
+        cap = self.max_tokens if max_tokens is None else max(0, int(max_tokens))
+        detector = JsonStopDetector(validate) if stop_on_json else None
+        parts: List[str] = []
+        tokens = 0
+        ttft: Optional[float] = None
+        stopped: Optional[str] = None
+        start = time.monotonic()
+        with self.limiter.slot(task) as slot:
+            try:
+                resp = self.session.post(
+                    self.base_url + "/api/generate",
+                    json=self._payload(model, prompt, options, fmt, stream=True),
+                    timeout=(self.connect_timeout, self._read_timeout(timeout)),
+                    stream=True,
+                )
+            except (requests.Timeout, requests.ConnectionError):
+                slot["overloaded"] = True
+                raise
+            slot["overloaded"] = resp.status_code in OVERLOAD_STATUS
+            try:
+                if resp.status_code == 404:
+                    logging.error(f"Ollama 模型未找到：{model}。请先拉取或更换模型。")
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if not isinstance(event, dict):
+                        continue
+                    if event.get("error"):
+                        raise requests.HTTPError(f"Ollama stream error: {event.get('error')}")
+                    piece = event.get("response") or ""
+                    if piece:
+                        if ttft is None:
+                            ttft = time.monotonic() - start
+                        tokens += 1
+                        parts.append(piece)
+                        if on_token is not None:
+                            on_token(piece)
+                        if detector is not None and detector.feed(piece):
+                            stopped = "json"
+                            break
+                        if cap and tokens >= cap:
+                            stopped = "length"
+                            break
+                    if event.get("done"):
+                        break
+            except requests.Timeout:
+                slot["overloaded"] = True
+                raise
+            finally:
+                # Closing mid-stream drops the connection, which makes Ollama stop generating
+                resp.close()
+        elapsed = time.monotonic() - start
+        text = "".join(parts)
+        if detector is not None and detector.end is not None:
+            # Return just the JSON value: callers' parsers need not skip <think> or code fences
+            text = text[detector.start:detector.end]
+        gen_seconds = max(1e-6, elapsed - (ttft or 0.0))
+        info = {
+            "ttft": ttft or 0.0,
+            "tokens": tokens,
+            "seconds": elapsed,
+            "tokens_per_s": (tokens - 1) / gen_seconds if tokens > 1 else 0.0,
+            "stopped": stopped,
+        }
+        with self._stream_lock:
+            st = self.stream_stats
+            st["calls"] += 1
+            st["tokens"] += tokens
+            st["ttft_sum"] += info["ttft"]
+            st["gen_seconds"] += gen_seconds if tokens > 1 else 0.0
+            if stopped == "json":
+                st["stopped_json"] += 1
+            elif stopped == "length":
+                st["stopped_length"] += 1
+        logging.debug(
+            f"Ollama 流式生成: 模型={model} 首字={info['ttft']:.2f}s 词元={tokens} 速度={info['tokens_per_s']:.1f} tokens/s 总耗时={elapsed:.2f}s 提前结束={stopped or '-'}"
+        )
+        return text, info
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        fmt: Optional[str] = None,
+        timeout: Optional[float] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+        stream: Optional[bool] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        stop_on_json: bool = False,
+        max_tokens: Optional[int] = None,
+        task: str = "generate",
+    ) -> str:
+        """Return the model's `response` text, served from the LLM cache when possible.
+        Responses are cached only if non-empty and, when given, `validate(text)` is true;
+        with stop_on_json, `validate` also decides which JSON value ends the stream.
+        `stream` defaults to the client setting; the streaming-only arguments
+        (on_token, stop_on_json, max_tokens) are ignored for non-streamed calls,
+        and length-capped streamed responses are never cached.
+        Calls that reach the server are timed under the "ollama" metrics stage, labelled `task`.
+        Raises on transport or HTTP errors."""
+        cache = get_llm_cache()
+        cache_options = self._cache_options(options, fmt)
+        cached = cache.get(model, prompt, cache_options)
+        if cached is not None:
+            logging.debug(f"Ollama 缓存命中: 模型={model} 字符数={len(cached)}")
+            return cached
+        truncated = False
+        with get_metrics().timer("ollama", task=task):
+            if self.stream if stream is None else stream:
+                text, info = self.generate_stream(model, prompt, options, fmt, timeout, on_token=on_token, stop_on_json=stop_on_json, max_tokens=max_tokens, task=task, validate=validate)
+                truncated = info["stopped"] == "length"
+            else:
+                data = self.generate_raw(model, prompt, options, fmt, timeout, task=task)
+                text = data.get("response") or ""
+        if not isinstance(text, str):
+            text = str(text)
+        if not truncated and text.strip() and (validate is None or _safe_validate(validate, text)):
+            cache.put(model, prompt, cache_options, text)
+        return text
+
+    def embed(self, model: str, inputs: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """POST /api/embed for a batch of texts; one vector per input, in order.
+        Falls back to the older one-text-per-call /api/embeddings endpoint when
+        /api/embed is missing. Not cached here (see term_embeddings.py).
+        Raises like generate_raw()."""
+        if not inputs:
+            return []
+        with get_metrics().timer("ollama", task="embed"):
+            with self.limiter.slot("embed") as slot:
+                try:
+                    resp = self.session.post(
+                        self.base_url + "/api/embed",
+                        json={"model": model, "input": list(inputs)},
+                        timeout=(self.connect_timeout, self._read_timeout(timeout)),
+                    )
+                except (requests.Timeout, requests.ConnectionError):
+                    slot["overloaded"] = True
+                    raise
+                slot["overloaded"] = resp.status_code in OVERLOAD_STATUS
+            if resp.status_code == 404 and "model" not in resp.text.lower():
+                vectors: List[List[float]] = []
+                for text in inputs:
+                    with self.limiter.slot("embed") as slot:
+                        old = self.session.post(self.base_url + "/api/embeddings", json={"model": model, "prompt": text}, timeout=(self.connect_timeout, self._read_timeout(timeout)))
+                        slot["overloaded"] = old.status_code in OVERLOAD_STATUS
+                    old.raise_for_status()
+                    vectors.append(list((old.json() or {}).get("embedding") or []))
+                return vectors
+            if resp.status_code == 404:
+                logging.error(f"Ollama 嵌入模型未找到：{model}。请先拉取或更换模型。")
+            resp.raise_for_status()
+            data = resp.json()
+            vectors = data.get("embeddings") if isinstance(data, dict) else None
+            if not isinstance(vectors, list) or len(vectors) != len(inputs):
+                raise ValueError(f"Ollama /api/embed 返回的向量数与输入不符：{len(vectors or [])} != {len(inputs)}")
+            return vectors
+
+    def list_models(self, timeout: Optional[float] = 10) -> List[str]:
+        """Return model names reported by /api/tags."""
+        resp = self.session.get(self.base_url + "/api/tags", timeout=(self.connect_timeout, self._read_timeout(timeout)))
+        resp.raise_for_status()
+        data = resp.json()
+        models = data.get("models") if isinstance(data, dict) else None
+        names: List[str] = []
+        if isinstance(models, list):
+            for m in models:
+                name = m.get("name") if isinstance(m, dict) else None
+                if isinstance(name, str):
+                    names.append(name)
+        return names
+
+    # ---- async ----
+    def _async_client(self) -> Any:
+        # httpx.AsyncClient is bound to the loop it was first used on, so keep one per loop
+        loop = asyncio.get_running_loop()
+        key = id(loop)
+        with self._async_lock:
+            client = self._async_clients.get(key)
+            if client is None or client.is_closed:
+                limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                client = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout))
+                self._async_clients[key] = client
+            return client
+
+    async def agenerate_raw(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None, fmt: Optional[str] = None, timeout: Optional[float] = None, task: str = "") -> Dict[str, Any]:
+        """Async variant of generate_raw(). Raises httpx.HTTPError on failure."""
+        client = self._async_client()
+        async with self.limiter.aslot(task=task) as slot:
+            try:
+                resp = await client.post(
+                    "/api/generate",
+                    json=self._payload(model, prompt, options, fmt),
+                    timeout=httpx.Timeout(self._read_timeout(timeout), connect=self.connect_timeout),
+                )
+            except (httpx.TimeoutException, httpx.NetworkError):
+                slot["overloaded"] = True
+                raise
+            slot["overloaded"] = resp.status_code in OVERLOAD_STATUS
+        if resp.status_code == 404:
+            logging.error(f"Ollama 模型未找到：{model}。请先拉取或更换模型。")
+        resp.raise_for_status()
+        data = resp.json()
+        return data if isinstance(data, dict) else {}
+
+    async def agenerate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None, fmt: Optional[str] = None, timeout: Optional[float] = None, validate: Optional[Callable[[str], bool]] = None, task: str = "generate") -> str:
+        """Async variant of generate(); the SQLite cache lookups run in a worker thread."""
+        cache = get_llm_cache()
+        cache_options = self._cache_options(options, fmt)
+        cached = await asyncio.to_thread(cache.get, model, prompt, cache_options)
+        if cached is not None:
+            return cached
+        with get_metrics().timer("ollama", task=task):
+            data = await self.agenerate_raw(model, prompt, options, fmt, timeout, task=task)
+        text = data.get("response") or ""
+        if not isinstance(text, str):
+            text = str(text)
+        if text.strip() and (validate is None or _safe_validate(validate, text)):
+            await asyncio.to_thread(cache.put, model, prompt, cache_options, text)
+        return text
+
+    # ---- lifecycle ----
+    def log_stream_stats(self) -> None:
+        with self._stream_lock:
+            st = dict(self.stream_stats)
+        if not st["calls"]:
+            return
+        logging.info(
+            f"Ollama 流式统计：调用={int(st['calls'])} 平均首字延迟={st['ttft_sum'] / st['calls']:.2f}s "
+            f"生成速度={(st['tokens'] / st['gen_seconds']) if st['gen_seconds'] else 0.0:.1f} tokens/s 词元总数={int(st['tokens'])} "
+            f"JSON 完整提前结束={int(st['stopped_json'])} 长度上限截断={int(st['stopped_length'])}"
+        )
+
+    def close(self) -> None:
+        self.limiter.log_stats()
+        self.log_stream_stats()
+        try:
+            self.session.close()
+        except Exception:
+            pass
+        with self._async_lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            try:
+                if not client.is_closed:
+                    asyncio.run(client.aclose())
+            except Exception:
+                # Its loop may already be gone; the sockets are released on GC
+                pass
+
+
+def _safe_validate(validate: Callable[[str], bool], text: str) -> bool:
+    try:
+        return bool(validate(text))
+    except Exception:
+        return False
+
+
+_CLIENTS: Dict[str, OllamaClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+_SETTINGS: Dict[str, float] = {}
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default) or default)
+    except Exception:
+        return default
+
+
+def _env_flag(name: str) -> bool:
+    return str(os.environ.get(name, "")).strip().lower() in ("1", "true", "yes", "on")
+
+
+def configure_ollama_clients(
+    pool_size: Optional[int] = None,
+    timeout: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+    max_rate: Optional[float] = None,
+    stream: Optional[bool] = None,
+    max_tokens: Optional[int] = None,
+) -> None:
+    """Set pool size, default timeout, limiter and streaming settings for clients created from now on.
+    Existing clients are closed so the next get_ollama_client() picks up the settings."""
+    with _CLIENTS_LOCK:
+        if pool_size is not None and pool_size > 0:
+            _SETTINGS["pool_size"] = int(pool_size)
+        if timeout is not None and timeout > 0:
+            _SETTINGS["timeout"] = float(timeout)
+        if max_concurrency is not None and max_concurrency > 0:
+            _SETTINGS["max_concurrency"] = int(max_concurrency)
+        if max_rate is not None and max_rate >= 0:
+            _SETTINGS["max_rate"] = float(max_rate)
+        if stream is not None:
+            _SETTINGS["stream"] = 1.0 if stream else 0.0
+        if max_tokens is not None and max_tokens >= 0:
+            _SETTINGS["max_tokens"] = int(max_tokens)
+        old = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in old:
+        client.close()
+
+
+def get_ollama_client(base_url: str) -> OllamaClient:
+    """Return the process-wide client for `base_url`, creating it on first use."""
+    key = (base_url or "http://localhost:11434").rstrip("/")
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = OllamaClient(
+                key,
+                pool_size=int(_SETTINGS.get("pool_size") or _env_number("OLLAMA_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                timeout=float(_SETTINGS.get("timeout") or _env_number("OLLAMA_TIMEOUT", DEFAULT_TIMEOUT)),
+                max_concurrency=int(_SETTINGS.get("max_concurrency") or _env_number("OLLAMA_CONCURRENCY", 0)),
+                max_rate=float(_SETTINGS["max_rate"] if "max_rate" in _SETTINGS else _env_number("OLLAMA_MAX_RATE", 0.0)),
+                stream=bool(_SETTINGS["stream"] if "stream" in _SETTINGS else _env_flag("OLLAMA_STREAM")),
+                max_tokens=int(_SETTINGS["max_tokens"] if "max_tokens" in _SETTINGS else _env_number("OLLAMA_MAX_TOKENS", 0)),
+            )
+            _CLIENTS[key] = client
+        return client
+
+
+def close_ollama_clients() -> None:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        client.close()
@@ -7,7 +7,6 @@ import signal
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
-import requests
 import json
 from .fm_utils import (
     build_yaml,
@@ -16,8 +15,15 @@ from .fm_utils import (
     get_zh_en_translator,
     translate_front_matter_fields,
     translate_body_cjk_to_en,
+    warm_zh_en_translator,
     parse_ollama_response,
 )
+from .job_store import PipelineJobs, content_hash, open_pipeline_jobs
+from .llm_cache import configure_llm_cache
+from .metrics import DEFAULT_INTERVAL as DEFAULT_METRICS_INTERVAL, close_metrics, configure_metrics, get_metrics
+from .ollama_client import close_ollama_clients, configure_ollama_clients, get_ollama_client
+from .profiling import DEFAULT_DIR as DEFAULT_PROFILE_DIR, DEFAULT_MEM_EVERY as DEFAULT_PROFILE_MEM_EVERY, close_profiling, configure_profiling, profile_page
+from .taxonomy import TaxonomyPool
 
  
 
@@ -96,7 +102,7 @@ def slugify_title(title: str, fallback: Optional[str] = None) -> str:
 
 def reconcile_terms(
     proposed: List[str],
-    pool: List[str],
+    pool: TaxonomyPool,
     max_size: int,
     ollama_base: str,
     ollama_model: str,
@@ -109,14 +115,12 @@ def reconcile_terms(
         norm = normalize(term)
         if not norm:
             continue
-        pool_lower = [p.lower() for p in pool]
-        if norm.lower() in pool_lower:
-            idx = pool_lower.index(norm.lower())
-            selected.append(pool[idx])
+        canonical = pool.get(norm)
+        if canonical is not None:
+            selected.append(canonical)
             continue
         if len(pool) < max_size:
-            pool.append(norm)
-            selected.append(norm)
+            selected.append(pool.add(norm))
         else:
             selected.append(pool[0] if pool else norm)
     return selected
@@ -145,16 +149,7 @@ def resolve_ollama_model(base_url: str, preferred: str) -> str:
     seen: set[str] = set()
     unique_candidates = [c for c in candidates if not (c in seen or seen.add(c))]
     try:
-        r = requests.get(base_url.rstrip("/") + "/api/tags", timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        models = data.get("models") if isinstance(data, dict) else None
-        names = []
-        if isinstance(models, list):
-            for m in models:
-                name = m.get("name") if isinstance(m, dict) else None
-                if isinstance(name, str):
-                    names.append(name)
+        names = get_ollama_client(base_url).list_models(timeout=10)
         for cand in unique_candidates:
             if cand in names:
                 return cand
@@ -179,19 +174,13 @@ def analyze_content_with_ollama(text: str, base_url: str, model: str, wait: floa
         _start_dt = datetime.now()
         logging.info(f"Ollama 调用开始: {_start_dt.strftime('%Y-%m-%d %H:%M:%S')} 模式=http 模型={model} 最大等待={wait}s")
         _t0 = time.perf_counter()
-        r = requests.post(
-            base_url.rstrip("/") + "/api/generate",
-            json={"model": model, "prompt": prompt, "stream": False},
-            timeout=(5, wait if wait and wait > 0 else 60),
-        )
-        if r.status_code == 404:
-            logging.error(f"Ollama 模型未找到：{model}")
-        r.raise_for_status()
-        logging.info(f"Ollama 原始响应: {r.text}")
+        # 共享长连接客户端；仅缓存能解析为 JSON 的输出，避免把无效输出固化
+        raw = get_ollama_client(base_url).generate(model, prompt, timeout=wait if wait and wait > 0 else 60, validate=parse_ollama_response, stop_on_json=True, task="content analysis")
+        logging.info(f"Ollama 原始响应: {raw}")
         _t1 = time.perf_counter()
         _end_dt = datetime.now()
-        logging.info(f"Ollama 调用结束: {_end_dt.strftime('%Y-%m-%d %H:%M:%S')} 模式=http 模型={model} 状态={r.status_code} 耗时={_t1 - _t0:.2f}s")
-        res = parse_ollama_response(r.text)
+        logging.info(f"Ollama 调用结束: {_end_dt.strftime('%Y-%m-%d %H:%M:%S')} 模式=http 模型={model} 耗时={_t1 - _t0:.2f}s")
+        res = parse_ollama_response(raw)
         logging.info(f"Ollama 处理后响应: {json.dumps(res, ensure_ascii=False)}")
         return res
     except KeyboardInterrupt:
@@ -205,7 +194,7 @@ def generate_title_with_ollama(text: str, base_url: str, model: str, wait: float
     s = str(res.get("title", "")).strip()
     return re.sub(r"[\r\n]+", " ", s).strip()
 
-def process_file(path: str, base_url: str, model: str, wait: float, idx: int, prev_url: Optional[str], cat_pool: List[str], tag_pool: List[str]) -> Optional[str]:
+def process_file(path: str, base_url: str, model: str, wait: float, idx: int, prev_url: Optional[str], cat_pool: TaxonomyPool, tag_pool: TaxonomyPool, jobs: Optional[PipelineJobs] = None) -> Optional[str]:
     if CANCELLED:
         raise KeyboardInterrupt
     fm, body = read_md(path)
@@ -229,14 +218,28 @@ def process_file(path: str, base_url: str, model: str, wait: float, idx: int, pr
         logging.info(f"ArgosTranslate 覆盖写入开始: 文件={os.path.basename(path)} 字符数={len(body)}")
         if CANCELLED:
             raise KeyboardInterrupt
-        with open(path, "w", encoding="utf-8") as wf:
+        with get_metrics().timer("file_write"), open(path, "w", encoding="utf-8") as wf:
             wf.write(body)
         logging.info(f"ArgosTranslate 覆盖写入结束: 文件={os.path.basename(path)}")
     except Exception as e:
         logging.warning(f"ArgosTranslate 处理失败，跳过：{e}")
     if CANCELLED:
         raise KeyboardInterrupt
-    analysis = analyze_content_with_ollama(body, base_url, model, wait)
+    # 状态库中已有同一正文的分析结果则直接复用，不再调用 Ollama
+    source = ""
+    input_hash = None
+    done = None
+    if jobs and jobs.enabled:
+        source = jobs.source_for_path(path) or os.path.abspath(path)
+        input_hash = content_hash(body)
+        done = jobs.get(source, "enriched", input_hash=input_hash)
+    if done and isinstance(done.get("payload"), dict):
+        analysis = done["payload"]
+        logging.info(f"复用状态库中的内容分析: 文件={os.path.basename(path)}")
+    else:
+        analysis = analyze_content_with_ollama(body, base_url, model, wait)
+        if jobs and (analysis.get("title") or analysis.get("categories") or analysis.get("tags")):
+            jobs.mark(source, "enriched", payload=analysis, input_hash=input_hash)
     title = (analysis.get("title") or "").strip() or os.path.splitext(os.path.basename(path))[0]
     description = (analysis.get("description") or "").strip()
     # 根据标题生成 URL（用连字符连接），如果标题为空则使用文件名作为回退
@@ -276,10 +279,12 @@ def process_file(path: str, base_url: str, model: str, wait: float, idx: int, pr
     ensure_dir(target_dir)
     target_name = url.replace("/", "") + ".md"
     target_path = os.path.join(target_dir, target_name)
-    with open(target_path, "w", encoding="utf-8") as f:
+    with get_metrics().timer("file_write"), open(target_path, "w", encoding="utf-8") as f:
         f.write(yaml)
         f.write(body)
     logging.info(f"更新英文 Markdown 前言并写入: {target_path}")
+    if jobs:
+        jobs.mark(source, "written", payload={"url": url}, path=target_path, input_hash=input_hash)
     return url or None
 
 
@@ -291,7 +296,29 @@ def main() -> None:
     parser.add_argument("--ollama-base", default=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"))
     parser.add_argument("--ollama-model", default=os.environ.get("OLLAMA_MODEL", "deepseek-r1:7b"))
     parser.add_argument("--ollama-wait", type=float, default=float(os.environ.get("OLLAMA_WAIT", 3000)))
+    parser.add_argument("--no-llm-cache", action="store_true", help="禁用 Ollama 响应的本地持久化缓存")
+    parser.add_argument("--state-db", default=os.environ.get("STATE_DB", ""), help="阶段状态库（SQLite）路径：复用已完成的内容分析，记录写出结果（默认 .cache/pipeline_state.sqlite3）")
+    parser.add_argument("--no-state-db", action="store_true", help="禁用阶段状态库")
+    parser.add_argument("--llm-cache-path", default=os.environ.get("LLM_CACHE_PATH", ""), help="Ollama 响应缓存的 SQLite 文件路径")
+    parser.add_argument("--ollama-pool-size", type=int, default=int(os.environ.get("OLLAMA_POOL_SIZE", 10) or 10), help="与 Ollama 保持的长连接池大小")
+    parser.add_argument("--ollama-concurrency", type=int, default=int(os.environ.get("OLLAMA_CONCURRENCY", 0) or 0), help="同时发往 Ollama 的最大请求数，服务饱和时自动下调（默认等于连接池大小）")
+    parser.add_argument("--ollama-max-rate", type=float, default=float(os.environ.get("OLLAMA_MAX_RATE", 0) or 0), help="Ollama 调用速率硬上限（次/秒，默认 0 不限）")
+    parser.add_argument("--ollama-stream", action="store_true", default=str(os.environ.get("OLLAMA_STREAM", "")).strip().lower() in ("1", "true", "yes", "on"), help="流式读取 Ollama 输出并记录首字延迟与生成速度")
+    parser.add_argument("--ollama-max-tokens", type=int, default=int(os.environ.get("OLLAMA_MAX_TOKENS", 0) or 0), help="流式模式下单次生成的词元上限（默认 0 不限）")
+    parser.add_argument("--metrics-file", default=os.environ.get("METRICS_FILE", ""), help="运行期间定期写出 Prometheus 文本格式的各阶段指标到此文件（默认不写）")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", 0) or 0), help="在 127.0.0.1 的此端口提供 /metrics（默认 0 不启用）")
+    parser.add_argument("--metrics-interval", type=float, default=float(os.environ.get("METRICS_INTERVAL", DEFAULT_METRICS_INTERVAL) or DEFAULT_METRICS_INTERVAL), help=f"指标文件写出间隔秒数（默认 {DEFAULT_METRICS_INTERVAL:g}）")
+    parser.add_argument("--profile", action="store_true", default=str(os.environ.get("PROFILE", "")).strip().lower() in ("1", "true", "yes", "on"), help="对本次运行做性能分析：所有线程的 cProfile 结果合并写出一个 .prof 文件，结束时日志输出耗时最多的函数")
+    parser.add_argument("--profile-dir", default=os.environ.get("PROFILE_DIR", ""), help=f"性能分析输出目录，每次运行新建 <阶段>-<时间> 子目录（默认 {DEFAULT_PROFILE_DIR}）")
+    parser.add_argument("--profile-mem-every", type=int, default=int(os.environ.get("PROFILE_MEM_EVERY", DEFAULT_PROFILE_MEM_EVERY) or 0), help=f"性能分析时每处理多少个页面写出一次 tracemalloc 快照（默认 {DEFAULT_PROFILE_MEM_EVERY}，0 不启用 tracemalloc）")
     args = parser.parse_args()
+    configure_metrics("front_matter", args.metrics_file, args.metrics_port, args.metrics_interval)
+    configure_profiling("front_matter", args.profile, args.profile_dir, args.profile_mem_every)
+    llm_cache = configure_llm_cache(enabled=not args.no_llm_cache, path=args.llm_cache_path or None)
+    jobs = open_pipeline_jobs("cn", args.state_db or None, enabled=not args.no_state_db)
+    configure_ollama_clients(pool_size=args.ollama_pool_size, max_concurrency=args.ollama_concurrency, max_rate=args.ollama_max_rate, stream=args.ollama_stream, max_tokens=args.ollama_max_tokens)
+    # 首批 Ollama 调用期间后台加载 Argos 翻译器
+    warm_zh_en_translator()
 
     files = [os.path.join(args.input_dir, f) for f in os.listdir(args.input_dir) if f.endswith(".md")]
     if not files:
@@ -304,15 +331,21 @@ def main() -> None:
 
     # 初始 prev URL 为根路径
     prev_url: Optional[str] = "/"
-    cat_pool: List[str] = []
-    tag_pool: List[str] = []
+    cat_pool = TaxonomyPool()
+    tag_pool = TaxonomyPool()
     idx = 0
     for path in files:
         try:
-            prev_url = process_file(path, args.ollama_base, model, args.ollama_wait, idx, prev_url, cat_pool, tag_pool) or prev_url
+            prev_url = process_file(path, args.ollama_base, model, args.ollama_wait, idx, prev_url, cat_pool, tag_pool, jobs) or prev_url
             idx += 1
         except Exception as e:
             logging.error(f"处理 {os.path.basename(path)} 失败: {e}")
+        profile_page()
+    llm_cache.log_stats()
+    jobs.log_stats()
+    close_ollama_clients()
+    close_profiling()
+    close_metrics()
 
 
 if __name__ == "__main__":
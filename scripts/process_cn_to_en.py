@@ -1,12 +1,18 @@
 import argparse
 import logging
 import os
-from typing import Dict, Optional, Tuple
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
-import requests
-from ollama import Client  # type: ignore
-from .fm_utils import translate_body_cjk_to_en
+from .fm_utils import contains_cjk, translate_body_cjk_to_en, warm_zh_en_translator
+from .job_store import PipelineJobs, content_hash, open_pipeline_jobs
+from .llm_cache import configure_llm_cache
+from .metrics import DEFAULT_INTERVAL as DEFAULT_METRICS_INTERVAL, close_metrics, configure_metrics, get_metrics
+from .md_chunker import DEFAULT_CHUNK_TOKENS, chunk_markdown, estimate_tokens, num_ctx_for, read_timeout_for, split_padding
+from .ollama_client import close_ollama_clients, configure_ollama_clients, get_ollama_client
+from .profiling import DEFAULT_DIR as DEFAULT_PROFILE_DIR, DEFAULT_MEM_EVERY as DEFAULT_PROFILE_MEM_EVERY, close_profiling, configure_profiling, profile_page
 
 
 def setup_logger() -> None:
@@ -41,63 +47,110 @@ def translate_to_english_with_ollama(
     text: str,
     base_url: str,
     model: str,
-    wait: float = 10.0,
+    wait: float = 0.0,
+    num_ctx: Optional[int] = None,
+    retries: int = 0,
 ) -> str:
     if not text:
         return ""
-    try:
-        import time
-        _start_dt = datetime.now()
-        logging.info(f"Ollama 调用开始: {_start_dt.strftime('%Y-%m-%d %H:%M:%S')} 模式=http 模型={model} 最大等待={wait}s")
-        _t0 = time.perf_counter()
-        prompt = (
-            f"请将以下 Markdown 文本中的中文翻译为自然流畅的英文，保持原有的 Markdown 格式、链接与引用标识；"
-            f"不要添加任何说明或多余内容；不要输出任何 'thinking' 或思考过程，仅输出最终的英文文本。\n\n{text}"
-        )
-        resp = requests.post(
-            base_url.rstrip("/") + "/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-            },
-            timeout=wait if wait and wait > 0 else 60,
-        )
-        if resp.status_code == 404:
-            logging.error(f"Ollama 模型未找到：{model}。请先拉取或更换模型。")
-        resp.raise_for_status()
-        _t1 = time.perf_counter()
-        _end_dt = datetime.now()
-        logging.info(f"Ollama 调用结束: {_end_dt.strftime('%Y-%m-%d %H:%M:%S')} 模式=http 模型={model} 状态={resp.status_code} 耗时={_t1 - _t0:.2f}s")
-        data = resp.json()
-        return (data.get("response") or "").strip()
-    except Exception as ex:
-        logging.error(f"Ollama HTTP 调用失败：{ex}")
+    prompt = (
+        f"请将以下 Markdown 文本中的中文翻译为自然流畅的英文，保持原有的 Markdown 格式、链接与引用标识；"
+        f"不要添加任何说明或多余内容；不要输出任何 'thinking' 或思考过程，仅输出最终的英文文本。\n\n{text}"
+    )
+    # 共享的长连接客户端：同一文件的多个分块复用连接，并经过 LLM 缓存
+    options = {"num_ctx": num_ctx} if num_ctx else None
+    client = get_ollama_client(base_url)
+    # 读取超时按分块长度推算（非流式调用要等整段译文生成完才返回），不低于客户端默认超时；--ollama-wait 仅作下限
+    timeout = max(wait or 0.0, client.timeout, read_timeout_for(estimate_tokens(text)))
+    attempts = max(0, retries) + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            _start_dt = datetime.now()
+            logging.info(f"Ollama 调用开始: {_start_dt.strftime('%Y-%m-%d %H:%M:%S')} 模式=http 模型={model} 最大等待={timeout:.0f}s 尝试={attempt}/{attempts}")
+            _t0 = time.perf_counter()
+            out = client.generate(model, prompt, options=options, timeout=timeout, task="translation")
+            _t1 = time.perf_counter()
+            _end_dt = datetime.now()
+            logging.info(f"Ollama 调用结束: {_end_dt.strftime('%Y-%m-%d %H:%M:%S')} 模式=http 模型={model} 耗时={_t1 - _t0:.2f}s")
+            if out.strip():
+                return out.strip()
+            logging.warning(f"Ollama 返回空结果（尝试 {attempt}/{attempts}）")
+        except Exception as ex:
+            logging.error(f"Ollama HTTP 调用失败（尝试 {attempt}/{attempts}）：{ex}")
+        if attempt < attempts:
+            time.sleep(min(2 ** (attempt - 1), 10))
     return text
 
 
+def translate_chunk(name: str, idx: int, total: int, chunk: str, base_url: str, model: str, wait: float, num_ctx: int, retries: int = 0) -> str:
+    """Translate one chunk and put its surrounding whitespace back.
+    Chunks without Chinese are returned unchanged; a chunk that still fails after
+    `retries` extra attempts keeps its original text."""
+    lead, core, trail = split_padding(chunk)
+    if not contains_cjk(core):
+        # 无中文（如代码块、纯英文段落）直接保留，不调用模型
+        logging.info(f"跳过分块 {name} {idx}/{total}: 无中文")
+        return chunk
+    logging.info(
+        f"开始翻译分块 {name} {idx}/{total}: 行数={len(core.splitlines())} 字符数={len(core)} 估算tokens={estimate_tokens(core)}"
+    )
+    part = translate_to_english_with_ollama(core, base_url, model, wait, num_ctx=num_ctx, retries=retries)
+    logging.info(
+        f"完成翻译分块 {name} {idx}/{total}: 输出字符数={len(part)}"
+    )
+    return lead + part + trail
+
+
  
 
 
-def process_file(path: str, out_dir: str, base_url: str, model: str, wait: float) -> Optional[str]:
+def process_file(
+    path: str,
+    out_dir: str,
+    base_url: str,
+    model: str,
+    wait: float,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    chunk_executor: Optional[ThreadPoolExecutor] = None,
+    retries: int = 0,
+    jobs: Optional[PipelineJobs] = None,
+) -> Optional[str]:
+    """Translate one Markdown file into out_dir.
+    With `chunk_executor`, chunks are translated concurrently on that shared pool
+    and reassembled in source order; otherwise they run one by one.
+    With `jobs`, a file whose body was already translated (same hash, output still
+    on disk) is skipped, and a finished translation is recorded under its source URL."""
     fm, body = read_md(path)
-    lines = body.splitlines(keepends=True)
-    chunks = ["".join(lines[i : i + 5]) for i in range(0, len(lines), 5)]
+    name = os.path.basename(path)
+    source = ""
+    input_hash = None
+    if jobs and jobs.enabled:
+        source = jobs.source_for_path(path) or os.path.abspath(path)
+        input_hash = content_hash(body)
+        done = jobs.get(source, "translated", input_hash=input_hash, require_path=True)
+        if done:
+            logging.info(f"跳过 {name}: 状态库记录已翻译 -> {done['path']}")
+            return done["path"]
+    # 按 Markdown 结构（标题/段落/列表/表格/代码块）切分，并按 token 预算打包
+    chunks = chunk_markdown(body, chunk_tokens)
+    num_ctx = num_ctx_for(chunk_tokens)
     logging.info(
-        f"拆分 {os.path.basename(path)}: 总行数={len(lines)} 分块数={len(chunks)} 每块最多5行"
+        f"拆分 {name}: 总行数={len(body.splitlines())} 分块数={len(chunks)} 每块预算={chunk_tokens} tokens num_ctx={num_ctx}"
     )
 
-    translated_parts = []
-    for idx, chunk in enumerate(chunks, start=1):
-        chunk_line_count = len(chunk.splitlines())
-        logging.info(
-            f"开始翻译分块 {idx}/{len(chunks)}: 行数={chunk_line_count} 字符数={len(chunk)}"
-        )
-        part = translate_to_english_with_ollama(chunk, base_url, model, wait)
-        translated_parts.append(part)
-        logging.info(
-            f"完成翻译分块 {idx}/{len(chunks)}: 输出字符数={len(part)}"
-        )
+    total = len(chunks)
+    if chunk_executor is not None and total > 1:
+        futures: List[Future] = [
+            chunk_executor.submit(translate_chunk, name, idx, total, chunk, base_url, model, wait, num_ctx, retries)
+            for idx, chunk in enumerate(chunks, start=1)
+        ]
+        # 按提交顺序取结果，保证与原文顺序一致
+        translated_parts = [f.result() for f in futures]
+    else:
+        translated_parts = [
+            translate_chunk(name, idx, total, chunk, base_url, model, wait, num_ctx, retries)
+            for idx, chunk in enumerate(chunks, start=1)
+        ]
 
     en_body = "".join(translated_parts)
     # 统一中文过滤：如仍有中文，则使用 ArgosTranslate 做段内翻译与清理
@@ -106,14 +159,16 @@ def process_file(path: str, out_dir: str, base_url: str, model: str, wait: float
     except Exception:
         pass
     logging.info(
-        f"合并 {os.path.basename(path)}: 段数={len(chunks)} 合并后字符数={len(en_body)}"
+        f"合并 {name}: 段数={len(chunks)} 合并后字符数={len(en_body)}"
     )
 
     ensure_dir(out_dir)
     out_path = os.path.join(out_dir, os.path.basename(path))
-    with open(out_path, "w", encoding="utf-8") as f:
+    with get_metrics().timer("file_write"), open(out_path, "w", encoding="utf-8") as f:
         f.write(en_body)
     logging.info(f"写入英文 Markdown（无前言）: {out_path}")
+    if jobs:
+        jobs.mark(source, "translated", path=out_path, input_hash=input_hash)
     return out_path
 
 
@@ -124,8 +179,34 @@ def main() -> None:
     parser.add_argument("--output-dir", default=os.environ.get("EN_OUTPUT_DIR", "en"), help="英文 Markdown 输出目录")
     parser.add_argument("--ollama-base", default=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"))
     parser.add_argument("--ollama-model", default=os.environ.get("OLLAMA_MODEL", "qwen3:4b"))
-    parser.add_argument("--ollama-wait", type=float, default=float(os.environ.get("OLLAMA_WAIT", 10)))
+    parser.add_argument("--ollama-wait", type=float, default=float(os.environ.get("OLLAMA_WAIT", 0) or 0), help="单个分块翻译的最短读取超时秒数；默认 0，即按分块 token 数推算（不低于 OLLAMA_TIMEOUT）")
+    parser.add_argument("--chunk-tokens", type=int, default=int(os.environ.get("CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS) or DEFAULT_CHUNK_TOKENS), help="每个翻译分块的 token 预算；按标题/段落/列表/表格/代码块切分，不拆开 Markdown 结构")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("TRANSLATE_WORKERS", 1) or 1), help="并发翻译的线程数：同时处理多个文件，文件内分块也并发发送，结果按原文顺序合并（默认 1，即逐块处理）")
+    parser.add_argument("--chunk-retries", type=int, default=int(os.environ.get("CHUNK_RETRIES", 2) or 0), help="单个分块翻译失败或返回空结果时的重试次数，仅重试该分块（默认 2）")
+    parser.add_argument("--no-llm-cache", action="store_true", help="禁用 Ollama 响应的本地持久化缓存")
+    parser.add_argument("--state-db", default=os.environ.get("STATE_DB", ""), help="阶段状态库（SQLite）路径：已翻译且原文未变的文件在重启后跳过（默认 .cache/pipeline_state.sqlite3）")
+    parser.add_argument("--no-state-db", action="store_true", help="禁用阶段状态库")
+    parser.add_argument("--llm-cache-path", default=os.environ.get("LLM_CACHE_PATH", ""), help="Ollama 响应缓存的 SQLite 文件路径")
+    parser.add_argument("--ollama-pool-size", type=int, default=int(os.environ.get("OLLAMA_POOL_SIZE", 10) or 10), help="与 Ollama 保持的长连接池大小")
+    parser.add_argument("--ollama-concurrency", type=int, default=int(os.environ.get("OLLAMA_CONCURRENCY", 0) or 0), help="同时发往 Ollama 的最大请求数，服务饱和时自动下调（默认等于连接池大小）")
+    parser.add_argument("--ollama-max-rate", type=float, default=float(os.environ.get("OLLAMA_MAX_RATE", 0) or 0), help="Ollama 调用速率硬上限（次/秒，默认 0 不限）")
+    parser.add_argument("--ollama-stream", action="store_true", default=str(os.environ.get("OLLAMA_STREAM", "")).strip().lower() in ("1", "true", "yes", "on"), help="流式读取 Ollama 输出并记录首字延迟与生成速度")
+    parser.add_argument("--ollama-max-tokens", type=int, default=int(os.environ.get("OLLAMA_MAX_TOKENS", 0) or 0), help="流式模式下单次生成的词元上限（默认 0 不限）")
+    parser.add_argument("--metrics-file", default=os.environ.get("METRICS_FILE", ""), help="运行期间定期写出 Prometheus 文本格式的各阶段指标到此文件（默认不写）")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", 0) or 0), help="在 127.0.0.1 的此端口提供 /metrics（默认 0 不启用）")
+    parser.add_argument("--metrics-interval", type=float, default=float(os.environ.get("METRICS_INTERVAL", DEFAULT_METRICS_INTERVAL) or DEFAULT_METRICS_INTERVAL), help=f"指标文件写出间隔秒数（默认 {DEFAULT_METRICS_INTERVAL:g}）")
+    parser.add_argument("--profile", action="store_true", default=str(os.environ.get("PROFILE", "")).strip().lower() in ("1", "true", "yes", "on"), help="对本次运行做性能分析：所有线程的 cProfile 结果合并写出一个 .prof 文件，结束时日志输出耗时最多的函数")
+    parser.add_argument("--profile-dir", default=os.environ.get("PROFILE_DIR", ""), help=f"性能分析输出目录，每次运行新建 <阶段>-<时间> 子目录（默认 {DEFAULT_PROFILE_DIR}）")
+    parser.add_argument("--profile-mem-every", type=int, default=int(os.environ.get("PROFILE_MEM_EVERY", DEFAULT_PROFILE_MEM_EVERY) or 0), help=f"性能分析时每处理多少个页面写出一次 tracemalloc 快照（默认 {DEFAULT_PROFILE_MEM_EVERY}，0 不启用 tracemalloc）")
     args = parser.parse_args()
+    configure_metrics("cn_to_en", args.metrics_file, args.metrics_port, args.metrics_interval)
+    configure_profiling("cn_to_en", args.profile, args.profile_dir, args.profile_mem_every)
+    llm_cache = configure_llm_cache(enabled=not args.no_llm_cache, path=args.llm_cache_path or None)
+    workers = max(1, args.workers)
+    jobs = open_pipeline_jobs("cn", args.state_db or None, enabled=not args.no_state_db)
+    configure_ollama_clients(pool_size=max(args.ollama_pool_size, workers), max_concurrency=args.ollama_concurrency, max_rate=args.ollama_max_rate, stream=args.ollama_stream, max_tokens=args.ollama_max_tokens)
+    # 首批 Ollama 调用期间后台加载 Argos 翻译器
+    warm_zh_en_translator()
 
     ensure_dir(args.output_dir)
     files = [f for f in os.listdir(args.input_dir) if f.endswith(".md")]
@@ -133,12 +214,49 @@ def main() -> None:
         logging.warning("输入目录没有 Markdown 文件")
         return
 
-    for name in files:
-        path = os.path.join(args.input_dir, name)
+    if workers <= 1:
+        for name in files:
+            path = os.path.join(args.input_dir, name)
+            try:
+                process_file(path, args.output_dir, args.ollama_base, args.ollama_model, args.ollama_wait, args.chunk_tokens, retries=args.chunk_retries, jobs=jobs)
+            except Exception as e:
+                logging.error(f"处理 {name} 失败：{e}")
+            profile_page()
+    else:
+        # 两个线程池：文件池负责切分/合并/写文件，分块池负责调用 Ollama。
+        # 文件只在分块池中排队等待，单个慢文件不会阻塞其它文件。
+        chunk_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk")
+        file_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file")
         try:
-            process_file(path, args.output_dir, args.ollama_base, args.ollama_model, args.ollama_wait)
-        except Exception as e:
-            logging.error(f"处理 {name} 失败：{e}")
+            futures = {
+                file_executor.submit(
+                    process_file,
+                    os.path.join(args.input_dir, name),
+                    args.output_dir,
+                    args.ollama_base,
+                    args.ollama_model,
+                    args.ollama_wait,
+                    args.chunk_tokens,
+                    chunk_executor,
+                    args.chunk_retries,
+                    jobs,
+                ): name
+                for name in files
+            }
+            for fut in as_completed(futures):
+                try:
+                    fut.result()
+                except Exception as e:
+                    logging.error(f"处理 {futures[fut]} 失败：{e}")
+                profile_page()
+        finally:
+            file_executor.shutdown(wait=True, cancel_futures=True)
+            chunk_executor.shutdown(wait=True, cancel_futures=True)
+    llm_cache.log_stats()
+    jobs.log_stats()
+    close_ollama_clients()
+    close_profiling()
+    close_metrics()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+"""Opt-in cProfile and tracemalloc profiling of a whole pipeline run.
+
+Finding out where a slow run spends its time used to mean wrapping the
+scripts in `python -m cProfile` by hand, which only sees the main thread while
+the pages are translated and enriched in worker pools. With `--profile` the
+scripts start a `RunProfiler` right after parsing their arguments:
+  - every thread of the run is profiled and the result is written as one
+    `<job>.prof` dump for pstats / snakeviz. From Python 3.12 cProfile runs on
+    sys.monitoring, which allows a single profiler per process and already sees
+    all threads; before that each thread gets its own profiler (installed
+    through threading.setprofile, so pool threads started later are covered
+    too) and they are merged at exit
+  - with tracemalloc on, a snapshot is dumped every `mem_every` pages
+    (`pages-00050.snapshot`, ...) and once more at exit (`end.snapshot`), for
+    tracemalloc.Snapshot.load() and compare_to()
+  - at exit the functions with the most own time and the lines whose
+    allocations grew the most since the first snapshot go to the log
+
+HTML conversion worker processes (see html_convert.py) are not profiled; run
+with `--html-workers 0` to see that work in the dump. tracemalloc slows down
+allocation-heavy code noticeably; `mem_every=0` turns it off.
+
+Configuration (CLI flags in the scripts take precedence):
+  - PROFILE            1 to profile the run (same as --profile)
+  - PROFILE_DIR        parent directory of the per-run dump directories (default .cache/profile)
+  - PROFILE_MEM_EVERY  pages between tracemalloc snapshots (default 50, 0: no tracemalloc)
+"""
+
+import atexit
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+DEFAULT_DIR = os.path.join(".cache", "profile")
+DEFAULT_MEM_EVERY = 50
+DEFAULT_TOP = 15
+# cProfile on sys.monitoring (3.12+): one process-wide profiler covers every thread
+_PROCESS_WIDE = sys.version_info >= (3, 12)
+
+# Allocations of tracemalloc and the import machinery; applied only when logging,
+# since filtering a large snapshot in Python would show up in the profile
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def _describe(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        # Built-in functions and methods
+        return name
+    rel = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    if rel.startswith(".."):
+        rel = os.path.join(*filename.replace("\\", "/").split("/")[-2:])
+    return f"{rel}:{line}({name})"
+
+
+class RunProfiler:
+    """cProfile for every thread of the run plus periodic tracemalloc snapshots."""
+
+    def __init__(self, job: str, out_dir: str, mem_every: int = DEFAULT_MEM_EVERY, top: int = DEFAULT_TOP):
+        self.job = job
+        self.out_dir = out_dir
+        self.mem_every = max(0, int(mem_every))
+        self.top = top
+        self.pages = 0
+        self.snapshots: List[str] = []
+        self._profiles: List[cProfile.Profile] = []
+        self._first: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._own_tracemalloc = False
+        os.makedirs(out_dir, exist_ok=True)
+        if self.mem_every and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        self._enable()
+        if not _PROCESS_WIDE:
+            threading.setprofile(self._start_thread)
+
+    def _enable(self) -> None:
+        prof = cProfile.Profile()
+        prof.enable()
+        with self._lock:
+            self._profiles.append(prof)
+
+    def _start_thread(self, frame, event, arg) -> None:
+        # First profile event of a new thread: its own profiler replaces this hook
+        try:
+            self._enable()
+        except Exception as e:
+            # Never let profiling break the thread; it just goes unprofiled
+            sys.setprofile(None)
+            logging.debug(f"线程 {threading.current_thread().name} 无法启用性能分析：{e}")
+
+    def page_done(self) -> None:
+        """Count a finished page; dumps a tracemalloc snapshot every `mem_every` pages."""
+        with self._lock:
+            self.pages += 1
+            due = bool(self.mem_every) and self.pages % self.mem_every == 0
+        if due:
+            self._snapshot(f"pages-{self.pages:05d}")
+
+    def _snapshot(self, label: str) -> Optional[tracemalloc.Snapshot]:
+        if not tracemalloc.is_tracing():
+            return None
+        try:
+            snap = tracemalloc.take_snapshot()
+            path = os.path.join(self.out_dir, f"{label}.snapshot")
+            snap.dump(path)
+        except Exception as e:
+            logging.warning(f"tracemalloc 快照失败（{label}）：{e}")
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self.snapshots.append(path)
+            if self._first is None:
+                self._first = snap
+        logging.info(f"tracemalloc 快照：{path} 页面={self.pages} 当前={current / 1048576:.1f}MiB 峰值={peak / 1048576:.1f}MiB")
+        return snap
+
+    def close(self) -> None:
+        """Stop profiling, write the dumps and log the summary."""
+        if not _PROCESS_WIDE:
+            threading.setprofile(None)
+        with self._lock:
+            profiles = list(self._profiles)
+            self._profiles = []
+        # Before 3.12 disable() unhooks the calling thread only; the scripts have shut their pools down by now
+        for prof in profiles:
+            prof.disable()
+        elapsed = time.perf_counter() - self._started
+        if tracemalloc.is_tracing():
+            # Before merging the profiles, whose allocations would dominate the comparison
+            first = self._first
+            end = self._snapshot("end")
+            if end is not None:
+                self._log_allocations(end.filter_traces(_SNAPSHOT_FILTERS), first.filter_traces(_SNAPSHOT_FILTERS) if first is not None and first is not end else None)
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+        try:
+            stats = pstats.Stats(*profiles)
+            path = os.path.join(self.out_dir, f"{self.job}.prof")
+            stats.dump_stats(path)
+            threads = "全部线程" if _PROCESS_WIDE else f"{len(profiles)} 个线程"
+            logging.info(f"性能分析结果：{path}（{threads}，{self.pages} 个页面，运行 {elapsed:.1f}s；可用 python -m pstats 或 snakeviz 查看）")
+            self._log_functions(stats)
+        except Exception as e:
+            logging.warning(f"写入性能分析结果失败：{e}")
+
+    def _log_functions(self, stats: pstats.Stats) -> None:
+        stats.sort_stats("tottime")
+        # Worker threads blocked on locks or sockets show up as built-in acquire/recv calls
+        logging.info(f"自身耗时最多的 {self.top} 个函数（所有线程合计）：")
+        for func in stats.fcn_list[: self.top]:
+            _cc, calls, own, cumulative, _callers = stats.stats[func]
+            logging.info(f"  自身={own:.3f}s 累计={cumulative:.3f}s 调用={calls} {_describe(func)}")
+
+    def _log_allocations(self, end: tracemalloc.Snapshot, first: Optional[tracemalloc.Snapshot]) -> None:
+        if first is not None:
+            logging.info(f"内存增长最多的 {self.top} 处（相对第一个快照）：")
+            for diff in end.compare_to(first, "lineno")[: self.top]:
+                logging.info(f"  {diff.size_diff / 1024:+.1f}KiB 现={diff.size / 1024:.1f}KiB 块数={diff.count} {diff.traceback[0]}")
+        else:
+            logging.info(f"内存占用最多的 {self.top} 处：")
+            for stat in end.statistics("lineno")[: self.top]:
+                logging.info(f"  {stat.size / 1024:.1f}KiB 块数={stat.count} {stat.traceback[0]}")
+
+
+_PROFILER: Optional[RunProfiler] = None
+_ATEXIT_REGISTERED = False
+
+
+def configure_profiling(job: str, enabled: bool, out_dir: str = "", mem_every: int = DEFAULT_MEM_EVERY) -> Optional[RunProfiler]:
+    """Start profiling this run into `<out_dir>/<job>-<time>/` when enabled.
+    The dumps are also written on interpreter exit, so an interrupted run keeps them."""
+    global _PROFILER, _ATEXIT_REGISTERED
+    close_profiling()
+    if not enabled:
+        return None
+    run_dir = os.path.join(out_dir or DEFAULT_DIR, f"{job}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    try:
+        _PROFILER = RunProfiler(job, run_dir, mem_every)
+    except Exception as e:
+        logging.warning(f"性能分析不可用：{e}")
+        return None
+    if not _ATEXIT_REGISTERED:
+        atexit.register(close_profiling)
+        _ATEXIT_REGISTERED = True
+    mem = f"每 {_PROFILER.mem_every} 个页面一次 tracemalloc 快照" if _PROFILER.mem_every else "未启用 tracemalloc"
+    logging.info(f"性能分析已开启：输出目录 {run_dir}，{mem}")
+    return _PROFILER
+
+
+def profile_page() -> None:
+    """Count a finished page for the periodic snapshots (no-op unless profiling)."""
+    if _PROFILER is not None:
+        _PROFILER.page_done()
+
+
+def close_profiling() -> None:
+    global _PROFILER
+    profiler, _PROFILER = _PROFILER, None
+    if profiler is not None:
+        profiler.close()
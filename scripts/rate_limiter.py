@@ -0,0 +1,239 @@
+"""Adaptive concurrency limiter with an optional token bucket for Ollama calls.
+
+Callers take a slot before each request and hand back the observed latency.
+The limiter keeps, per task (translation, taxonomy extraction, embed, ...), an
+EWMA of call latency and a slowly drifting baseline (the best EWMA seen): a
+long translation is not slow compared with a short term-matching call, only
+compared with earlier translations. While latency stays close to the baseline
+of its task, every caller runs immediately (up to `max_concurrency` in
+flight). When latency climbs past `slow_factor` x baseline, or the server
+times out / answers 429/503, the in-flight limit is cut multiplicatively so
+further callers queue on our side instead of piling up inside Ollama; it grows
+back by one per round-trip once latency recovers and callers are waiting
+(AIMD).
+
+`max_rate` (calls per second, 0 = unlimited) adds a token bucket on top for
+users who want a hard ceiling, e.g. on a shared GPU box.
+
+Configuration (CLI flags in the scripts take precedence):
+  - OLLAMA_CONCURRENCY   max in-flight calls per server (default: pool size)
+  - OLLAMA_MAX_RATE      hard cap in calls per second (default 0 = none)
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+EWMA_ALPHA = 0.2
+# Per-completion upward drift of the baseline so one lucky fast call does not pin it forever
+BASELINE_DRIFT = 0.005
+RECOVER_FACTOR = 1.25
+DECREASE_FACTOR = 0.75
+LOG_EVERY = 30.0
+
+
+class AdaptiveLimiter:
+    """Thread-safe AIMD concurrency limit plus token bucket."""
+
+    def __init__(self, max_concurrency: int = 4, min_concurrency: int = 1, max_rate: float = 0.0, slow_factor: float = 2.0, log_every: float = LOG_EVERY, name: str = "ollama"):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.max_rate = max(0.0, float(max_rate or 0.0))
+        self.slow_factor = max(1.0, float(slow_factor))
+        self.log_every = float(log_every)
+        self.name = name
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.waiting = 0
+        # Latency EWMA and baseline per task
+        self.ewma: Dict[str, float] = {}
+        self.baseline: Dict[str, float] = {}
+        self.completed = 0
+        self.overloads = 0
+        self.decreases = 0
+        self.wait_time = 0.0
+        self._cond = threading.Condition()
+        self._tokens = 1.0
+        now = time.monotonic()
+        self._refilled_at = now
+        self._last_adjust = now
+        self._started_at = now
+        self._window_start = now
+        self._window_done = 0
+
+    # ---- token bucket ----
+    def _refill(self, now: float) -> None:
+        if self.max_rate > 0:
+            self._tokens = min(1.0, self._tokens + (now - self._refilled_at) * self.max_rate)
+        self._refilled_at = now
+
+    def _ready(self) -> bool:
+        return self.in_flight < self.limit and (self.max_rate <= 0 or self._tokens >= 1.0)
+
+    def _take(self) -> None:
+        self.in_flight += 1
+        if self.max_rate > 0:
+            self._tokens -= 1.0
+
+    # ---- acquire / release ----
+    def try_acquire(self) -> bool:
+        """Take a slot without blocking; returns False if none is free."""
+        with self._cond:
+            self._refill(time.monotonic())
+            if self._ready():
+                self._take()
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a slot (and a token, if rate-capped) is free."""
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._ready():
+                        self._take()
+                        self.wait_time += now - start
+                        return True
+                    pause = None
+                    if self.in_flight < self.limit and self.max_rate > 0:
+                        # Only the bucket is empty: sleep until the next token
+                        pause = (1.0 - self._tokens) / self.max_rate
+                    if deadline is not None:
+                        left = deadline - now
+                        if left <= 0:
+                            return False
+                        pause = left if pause is None else min(pause, left)
+                    self._cond.wait(pause)
+            finally:
+                self.waiting -= 1
+
+    def release(self, latency: float, overloaded: bool = False, task: str = "") -> None:
+        """Return a slot and feed the observed latency into the controller,
+        compared only with earlier calls of the same `task`."""
+        log_line = None
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if overloaded:
+                self.overloads += 1
+            else:
+                self.completed += 1
+                self._window_done += 1
+                latency = max(0.0, float(latency))
+                ewma = self.ewma.get(task)
+                ewma = latency if ewma is None else (1 - EWMA_ALPHA) * ewma + EWMA_ALPHA * latency
+                self.ewma[task] = ewma
+                baseline = self.baseline.get(task)
+                self.baseline[task] = ewma if baseline is None else min(baseline * (1 + BASELINE_DRIFT), ewma)
+            self._adjust(now, overloaded, task)
+            if self.log_every > 0 and now - self._window_start >= self.log_every:
+                log_line = self._status_line(now)
+                self._window_start = now
+                self._window_done = 0
+            self._cond.notify_all()
+        if log_line:
+            logging.info(log_line)
+
+    def _adjust(self, now: float, overloaded: bool, task: str = "") -> None:
+        # At most one change per observed round-trip, otherwise a burst of slow
+        # replies from the same wave would collapse the limit to the minimum
+        rtt = self.ewma.get(task, 0.0)
+        if now - self._last_adjust < rtt:
+            return
+        baseline = self.baseline.get(task, 0.0)
+        saturated = overloaded or (baseline > 0 and rtt > baseline * self.slow_factor)
+        if saturated and self.limit > self.min_concurrency:
+            new_limit = max(self.min_concurrency, min(self.limit - 1, int(self.limit * DECREASE_FACTOR)))
+            label = f"（{task}）" if task else ""
+            logging.info(f"Ollama 负载升高，并发上限 {self.limit} -> {new_limit}（平均延迟{label}={rtt:.1f}s 基线={baseline:.1f}s 排队={self.waiting}）")
+            self.limit = new_limit
+            self.decreases += 1
+            self._last_adjust = now
+        elif not saturated and self.waiting > 0 and self.limit < self.max_concurrency and baseline > 0 and rtt <= baseline * RECOVER_FACTOR:
+            self.limit += 1
+            self._last_adjust = now
+
+    @contextmanager
+    def slot(self, task: str = ""):
+        """`with limiter.slot(task) as s:` — set `s["overloaded"] = True` on timeouts/429/503."""
+        self.acquire()
+        state: Dict[str, Any] = {"overloaded": False}
+        start = time.monotonic()
+        try:
+            yield state
+        finally:
+            self.release(time.monotonic() - start, overloaded=bool(state["overloaded"]), task=task)
+
+    @asynccontextmanager
+    async def aslot(self, poll: float = 0.05, task: str = ""):
+        """Async variant of slot(); polls instead of blocking the event loop."""
+        waited = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+        try:
+            while not self.try_acquire():
+                await asyncio.sleep(poll)
+        finally:
+            with self._cond:
+                self.waiting -= 1
+                self.wait_time += time.monotonic() - waited
+        state: Dict[str, Any] = {"overloaded": False}
+        start = time.monotonic()
+        try:
+            yield state
+        finally:
+            self.release(time.monotonic() - start, overloaded=bool(state["overloaded"]), task=task)
+
+    # ---- reporting ----
+    def _latency_text(self) -> str:
+        if not self.ewma:
+            return "平均延迟=0.0s"
+        if len(self.ewma) == 1 and "" in self.ewma:
+            return f"平均延迟={self.ewma['']:.1f}s 基线={self.baseline.get('', 0.0):.1f}s"
+        items = " ".join(f"{task or '-'}={ewma:.1f}s/{self.baseline.get(task, 0.0):.1f}s" for task, ewma in sorted(self.ewma.items()))
+        return f"平均延迟/基线：{items}"
+
+    def _status_line(self, now: float) -> str:
+        span = max(1e-6, now - self._window_start)
+        rate = self._window_done / span
+        cap = f" 速率上限={self.max_rate:g}/s" if self.max_rate > 0 else ""
+        return (
+            f"Ollama 调度（{self.name}）：有效速率={rate:.2f} 次/秒 并发={self.in_flight}/{self.limit}（最大 {self.max_concurrency}）"
+            f" 排队={self.waiting} {self._latency_text()}{cap}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            elapsed = max(1e-6, time.monotonic() - self._started_at)
+            return {
+                "completed": self.completed,
+                "overloads": self.overloads,
+                "rate": self.completed / elapsed,
+                "limit": self.limit,
+                "max_concurrency": self.max_concurrency,
+                "max_rate": self.max_rate,
+                "decreases": self.decreases,
+                "ewma_latency": dict(self.ewma),
+                "baseline_latency": dict(self.baseline),
+                "wait_time": self.wait_time,
+            }
+
+    def log_stats(self) -> None:
+        s = self.stats()
+        if not s["completed"] and not s["overloads"]:
+            return
+        with self._cond:
+            latency = self._latency_text()
+        logging.info(
+            f"Ollama 调度统计（{self.name}）：请求={s['completed']} 过载={s['overloads']} 平均速率={s['rate']:.2f} 次/秒 "
+            f"最终并发上限={s['limit']}/{s['max_concurrency']} 降档次数={s['decreases']} 排队总时长={s['wait_time']:.1f}s "
+            f"{latency}"
+        )
@@ -0,0 +1,67 @@
+"""Ordered, case-insensitive pool of taxonomy terms (categories or tags).
+
+`reconcile_terms` looks up every proposed term in the global pool of terms seen
+so far. `TaxonomyPool` keeps the terms in insertion order together with a
+lower-case -> canonical index, so a lookup is one dict access instead of
+rebuilding a lowered copy of the pool and scanning it for each term. The first
+spelling added stays the canonical one.
+
+In the manifest a pool is stored as the plain list of its terms
+(`global_categories_pool` / `global_tags_pool`), so manifests written before
+the pool existed load unchanged.
+"""
+
+from typing import Iterable, Iterator, List, Optional, Union
+
+
+class TaxonomyPool:
+    """Insertion-ordered term list with O(1) case-insensitive lookup."""
+
+    def __init__(self, terms: Optional[Iterable[str]] = None):
+        self._terms: List[str] = []
+        self._index: dict[str, str] = {}
+        for term in terms or []:
+            self.add(term)
+
+    @classmethod
+    def from_manifest(cls, values: Optional[Iterable[str]]) -> "TaxonomyPool":
+        """Pool from a manifest list; non-strings, blanks and case-duplicates are dropped."""
+        return cls(v for v in (values or []) if isinstance(v, str) and v.strip())
+
+    def to_manifest(self) -> List[str]:
+        return list(self._terms)
+
+    @property
+    def terms(self) -> List[str]:
+        """The terms in insertion order (read-only view; use add() to extend)."""
+        return self._terms
+
+    def get(self, term: str) -> Optional[str]:
+        """Canonical form of `term` if the pool holds it in any letter case."""
+        return self._index.get(term.lower())
+
+    def add(self, term: str) -> str:
+        """Add `term` unless present; returns its canonical form."""
+        key = term.lower()
+        found = self._index.get(key)
+        if found is not None:
+            return found
+        self._index[key] = term
+        self._terms.append(term)
+        return term
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and term.lower() in self._index
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._terms)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[str, List[str]]:
+        # Slicing gives the terms added since a given size (journal events)
+        return self._terms[key]
+
+    def __repr__(self) -> str:
+        return f"TaxonomyPool({len(self._terms)} terms)"
@@ -0,0 +1,209 @@
+"""Embedding-based nearest-term matching for full taxonomy pools.
+
+Once the category or tag pool is at its cap, every new term is mapped to the
+closest existing one. Asking the generate model to choose from up to 300 listed
+options is the slowest call in the pipeline. `TermMatcher` embeds pool terms
+through Ollama's /api/embed once, keeps the vectors in a SQLite cache on disk
+and answers with a NumPy cosine search over the normalized pool matrix.
+Only a low-confidence match, where the best score is under the threshold or
+too close to the runner-up, still goes to the generate model, and then with
+just the top candidates listed.
+
+NumPy is optional: without it (or if the embedding model is unavailable) the
+matcher stays off and the generate call is used as before.
+
+Configuration (CLI flags in the scripts take precedence):
+  - TERM_MATCH                 "llm" (default) or "embed"
+  - OLLAMA_EMBED_MODEL         embedding model (default nomic-embed-text)
+  - TERM_EMBED_CACHE_PATH      vector cache (default `.cache/term_embeddings.sqlite3`)
+  - TERM_MATCH_MIN_SCORE       cosine similarity needed to accept without the LLM (default 0.80)
+  - TERM_MATCH_MARGIN          lead over the runner-up needed as well (default 0.03)
+  - TERM_MATCH_CANDIDATES      options listed to the LLM tiebreaker (default 10)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # optional dependency
+    np = None  # type: ignore
+
+from .ollama_client import get_ollama_client
+
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+DEFAULT_CACHE_PATH = os.path.join(".cache", "term_embeddings.sqlite3")
+DEFAULT_MIN_SCORE = 0.80
+DEFAULT_MARGIN = 0.03
+DEFAULT_CANDIDATES = 10
+EMBED_BATCH = 64
+TERM_MATCH_MODES = ("llm", "embed")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default) or default)
+    except ValueError:
+        return default
+
+
+class EmbeddingCache:
+    """SQLite store of float32 term vectors keyed by (model, text)."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS vectors (model TEXT NOT NULL, text TEXT NOT NULL, dim INTEGER NOT NULL, vec BLOB NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (model, text))")
+        conn.commit()
+        self._conn = conn
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[str, "np.ndarray"]:
+        found: Dict[str, "np.ndarray"] = {}
+        with self._lock:
+            for text in texts:
+                row = self._conn.execute("SELECT vec FROM vectors WHERE model = ? AND text = ?", (model, text)).fetchone()
+                if row is not None:
+                    found[text] = np.frombuffer(row[0], dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, "np.ndarray"]) -> None:
+        now = time.time()
+        rows = [(model, text, int(vec.shape[0]), vec.astype(np.float32).tobytes(), now) for text, vec in vectors.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors (model, text, dim, vec, created_at) VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+
+class TermMatcher:
+    """Nearest pool term by cosine similarity of Ollama embeddings.
+
+    Pool vectors are L2-normalized rows of one matrix that grows as the pool
+    grows, so a query is a single matrix-vector product."""
+
+    def __init__(self, ollama_base: str, model: str = DEFAULT_EMBED_MODEL, cache: Optional[EmbeddingCache] = None, min_score: Optional[float] = None, margin: Optional[float] = None, candidates: Optional[int] = None):
+        self.ollama_base = ollama_base
+        self.model = model
+        self.cache = cache
+        self.min_score = min_score if min_score is not None else _env_float("TERM_MATCH_MIN_SCORE", DEFAULT_MIN_SCORE)
+        self.margin = margin if margin is not None else _env_float("TERM_MATCH_MARGIN", DEFAULT_MARGIN)
+        self.candidates = max(2, int(candidates if candidates is not None else _env_float("TERM_MATCH_CANDIDATES", DEFAULT_CANDIDATES)))
+        self.disabled = False
+        self._rows: Dict[str, int] = {}
+        self._matrix = None
+        self.stats: Dict[str, int] = {"queries": 0, "embedded": 0, "cache_hits": 0, "confident": 0, "tiebreak": 0}
+
+    def _vectors(self, texts: List[str]) -> Dict[str, "np.ndarray"]:
+        """Normalized vectors for `texts`: disk cache first, then batched /api/embed calls."""
+        out: Dict[str, "np.ndarray"] = self.cache.get_many(self.model, texts) if self.cache else {}
+        self.stats["cache_hits"] += len(out)
+        missing = [t for t in texts if t not in out]
+        fresh: Dict[str, "np.ndarray"] = {}
+        client = get_ollama_client(self.ollama_base)
+        for i in range(0, len(missing), EMBED_BATCH):
+            chunk = missing[i:i + EMBED_BATCH]
+            for text, vec in zip(chunk, client.embed(self.model, chunk)):
+                arr = np.asarray(vec, dtype=np.float32)
+                norm = float(np.linalg.norm(arr))
+                fresh[text] = arr / norm if norm else arr
+        if fresh:
+            self.stats["embedded"] += len(fresh)
+            if self.cache:
+                self.cache.put_many(self.model, fresh)
+            out.update(fresh)
+        return out
+
+    def _ensure_pool(self, options: Sequence[str]) -> None:
+        missing = [o for o in options if o not in self._rows]
+        if not missing:
+            return
+        vectors = self._vectors(missing)
+        rows = np.stack([vectors[o] for o in missing])
+        if self._matrix is not None and self._matrix.shape[1] != rows.shape[1]:
+            raise ValueError("嵌入向量维度不一致（更换了嵌入模型？）")
+        base = 0 if self._matrix is None else self._matrix.shape[0]
+        self._matrix = rows if self._matrix is None else np.vstack([self._matrix, rows])
+        for i, term in enumerate(missing):
+            self._rows[term] = base + i
+
+    def rank(self, term: str, options: Sequence[str]) -> List[Tuple[str, float]]:
+        """(option, cosine similarity) for all options, best first."""
+        self._ensure_pool(options)
+        query = self._vectors([term])[term]
+        idx = np.fromiter((self._rows[o] for o in options), dtype=np.int64, count=len(options))
+        scores = self._matrix[idx] @ query
+        order = np.argsort(-scores)
+        return [(options[i], float(scores[i])) for i in order]
+
+    def choose(self, term: str, options: Sequence[str], tiebreak: Callable[[List[str]], str]) -> Optional[str]:
+        """Closest option to `term`, or None if embeddings are unavailable (caller falls back).
+        Low-confidence matches are decided by `tiebreak(top candidates)`."""
+        if self.disabled or not options:
+            return None
+        self.stats["queries"] += 1
+        try:
+            ranked = self.rank(term, list(options))
+        except Exception as e:
+            # Typically the embedding model is not pulled; stop trying for this run
+            logging.warning(f"术语嵌入匹配不可用，改用 LLM 选择：{e}")
+            self.disabled = True
+            return None
+        best, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if score >= self.min_score and score - runner_up >= self.margin:
+            self.stats["confident"] += 1
+            return best
+        self.stats["tiebreak"] += 1
+        return tiebreak([opt for opt, _ in ranked[:self.candidates]])
+
+    def log_stats(self) -> None:
+        st = self.stats
+        if not st["queries"]:
+            return
+        logging.info(
+            f"术语嵌入匹配统计：查询={st['queries']} 直接采用={st['confident']} LLM 裁决={st['tiebreak']} "
+            f"新嵌入={st['embedded']} 缓存命中={st['cache_hits']} 模型={self.model}"
+        )
+
+    def close(self) -> None:
+        if self.cache:
+            self.cache.close()
+
+
+_MATCHER: Optional[TermMatcher] = None
+
+
+def configure_term_matcher(mode: str, ollama_base: str, model: Optional[str] = None, cache_path: Optional[str] = None) -> Optional[TermMatcher]:
+    """Create the process-wide matcher for mode "embed"; None (LLM-only matching) otherwise."""
+    global _MATCHER
+    _MATCHER = None
+    if (mode or "llm") != "embed":
+        return None
+    if np is None:
+        logging.warning("TERM_MATCH=embed 需要 numpy，未安装；改用 LLM 选择最接近的术语")
+        return None
+    path = cache_path or os.environ.get("TERM_EMBED_CACHE_PATH") or DEFAULT_CACHE_PATH
+    try:
+        cache: Optional[EmbeddingCache] = EmbeddingCache(path)
+    except Exception as e:
+        logging.warning(f"术语向量缓存不可用，仅在内存中保留：{path}: {e}")
+        cache = None
+    _MATCHER = TermMatcher(ollama_base, model or os.environ.get("OLLAMA_EMBED_MODEL") or DEFAULT_EMBED_MODEL, cache)
+    return _MATCHER
+
+
+def get_term_matcher() -> Optional[TermMatcher]:
+    return _MATCHER
@@ -0,0 +1,92 @@
+"""Webhook mode against the bench_e2e Firecrawl stand-in.
+
+    python -m unittest scripts.test_firecrawl_webhook
+
+The stand-in POSTs signed crawl.page events, drops every fourth and repeats
+every third; iter_webhook_batches must still deliver each page exactly once,
+picking the dropped ones up from the status API after crawl.completed.
+"""
+
+import hashlib
+import hmac
+import unittest
+
+import requests
+
+from .bench_e2e import FakeServices, build_parser
+from .firecrawl_webhook import WebhookReceiver, iter_webhook_batches
+from .firecrawl_poller import document_source
+
+PAGES = 12
+
+
+def _signed(secret: str, raw: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode("utf-8"), raw, hashlib.sha256).hexdigest()
+
+
+class WebhookSignatureTest(unittest.TestCase):
+    def test_signature(self) -> None:
+        receiver = WebhookReceiver(secret="s3cret")
+        raw = b'{"type": "crawl.page", "id": "job", "data": [{"metadata": {"sourceURL": "https://a.test/"}}]}'
+        self.assertEqual(receiver.handle(receiver.path, raw, _signed("s3cret", raw)), 200)
+        # Bare hex digest, without the sha256= prefix
+        self.assertEqual(receiver.handle(receiver.path, raw, _signed("s3cret", raw)[7:]), 200)
+        self.assertEqual(receiver.handle(receiver.path, raw, _signed("wrong", raw)), 401)
+        self.assertEqual(receiver.handle(receiver.path, raw, ""), 401)
+        self.assertEqual(receiver.handle(receiver.path, raw + b" ", _signed("s3cret", raw)), 401)
+        self.assertEqual(receiver.handle("/other", raw, _signed("s3cret", raw)), 404)
+        self.assertEqual(receiver.rejected, 3)
+        self.assertEqual(receiver.counts, {"page": 2})
+
+    def test_no_secret_accepts_unsigned(self) -> None:
+        receiver = WebhookReceiver()
+        self.assertEqual(receiver.handle(receiver.path, b'{"type": "crawl.completed", "id": "job"}'), 200)
+        self.assertEqual(receiver.handle(receiver.path, b"not json"), 400)
+
+
+class WebhookDeliveryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        args = build_parser().parse_args([
+            "--pages", str(PAGES), "--paragraphs", "2", "--firecrawl-latency", "0", "--batch-size", "5",
+            "--webhook-drop-every", "4", "--webhook-dup-every", "3",
+        ])
+        self.services = FakeServices(args).start()
+        self.secret = args.webhook_secret
+        self.expected = sorted(f"https://bench.local/page-{i}" for i in range(PAGES))
+
+    def tearDown(self) -> None:
+        self.services.stop()
+
+    def _crawl(self, receiver: WebhookReceiver, idle_timeout: float = 10.0):
+        started = requests.post(self.services.base + "/v2/crawl", json={"url": "https://bench.local/", "webhook": receiver.webhook_config()}, timeout=10).json()
+        sources = []
+        for batch in iter_webhook_batches(receiver, started["id"], started["url"], idle_timeout=idle_timeout):
+            sources.extend(document_source(doc) for doc in batch)
+        return sources
+
+    def test_each_page_delivered_once(self) -> None:
+        receiver = WebhookReceiver(secret=self.secret).start()
+        try:
+            sources = self._crawl(receiver)
+        finally:
+            receiver.close()
+        # Pages 3, 7 and 11 were never pushed; 0, 6 and 9 were pushed twice
+        self.assertEqual(receiver.counts.get("page"), PAGES - 3 + 3)
+        self.assertEqual(receiver.counts.get("completed"), 1)
+        self.assertEqual(receiver.rejected, 0)
+        self.assertEqual(len(sources), len(set(sources)))
+        self.assertEqual(sorted(sources), self.expected)
+
+    def test_bad_signature_falls_back_to_status_api(self) -> None:
+        receiver = WebhookReceiver(secret="not-the-bench-secret").start()
+        try:
+            sources = self._crawl(receiver, idle_timeout=1.0)
+        finally:
+            receiver.close()
+        self.assertEqual(receiver.counts, {})
+        self.assertEqual(receiver.rejected, self.services.calls["webhook"])
+        self.assertEqual(sorted(sources), self.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Replay and compaction of the crawler's manifest journal.
+
+    python -m unittest scripts.test_manifest_journal
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from .manifest_journal import ManifestJournal, journal_path_for, replay_manifest
+
+
+def _write_pages(journal: ManifestJournal, first: int, last: int) -> None:
+    for n in range(first, last + 1):
+        journal.record_page(f"site/page-{n}.md", f"page-{n}", n, [f"cat-{n % 2}"], [f"tag-{n}"], f"http://fc.test/v2/crawl/job?skip={n}", source=f"https://a.test/{n}")
+
+
+class ManifestJournalTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "out", "manifest.json")
+        self.journals: list = []
+
+    def tearDown(self) -> None:
+        for journal in self.journals:
+            if journal._fh is not None:
+                journal._fh.close()
+
+    def _open(self, compact_min_events: int = 1000) -> ManifestJournal:
+        journal = ManifestJournal(self.path, compact_min_events=compact_min_events)
+        self.journals.append(journal)
+        return journal
+
+    def test_nothing_saved(self) -> None:
+        self.assertEqual(self._open().load(), {})
+        self.assertEqual(replay_manifest(self.path), {})
+
+    def test_append_then_replay(self) -> None:
+        journal = self._open()
+        journal.load()
+        journal.set_meta(start_url="https://a.test/", ollama_model="m")
+        _write_pages(journal, 1, 3)
+        journal.record_terms(["extra"], [])
+        self.assertFalse(os.path.exists(self.path))
+
+        state = self._open().load()
+        self.assertEqual(state["start_url"], "https://a.test/")
+        self.assertEqual(state["ollama_model"], "m")
+        self.assertEqual(state["pages_processed"], 3)
+        self.assertEqual(state["files"], ["site/page-1.md", "site/page-2.md", "site/page-3.md"])
+        self.assertEqual(state["used_urls"], ["page-1", "page-2", "page-3"])
+        self.assertEqual(state["sources"], ["https://a.test/1", "https://a.test/2", "https://a.test/3"])
+        self.assertEqual(state["last_prev_url"], "page-3")
+        self.assertEqual(state["latest_next_url"], "http://fc.test/v2/crawl/job?skip=3")
+        self.assertEqual(state["global_categories_pool"], ["cat-1", "cat-0", "cat-1", "extra"])
+        self.assertEqual(state["global_tags_pool"], ["tag-1", "tag-2", "tag-3"])
+        self.assertEqual(state, journal.state)
+
+    def test_truncated_last_line_is_ignored(self) -> None:
+        journal = self._open()
+        journal.load()
+        _write_pages(journal, 1, 2)
+        journal._fh.close()
+        journal._fh = None
+        # A crash in the middle of writing the third event
+        with open(journal_path_for(self.path), "a", encoding="utf-8") as f:
+            f.write('{"op":"page","n":3,"file":"site/pa')
+
+        state = self._open().load()
+        self.assertEqual(state["pages_processed"], 2)
+        self.assertEqual(state["files"], ["site/page-1.md", "site/page-2.md"])
+        self.assertEqual(state["latest_next_url"], "http://fc.test/v2/crawl/job?skip=2")
+
+    def test_compaction_round_trip(self) -> None:
+        journal = self._open()
+        journal.load()
+        journal.set_meta(start_url="https://a.test/")
+        _write_pages(journal, 1, 5)
+        before = json.loads(json.dumps(journal.state))
+        journal.compact()
+        self.assertEqual(os.path.getsize(journal_path_for(self.path)), 0)
+
+        state = self._open().load()
+        self.assertEqual(state, before)
+        # Later events still replay on top of the snapshot
+        journal = self._open()
+        journal.load()
+        _write_pages(journal, 6, 6)
+        state = self._open().load()
+        self.assertEqual(state["pages_processed"], 6)
+        self.assertEqual(state["files"], before["files"] + ["site/page-6.md"])
+
+    def test_events_already_in_snapshot_are_skipped(self) -> None:
+        journal = self._open()
+        journal.load()
+        _write_pages(journal, 1, 3)
+        with open(journal_path_for(self.path), "r", encoding="utf-8") as f:
+            events = f.read()
+        journal.compact()
+        # A crash between writing the snapshot and truncating the journal
+        with open(journal_path_for(self.path), "w", encoding="utf-8") as f:
+            f.write(events)
+        state = self._open().load()
+        self.assertEqual(state["pages_processed"], 3)
+        self.assertEqual(len(state["files"]), 3)
+        self.assertEqual(len(state["sources"]), 3)
+
+    def test_automatic_compaction_and_close(self) -> None:
+        journal = self._open(compact_min_events=2)
+        journal.load()
+        _write_pages(journal, 1, 3)
+        self.assertTrue(os.path.exists(self.path))
+        journal.close(latest_next_url=None)
+        self.assertFalse(os.path.exists(journal_path_for(self.path)))
+        with open(self.path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot["pages_processed"], 3)
+        self.assertIsNone(snapshot["latest_next_url"])
+        self.assertEqual(self._open().load(), snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Markdown chunking for translation: lossless, construct-preserving, within budget.
+
+    python -m unittest scripts.test_md_chunker
+"""
+
+import re
+import unittest
+
+from .md_chunker import DEFAULT_CHUNK_TOKENS, chunk_markdown, estimate_tokens, num_ctx_for, read_timeout_for
+
+FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})", re.M)
+
+CODE = (
+    "```python\n"
+    "def f():\n"
+    "\n"
+    "    # not a heading\n"
+    "    return '。！？'\n"
+    "\n"
+    "| not | a table |\n"
+    "```\n"
+)
+
+DOC = (
+    "\n\n# 标题\n\n"
+    "第一段。这里有一些中文内容，用来测试分块。第二句！第三句？\n\n"
+    "## 代码\n\n" + CODE + "\n"
+    "- 列表项一\n- 列表项二\n  续行\n\n"
+    "> 引用一行\n> 引用两行\n\n"
+    "| 列 | 值 |\n|---|---|\n| a | 1 |\n\n"
+    "~~~\nplain ~~~ fence\n~~~\n"
+    "English paragraph. With two sentences.\r\n"
+    "Last line without newline"
+)
+
+
+def _fences_balanced(chunk: str) -> bool:
+    return len(FENCE.findall(chunk)) % 2 == 0
+
+
+class ChunkMarkdownTest(unittest.TestCase):
+    def test_join_reproduces_input(self) -> None:
+        long_doc = DOC * 20
+        for budget in (32, 64, 200, DEFAULT_CHUNK_TOKENS):
+            with self.subTest(budget=budget):
+                self.assertEqual("".join(chunk_markdown(DOC, budget)), DOC)
+                self.assertEqual("".join(chunk_markdown(long_doc, budget)), long_doc)
+        self.assertEqual(chunk_markdown(""), [])
+        self.assertEqual(chunk_markdown("\n\n"), ["\n\n"])
+
+    def test_fenced_code_is_never_split(self) -> None:
+        text = DOC * 10
+        for budget in (32, 64, 200):
+            with self.subTest(budget=budget):
+                chunks = chunk_markdown(text, budget)
+                self.assertGreater(len(chunks), 1)
+                for chunk in chunks:
+                    self.assertTrue(_fences_balanced(chunk), chunk)
+                self.assertEqual(sum(chunk.count(CODE) for chunk in chunks), 10)
+
+    def test_oversized_fence_is_one_chunk(self) -> None:
+        code = "```\n" + "".join(f"line {i} 代码\n\n" for i in range(200)) + "```\n"
+        text = "前言。\n\n" + code + "\n后记。\n"
+        chunks = chunk_markdown(text, 64)
+        self.assertEqual("".join(chunks), text)
+        self.assertTrue(any(code in chunk for chunk in chunks))
+        self.assertTrue(all(_fences_balanced(chunk) for chunk in chunks))
+
+    def test_oversized_paragraph_stays_within_budget(self) -> None:
+        cjk = "".join(f"这是第{i}句话，内容用来测试分块的预算。" for i in range(300))
+        run_on = " ".join(f"word{i}" for i in range(3000))
+        for text in (cjk, run_on, cjk + run_on + "\n"):
+            for budget in (32, 100, 512):
+                with self.subTest(text=text[:10], budget=budget):
+                    chunks = chunk_markdown(text, budget)
+                    self.assertGreater(len(chunks), 1)
+                    self.assertEqual("".join(chunks), text)
+                    for chunk in chunks:
+                        self.assertLessEqual(estimate_tokens(chunk), budget)
+
+    def test_sentence_boundaries_preferred(self) -> None:
+        text = "".join(f"第{i}句内容比较长一些。" for i in range(100))
+        for chunk in chunk_markdown(text, 64):
+            self.assertTrue(chunk.endswith("。"), chunk)
+
+    def test_heading_starts_next_chunk(self) -> None:
+        text = "正文。" * 30 + "\n\n# 新的一节\n\n" + "内容。" * 5 + "\n"
+        chunks = chunk_markdown(text, 64)
+        self.assertEqual("".join(chunks), text)
+        for chunk in chunks:
+            self.assertFalse(chunk.rstrip().endswith("新的一节"), chunk)
+
+
+class BudgetHelpersTest(unittest.TestCase):
+    def test_read_timeout_grows_with_chunk(self) -> None:
+        self.assertEqual(read_timeout_for(0), 30.0)
+        self.assertAlmostEqual(read_timeout_for(DEFAULT_CHUNK_TOKENS), 222.0)
+        self.assertEqual(read_timeout_for(-5), 30.0)
+        self.assertLess(read_timeout_for(256), read_timeout_for(512))
+
+    def test_num_ctx_fits_chunk_and_output(self) -> None:
+        self.assertEqual(num_ctx_for(0), 1024)
+        self.assertEqual(num_ctx_for(DEFAULT_CHUNK_TOKENS), 4096)
+        self.assertEqual(num_ctx_for(10 ** 6), 32768)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""Early stop of streamed generations on a complete JSON value.
+
+    python -m unittest scripts.test_ollama_stream
+"""
+
+import json
+import unittest
+from typing import List, Optional
+
+from .fm_utils import parse_ollama_response
+from .ollama_client import JsonStopDetector, OllamaClient
+
+
+def _feed(detector: JsonStopDetector, pieces: List[str]) -> Optional[str]:
+    """Feed `pieces` one by one; the accepted value, or None if none completed."""
+    text = ""
+    for piece in pieces:
+        text += piece
+        if detector.feed(piece):
+            return text[detector.start:detector.end]
+    return None
+
+
+def _chars(text: str) -> List[str]:
+    return list(text)
+
+
+def _has_title(text: str) -> bool:
+    return bool(parse_ollama_response(text).get("title"))
+
+
+class JsonStopDetectorTest(unittest.TestCase):
+    def test_brace_inside_string(self) -> None:
+        text = '{"title": "a } b { c ] [", "tags": ["x}"]} tail'
+        self.assertEqual(_feed(JsonStopDetector(), _chars(text)), text[:-5])
+
+    def test_escaped_quote(self) -> None:
+        text = r'{"title": "say \"}\" and \\", "n": 1}' + " tail"
+        value = _feed(JsonStopDetector(), _chars(text))
+        self.assertEqual(value, text[:-5])
+        self.assertEqual(json.loads(value)["title"], 'say "}" and \\')
+
+    def test_rejected_value_keeps_streaming(self) -> None:
+        real = '{"title": "Real", "tags": ["t"]}'
+        text = 'Example: [1] or "{}" then ' + real + " done"
+        detector = JsonStopDetector(_has_title)
+        self.assertEqual(_feed(detector, _chars(text)), real)
+        # Without a validator the first example already ends the stream
+        self.assertEqual(_feed(JsonStopDetector(), _chars(text)), "[1]")
+
+    def test_markdown_link_is_not_json(self) -> None:
+        text = 'See [the docs](https://a.test) -> ["kw"]'
+        self.assertEqual(_feed(JsonStopDetector(), _chars(text)), '["kw"]')
+
+    def test_think_block_is_skipped(self) -> None:
+        text = '<think>try {"title": "draft"}</think>{"title": "final"}'
+        self.assertEqual(_feed(JsonStopDetector(), [text[i:i + 3] for i in range(0, len(text), 3)]), '{"title": "final"}')
+
+    def test_stream_ends_before_value_completes(self) -> None:
+        detector = JsonStopDetector()
+        self.assertIsNone(_feed(detector, _chars('Sure: {"title": "cut off", "tags": ["a"')))
+        self.assertIsNone(detector.end)
+
+
+class _FakeStream:
+    def __init__(self, pieces: List[str]):
+        self.status_code = 200
+        self.pieces = pieces
+        self.read = 0
+        self.closed = False
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def iter_lines(self):
+        for i, piece in enumerate(self.pieces):
+            self.read += 1
+            yield json.dumps({"response": piece, "done": i == len(self.pieces) - 1}).encode("utf-8")
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class GenerateStreamTest(unittest.TestCase):
+    def _stream(self, pieces: List[str], validate=None):
+        client = OllamaClient("http://ollama.test")
+        fake = _FakeStream(pieces)
+        client.session.post = lambda *args, **kwargs: fake
+        text, info = client.generate_stream("m", "p", stop_on_json=True, validate=validate)
+        return text, info, fake
+
+    def test_stops_after_accepted_value(self) -> None:
+        pieces = ["Example ", "[1]", " then ", '{"title": ', '"Real"}', " and more", " text"]
+        text, info, fake = self._stream(pieces, _has_title)
+        self.assertEqual(text, '{"title": "Real"}')
+        self.assertEqual(info["stopped"], "json")
+        self.assertEqual(fake.read, 5)
+        self.assertTrue(fake.closed)
+
+    def test_rejected_values_read_to_the_end(self) -> None:
+        pieces = ["[1]", " and ", "{}", " only"]
+        text, info, fake = self._stream(pieces, _has_title)
+        self.assertEqual(text, "[1] and {} only")
+        self.assertIsNone(info["stopped"])
+        self.assertEqual(fake.read, len(pieces))
+
+    def test_incomplete_value_returns_full_text(self) -> None:
+        pieces = ['{"title": ', '"cut', ' off"']
+        text, info, _fake = self._stream(pieces)
+        self.assertEqual(text, '{"title": "cut off"')
+        self.assertIsNone(info["stopped"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""--profile must cover worker threads without getting in their way.
+
+    python -m unittest scripts.test_profiling
+"""
+
+import cProfile
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from . import profiling
+
+
+def _profiled_worker(box: list) -> None:
+    box.append(sum(i * i for i in range(10000)))
+
+
+def _function_names(path: str) -> set:
+    return {name for _file, _line, name in pstats.Stats(path).stats}
+
+
+class RunProfilerThreadTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(profiling.close_profiling)
+
+    def _start(self) -> profiling.RunProfiler:
+        profiler = profiling.configure_profiling("test", True, self.tmp.name, mem_every=0)
+        self.assertIsNotNone(profiler)
+        return profiler
+
+    def test_thread_runs_and_is_profiled(self) -> None:
+        profiler = self._start()
+        box: list = []
+        worker = threading.Thread(target=_profiled_worker, args=(box,))
+        worker.start()
+        worker.join()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda _: _profiled_worker(box), range(4)))
+        profiling.close_profiling()
+        self.assertEqual(len(box), 5)
+        path = os.path.join(profiler.out_dir, "test.prof")
+        self.assertTrue(os.path.exists(path))
+        self.assertIn("_profiled_worker", _function_names(path))
+
+    @unittest.skipIf(profiling._PROCESS_WIDE, "one process-wide profiler from Python 3.12")
+    def test_thread_runs_when_its_profiler_fails(self) -> None:
+        main = threading.get_ident()
+
+        class BusyProfile(cProfile.Profile):
+            def enable(self, *args, **kwargs):
+                if threading.get_ident() != main:
+                    raise ValueError("Another profiling tool is already active")
+                return super().enable(*args, **kwargs)
+
+        with mock.patch.object(profiling.cProfile, "Profile", BusyProfile):
+            profiler = self._start()
+            box: list = []
+            worker = threading.Thread(target=_profiled_worker, args=(box,))
+            worker.start()
+            worker.join()
+            profiling.close_profiling()
+        self.assertEqual(box, [sum(i * i for i in range(10000))])
+        self.assertTrue(os.path.exists(os.path.join(profiler.out_dir, "test.prof")))
+
+
+if __name__ == "__main__":
+    unittest.main()